@@ -5,11 +5,15 @@ from networktables2 import (
     DefaultEntryTypes,
     NetworkTableClient,
     NetworkTableServer,
+    NumberArray,
     SocketStreamFactory,
     SocketServerStreamProvider
 )
 
 from networktables2._dashboard import DashboardSocketStreamFactory
+from networktables2.nullstream import NullStreamFactory
+from networktables2.notifier import LatestValueListener, ListenerNotifier
+from networktables2.outboundqueue import OutboundQueue
 
 __all__ = ["NetworkTable"]
 
@@ -245,10 +249,12 @@ class NetworkTableProvider:
         """
         self.node.stop()
 
-    def addGlobalListener(self, listener, immediateNotify):
+    def addGlobalListener(self, listener, immediateNotify, latestOnly=False):
         adapter = self.global_listeners.get(listener)
         if adapter is None:
             adapter = NetworkTableGlobalListenerAdapter(listener)
+            if latestOnly:
+                adapter = LatestValueListener(adapter)
             self.global_listeners[listener] = adapter
             self.node.addTableListener(adapter, immediateNotify)
 
@@ -267,6 +273,16 @@ def _create_server_node(ipAddress, port):
     """
     return NetworkTableServer(SocketServerStreamProvider(port))
 
+def _create_selector_server_node(ipAddress, port):
+    """Creates a network tables server node that reads from all clients
+    on a single thread
+    
+    :param ipAddress: the IP address configured by the user
+    :param port: the port configured by the user
+    :returns: a new node that can back a network table
+    """
+    return NetworkTableServer(SocketServerStreamProvider(port), useSelector=True)
+
 def _create_client_node(ipAddress, port):
     """Creates a network tables client node
     
@@ -292,11 +308,6 @@ def _create_dashboard_node(ipAddress, port):
     return client
     
 def _create_test_node(ipAddress, port):
-    
-    class NullStreamFactory:
-        def createStream(self):
-            return None
-        
     return NetworkTableClient(NullStreamFactory())
     
     
@@ -330,6 +341,11 @@ class NetworkTable:
     
     port = DEFAULT_PORT
     ipAddress = None
+    
+    # functions called with the node when it is created, to configure it
+    _nodeConfig = {}
+    
+    _numpyArrays = False
 
     _staticMutex = threading.RLock()
 
@@ -350,12 +366,37 @@ class NetworkTable:
                     NetworkTable._mode_fn(NetworkTable.ipAddress,
                                           NetworkTable.port))
             
+            for fn in NetworkTable._nodeConfig.values():
+                fn(NetworkTable._staticProvider.getNode())
+            
+            if NetworkTable._numpyArrays:
+                NetworkTable._staticProvider.getNode().setNumpyArrays()
+            
             if NetworkTable._queuedAutoUpdateValues:
                 q = NetworkTable._queuedAutoUpdateValues
                 NetworkTable._queuedAutoUpdateValues = None
                 for args in q:
                     NetworkTable.getGlobalAutoUpdateValue(*args)
 
+    @staticmethod
+    def shutdown():
+        """Stop the NetworkTables node, and forget the settings made with
+        the static methods, so that :meth:`initialize` can be called again
+        """
+        with NetworkTable._staticMutex:
+            provider = NetworkTable._staticProvider
+            if provider is not None:
+                node = provider.getNode()
+                if node.isServer():
+                    node.close()
+                else:
+                    node.stop()
+
+            NetworkTable._staticProvider = None
+            NetworkTable._nodeConfig = {}
+            NetworkTable._numpyArrays = False
+            NetworkTable._queuedAutoUpdateValues = []
+
     @staticmethod
     def setTableProvider(provider):
         """set the table provider for static network tables methods
@@ -367,14 +408,21 @@ class NetworkTable:
             NetworkTable._staticProvider = provider
 
     @staticmethod
-    def setServerMode():
+    def setServerMode(useSelector=False):
         """set that network tables should be a server (this is the default)
         
+        :param useSelector: If True, the server will read from all clients
+                            on a single thread instead of creating a thread
+                            for each client. Requires python 3.4+
+        
         .. warning:: This must be called before :meth:`initalize` or :meth:`getTable`
         """
         with NetworkTable._staticMutex:
             NetworkTable.checkInit()
-            NetworkTable._mode_fn = staticmethod(_create_server_node)
+            if useSelector:
+                NetworkTable._mode_fn = staticmethod(_create_selector_server_node)
+            else:
+                NetworkTable._mode_fn = staticmethod(_create_server_node)
 
     @staticmethod
     def setClientMode():
@@ -450,11 +498,171 @@ class NetworkTable:
         .. warning:: If you don't know what this setting affects, don't mess
                      with it!
         
-        :param latency: Write flush period in seconds (default is 0.050,
-                        or 50ms)
+        :param flushPeriod: Write flush period in seconds (default is 0.050,
+                            or 50ms)
+        """
+        NetworkTable._setNodeConfig('writeFlush',
+                lambda node: node.setWriteFlushPeriod(flushPeriod))
+
+    @staticmethod
+    def setAdaptiveWriteFlush(minFlushInterval=0.010, maxBatchSize=None):
+        """Instead of writing to the network periodically, write changes
+        as soon as they are made when the network is idle. When changes are
+        being made faster than every minFlushInterval seconds, they are
+        coalesced and written together.
+        
+        :param minFlushInterval: Minimum time between writes in seconds
+                                 (default is 0.010, or 10ms)
+        :param maxBatchSize: If this many changes are waiting to be written,
+                             they are written immediately
+        
+        .. warning:: If you don't know what this setting affects, don't mess
+                     with it!
+        """
+        NetworkTable._setNodeConfig('writeFlush',
+                lambda node: node.setAdaptiveWriteFlush(minFlushInterval, maxBatchSize))
+
+    @staticmethod
+    def setAsyncListeners(enabled=True, maxQueueSize=1000, overflowPolicy='drop_oldest'):
+        """Call table listeners from a dedicated thread, instead of the
+        NetworkTables I/O thread or the thread that put the value. This
+        keeps slow listeners from delaying network reads and puts.
+        
+        Notifications are queued until the listener thread gets to them.
+        When more than maxQueueSize notifications are queued, the
+        overflowPolicy decides what happens:
+        
+        * ``'drop_oldest'``: the oldest notification is discarded
+        * ``'coalesce'``: a queued notification for the same key is
+          replaced, so listeners only see the latest value of a key. No
+          key is ever dropped, so the queue may hold one notification for
+          every key, regardless of maxQueueSize.
+        * ``'block'``: the thread changing the value waits. Listeners must
+          not put values when this is used.
+        
+        :param enabled: True to call listeners from a dedicated thread
+        :param maxQueueSize: Maximum number of queued notifications
+        :param overflowPolicy: What to do when the queue is full
+        """
+        if enabled:
+            ListenerNotifier.checkPolicy(maxQueueSize, overflowPolicy)
+        
+        NetworkTable._setNodeConfig('asyncListeners',
+                lambda node: node.setAsyncListeners(enabled, maxQueueSize, overflowPolicy))
+
+    @staticmethod
+    def setOutboundQueue(maxQueueBytes=1024*1024, overflowPolicy='coalesce'):
+        """In server mode, each client has a queue of data waiting to be
+        sent to it, so that a slow client (such as a dashboard on a bad
+        wireless connection) does not delay the others. This sets the size
+        of the queues, and what to do when a client falls so far behind
+        that its queue is full:
+        
+        * ``'coalesce'``: discard the queued data, and send only the latest
+          value of each key that changed once the client catches up
+        * ``'drop'``: discard updates until there is room in the queue
+        * ``'disconnect'``: disconnect the client
+        
+        This has no effect in client mode.
+        
+        :param maxQueueBytes: Maximum number of bytes queued for a client
+        :param overflowPolicy: What to do when a client's queue is full
+        """
+        OutboundQueue.checkPolicy(maxQueueBytes, overflowPolicy)
+        
+        def setOutboundQueue(node):
+            if node.isServer():
+                node.setOutboundQueue(maxQueueBytes, overflowPolicy)
+        NetworkTable._setNodeConfig('outboundQueue', setOutboundQueue)
+
+    @staticmethod
+    def setMetricsPublishing(period=1.0, prefix=None):
+        """Periodically put metrics about NetworkTables (such as how long
+        writes to the network take, and how much data has been sent) into
+        a table, so that they can be watched from a dashboard. Use
+        :meth:`getMetrics` to read them directly instead.
+        
+        :param period: Time between updates in seconds, or None to stop
+                       publishing
+        :param prefix: The table to publish to. By default the server
+                       publishes to ``/.metrics/server/``, and each
+                       client to a table named after its host and process.
+        """
+        NetworkTable._setNodeConfig('metricsPublishing',
+                lambda node: node.setMetricsPublishing(period, prefix))
+
+    @staticmethod
+    def setCaptureFile(path):
+        """Record the data received from the network to a file, so that
+        it can be replayed later to reproduce a performance problem without
+        a robot (see ``tools/nt_replay.py``). Call this before
+        :meth:`initialize` to record every connection.
+        
+        :param path: The file to write to, or None to stop recording. The
+                     file is replaced if it exists.
         """
-        from networktables2.client import WriteManager
-        WriteManager.SLEEP_TIME = flushPeriod
+        def setCaptureFile(node):
+            if path is None:
+                node.stopCapture()
+            else:
+                node.startCapture(path)
+        NetworkTable._setNodeConfig('capture', setCaptureFile)
+
+    @staticmethod
+    def setPersistentFile(path, period=1.0):
+        """In server mode, save all values to a file, and restore them
+        from it when the robot program restarts. Values that changed are
+        written every ``period`` seconds. Call this before
+        :meth:`initialize`, so that values are restored before clients
+        connect.
+
+        This has no effect in client mode.
+
+        :param path: The file to save values to, or None to stop saving
+        :param period: Time between writes in seconds
+        """
+        def setPersistentFile(node):
+            if node.isServer():
+                node.setPersistentFile(path, period)
+        NetworkTable._setNodeConfig('persistentFile', setPersistentFile)
+
+    @staticmethod
+    def getMetrics():
+        """Get metrics about NetworkTables, such as the number of changes
+        sent by each write to the network, how long the writes take, and
+        how much data has been sent and received. Times are in seconds.
+        
+        This will automatically initialize network tables if it has not been
+        already.
+        
+        :returns: a dictionary of metric name to value, see
+                  :meth:`.NetworkTableNode.getMetrics`
+        :rtype: dict
+        """
+        return NetworkTable.getGlobalTable().getMetrics()
+
+    @staticmethod
+    def setNumpyArrays(enabled=True):
+        """Store boolean and number arrays as read-only NumPy arrays, so
+        that :meth:`retrieveArrayView` can return them without copying.
+        Requires NumPy.
+        
+        :param enabled: True to use NumPy arrays
+        
+        .. warning:: This must be called before :meth:`initalize` or :meth:`getTable`
+        """
+        with NetworkTable._staticMutex:
+            NetworkTable.checkInit()
+            if enabled and NumberArray.NUMPY_TYPE is None:
+                raise ImportError("NumPy is required to use NumPy arrays")
+            NetworkTable._numpyArrays = enabled
+
+    @staticmethod
+    def _setNodeConfig(name, fn):
+        with NetworkTable._staticMutex:
+            NetworkTable._nodeConfig[name] = fn
+            if NetworkTable._staticProvider is not None:
+                fn(NetworkTable._staticProvider.getNode())
 
     @staticmethod
     def getTable(key):
@@ -497,7 +705,7 @@ class NetworkTable:
             return NetworkTable._staticProvider.getNode()
 
     @staticmethod
-    def addGlobalListener(listener, immediateNotify=True):
+    def addGlobalListener(listener, immediateNotify=True, latestOnly=False):
         '''Adds a listener that will be notified when any key in any
         NetworkTable is changed. The keys that are received using this
         listener will be full NetworkTable keys. Most users will not
@@ -511,6 +719,9 @@ class NetworkTable:
 
         :param listener: A callable that has this signature: `callable(key, value, isNew)`
         :param immediateNotify: If True, the listener will be called immediately with the current values of the table
+        :param latestOnly: If True, the listener is called from its own
+                           thread, and only with the latest value of each
+                           key that changed since it was last called
 
         .. versionadded:: 2015.2.0
 
@@ -521,7 +732,7 @@ class NetworkTable:
         with NetworkTable._staticMutex:
             if NetworkTable._staticProvider is None:
                 NetworkTable.initialize()
-            NetworkTable._staticProvider.addGlobalListener(listener, immediateNotify)
+            NetworkTable._staticProvider.addGlobalListener(listener, immediateNotify, latestOnly)
 
     @staticmethod
     def removeGlobalListener(listener):
@@ -641,16 +852,22 @@ class NetworkTable:
             self.node.removeConnectionListener(adapter)
             del self.connectionListenerMap[listener]
 
-    def addTableListener(self, listener, immediateNotify=False, key=None):
+    def addTableListener(self, listener, immediateNotify=False, key=None, latestOnly=False):
         '''Adds a listener that will be notified when any key in this
         NetworkTable is changed, or when a specified key changes.
         
-        The listener is called from the NetworkTables I/O thread, and should
-        return as quickly as possible.
+        The listener is called from the NetworkTables I/O thread (or from a
+        dedicated thread, see :meth:`setAsyncListeners`), and should return
+        as quickly as possible.
         
         :param listener: A callable that has this signature: `callable(source, key, value, isNew)`
         :param immediateNotify: If True, the listener will be called immediately with the current values of the table
         :param key: If specified, the listener will only be called when this key is changed
+        :param latestOnly: If True, the listener is called from its own
+                           thread, and only with the latest value of each
+                           key that changed since it was last called. Use
+                           this for listeners that cannot keep up with
+                           every change.
         
         
         .. warning:: You may call the NetworkTables API from within the
@@ -659,20 +876,28 @@ class NetworkTable:
         '''
         adapters = self.listenerMap.setdefault(listener, [])
         if key is not None:
+            fullKey = self.absoluteKeyCache.get(key)
             adapter = NetworkTableKeyListenerAdapter(
-                    key, self.absoluteKeyCache.get(key), self, listener)
+                    key, fullKey, self, listener)
+            if latestOnly:
+                adapter = LatestValueListener(adapter)
+            adapters.append(adapter)
+            self.node.addTableListener(adapter, immediateNotify, key=fullKey)
         else:
-            adapter = NetworkTableListenerAdapter(
-                    self.path+self.PATH_SEPARATOR, self, listener)
-        adapters.append(adapter)
-        self.node.addTableListener(adapter, immediateNotify)
+            prefix = self.path+self.PATH_SEPARATOR
+            adapter = NetworkTableListenerAdapter(prefix, self, listener)
+            if latestOnly:
+                adapter = LatestValueListener(adapter)
+            adapters.append(adapter)
+            self.node.addTableListener(adapter, immediateNotify, prefix)
 
     def addSubTableListener(self, listener):
         '''Adds a listener that will be notified when any key in a subtable of
         this NetworkTable is changed.
         
-        The listener is called from the NetworkTables I/O thread, and should
-        return as quickly as possible.
+        The listener is called from the NetworkTables I/O thread (or from a
+        dedicated thread, see :meth:`setAsyncListeners`), and should return
+        as quickly as possible.
         
         :param listener: A callable that has this signature: `callable(source, key, value, isNew)`
         
@@ -683,7 +908,8 @@ class NetworkTable:
         adapters = self.listenerMap.setdefault(listener, [])
         adapter = NetworkTableSubListenerAdapter(self.path, self, listener)
         adapters.append(adapter)
-        self.node.addTableListener(adapter, True)
+        self.node.addTableListener(adapter, True,
+                                   self.path+self.PATH_SEPARATOR)
 
     def removeTableListener(self, listener):
         '''Removes a table listener
@@ -721,10 +947,7 @@ class NetworkTable:
 
     def containsSubTable(self, key):
         subtablePrefix = self.absoluteKeyCache.get(key)+self.PATH_SEPARATOR
-        for key in self.node.getEntryStore().keys():
-            if key.startswith(subtablePrefix):
-                return True
-        return False
+        return self.node.getEntryStore().containsPrefix(subtablePrefix)
 
     def putNumber(self, key, value):
         """Maps the specified key to the specified value in this table. The key
@@ -821,6 +1044,18 @@ class NetworkTable:
         """
         self.node.retrieveValue(self.absoluteKeyCache.get(key), externalValue)
 
+    def retrieveArrayView(self, key):
+        """Retrieves a boolean or number array as a read-only NumPy array.
+        
+        When NumPy arrays are enabled (see :meth:`setNumpyArrays`), the
+        stored array is returned without copying it. Otherwise the array
+        is converted, which requires NumPy.
+        
+        :param key: the key name
+        :returns: a read-only :class:`numpy.ndarray`
+        """
+        return self.node.retrieveArrayView(self.absoluteKeyCache.get(key))
+
     def putValue(self, key, value):
         """Maps the specified key to the specified value in this table. The key
         can not be None. The value can be retrieved by calling the get method
@@ -831,6 +1066,24 @@ class NetworkTable:
         """
         self.node.putValue(self.absoluteKeyCache.get(key), value)
 
+    def putValues(self, values, flush=False):
+        """Maps multiple keys to values at once. This is faster than putting
+        each value separately, and the values are sent over the network
+        together. If any of the values cannot be put (for example, because
+        the key already holds a different type), none of them are.
+        
+        For example::
+        
+            table.putValues({'x': 1.0, 'y': 2.0, 'valid': True}, flush=True)
+        
+        :param values: a dictionary of keys and values
+        :param flush: if True, the values are sent immediately instead of
+                      at the next periodic write
+        """
+        get = self.absoluteKeyCache.get
+        self.node.putValues(dict((get(key), value) for key, value in values.items()),
+                            flush)
+
     def getValue(self, key, defaultValue=_defaultValueSentry):
         """Returns the key that the name maps to. If the key is None, it will
         return the default value (or raise KeyError if a default value is not
@@ -848,6 +1101,51 @@ class NetworkTable:
                 raise
             return defaultValue
     
+    def getValues(self, keys, defaultValue=_defaultValueSentry):
+        """Returns the values of multiple keys. The values are all read at
+        the same time, so an update received from the network cannot
+        change some of them while they are being read.
+        
+        For example::
+        
+            pose = table.getValues(['x', 'y', 'angle'])
+        
+        :param keys: the key names
+        :param defaultValue: the value used for keys that do not exist. If
+                             not specified, raises KeyError if any of the
+                             keys do not exist.
+        :returns: a dictionary of keys and values
+        """
+        get = self.absoluteKeyCache.get
+        absoluteKeys = [(key, get(key)) for key in keys]
+        values = self.node.getValues([absoluteKey for _, absoluteKey in absoluteKeys])
+        
+        result = {}
+        for key, absoluteKey in absoluteKeys:
+            try:
+                result[key] = values[absoluteKey]
+            except KeyError:
+                if defaultValue is NetworkTable._defaultValueSentry:
+                    raise KeyError(key)
+                result[key] = defaultValue
+        return result
+
+    def snapshot(self, includeSubTables=False):
+        """Returns the values of all keys in this table. The values are all
+        read at the same time, so an update received from the network cannot
+        change some of them while they are being read.
+        
+        :param includeSubTables: if True, the keys in subtables are also
+                                 included, as paths relative to this table
+                                 (such as ``'subtable/key'``)
+        :returns: a dictionary of keys and values
+        """
+        prefix = self.path + self.PATH_SEPARATOR
+        values = self.node.getValuesWithPrefix(prefix)
+        start = len(prefix)
+        return dict((name[start:], value) for name, value in values.items()
+                    if includeSubTables or self.PATH_SEPARATOR not in name[start:])
+
     def getAutoUpdateValue(self, key, defaultValue, writeDefault=True):
         '''Returns an object that will be automatically updated when the
         value is updated by networktables.
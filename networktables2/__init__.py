@@ -2,4 +2,5 @@
 from .client import NetworkTableClient
 from .server import NetworkTableServer
 from .socketstream import SocketStreamFactory, SocketServerStreamProvider
+from .socketstream import UnixSocketStreamFactory, UnixSocketServerStreamProvider
 from .type import BooleanArray, NumberArray, StringArray, DefaultEntryTypes
@@ -74,11 +74,10 @@ class DsDataServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
 class DashboardSocketStreamFactory(SocketStreamFactory):
     
     def __init__(self, ipAddress, port):
+        # the host is set when the driver station sends the robot's address
+        SocketStreamFactory.__init__(self, None, port)
         self.server = DsDataServer(self)
         
-        self.host = None
-        self.port = port
-        
         self.lock = threading.Condition()
         self.thread = threading.Thread(target=self._run, name="DashboardListener")
         self.thread.daemon = True
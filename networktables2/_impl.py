@@ -7,12 +7,65 @@ import threading
 def create_rlock(name):
     return threading.RLock()
 
+_create_plain_rlock = create_rlock
+
 def sock_makefile(s, mode):
     return s.makefile(mode)
 
 def sock_create_connection(address):
     return socket.create_connection(address)
 
+def sock_recv_into(s, buffer):
+    return s.recv_into(buffer)
+
+def sock_sendmsg(s, buffers):
+    return _sendmsg_all(s, buffers)
+
+def sock_send(s, buffers):
+    return _send_some(s, buffers)
+
+# maximum number of buffers that can be passed to a single sendmsg
+SENDMSG_MAX_BUFFERS = 1024
+
+def _sendmsg_all(s, buffers):
+    """Send all of the buffers to a socket, as sendall does for a single
+    buffer
+    """
+    if len(buffers) == 1:
+        s.sendall(buffers[0])
+        return
+    if not hasattr(s, 'sendmsg'):
+        # on Python 2, bytes.join does not accept memoryviews or bytearrays
+        payload = bytearray()
+        for buffer in buffers:
+            payload.extend(buffer)
+        s.sendall(payload)
+        return
+
+    while buffers:
+        sent = s.sendmsg(buffers[:SENDMSG_MAX_BUFFERS])
+        # skip the buffers that were completely sent
+        i = 0
+        while i < len(buffers) and sent >= len(buffers[i]):
+            sent -= len(buffers[i])
+            i += 1
+        buffers = buffers[i:]
+        if buffers and sent:
+            buffers[0] = memoryview(buffers[0])[sent:]
+
+def _send_some(s, buffers):
+    """Send as much of the buffers to a socket as a single call accepts, as
+    send does for a single buffer
+    :returns: the number of bytes sent
+    """
+    if not hasattr(s, 'sendmsg'):
+        payload = bytearray()
+        for buffer in buffers:
+            payload.extend(buffer)
+        return s.send(payload)
+    return s.sendmsg(buffers[:SENDMSG_MAX_BUFFERS])
+
+
 
 # Call this before creating any NetworkTable objects
 def enable_lock_debugging(sock_block_period=None):
@@ -25,5 +78,27 @@ def enable_lock_debugging(sock_block_period=None):
     g['create_rlock'] = _impl_debug.create_tracked_rlock
     g['sock_makefile'] = _impl_debug.blocking_sock_makefile
     g['sock_create_connection'] = _impl_debug.blocking_sock_create_connection
+    g['sock_recv_into'] = _impl_debug.blocking_sock_recv_into
+    g['sock_sendmsg'] = _impl_debug.blocking_sock_sendmsg
+    g['sock_send'] = _impl_debug.blocking_sock_send
 
 
+
+# Call this before creating any NetworkTable objects. Statistics are then
+# recorded while profiling is enabled, which can be changed at any time
+# with _impl_profile.set_enabled. Locks created after this is called with
+# enabled=False are plain locks again, without the profiling overhead.
+#
+# This replaces the locks created by enable_lock_debugging instead of
+# combining with them, so only one of the two can be used at a time.
+def enable_lock_profiling(enabled=True):
+    
+    from . import _impl_profile
+    
+    _impl_profile.set_enabled(enabled)
+    
+    g = globals()
+    if enabled:
+        g['create_rlock'] = _impl_profile.create_profiled_rlock
+    elif g['create_rlock'] is _impl_profile.create_profiled_rlock:
+        g['create_rlock'] = _create_plain_rlock
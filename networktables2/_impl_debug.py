@@ -9,12 +9,18 @@ import socket
 import threading
 import time
 
+from ._impl import _send_some, _sendmsg_all
+
 # Number of seconds to block
 sock_block_period = None
 
 # List of locks that can be acquired from the main thread
 main_locks = [
+    'acceptor_lock',
     'entry_lock',
+    'listener_lock',
+    'notifier_lock',
+    'persist_lock',
     'trans_lock',
 ]
 
@@ -29,6 +35,9 @@ sock_locks = [
 # Dictionary of locks
 # key: name, value: locks that can be held when acquiring the lock
 locks = {
+    # Only held while the wakeup sockets are created or closed
+    'acceptor_lock': [],
+    
     # Never held by robot thread
     'client_conn_lock': [
         'client_conn_lock'
@@ -39,6 +48,41 @@ locks = {
         'client_conn_lock'
     ],
     
+    # Streams are closed while the connection lists are locked
+    'capture_lock': [
+        'client_conn_lock',
+        'server_conn_lock',
+        'capture_lock',
+    ],
+    
+    # Listeners may be added from a listener callback
+    'listener_lock': [
+        'entry_lock',
+        'client_conn_lock',
+        'server_conn_lock',
+    ],
+    
+    # Listener notifications are queued with the entry lock held
+    'notifier_lock': [
+        'entry_lock',
+        'client_conn_lock',
+        'server_conn_lock',
+    ],
+    
+    # Changed entries are marked from a listener
+    'persist_lock': [
+        'entry_lock',
+        'client_conn_lock',
+        'server_conn_lock',
+        'persist_lock',
+    ],
+    
+    # Data is queued for a client while the connection list is locked
+    'outbound_lock': [
+        'server_conn_lock',
+        'outbound_lock',
+    ],
+    
     # Never held by robot thread
     'server_conn_lock': [
         'server_conn_lock',       
@@ -157,6 +201,24 @@ def blocking_sock_create_connection(address):
         time.sleep(sock_block_period)
     return socket.create_connection(address)
 
+def blocking_sock_recv_into(s, buffer):
+    assert_not_locked('recv')
+    if sock_block_period:
+        time.sleep(sock_block_period)
+    return s.recv_into(buffer)
+
+def blocking_sock_sendmsg(s, buffers):
+    assert_not_locked('send')
+    if sock_block_period:
+        time.sleep(sock_block_period)
+    return _sendmsg_all(s, buffers)
+
+def blocking_sock_send(s, buffers):
+    assert_not_locked('send')
+    if sock_block_period:
+        time.sleep(sock_block_period)
+    return _send_some(s, buffers)
+
 def _get_caller():
     curframe = inspect.currentframe()
     calframe = inspect.getouterframes(curframe, 3)
@@ -0,0 +1,185 @@
+'''
+    Lock contention profiling for networktables
+
+    Unlike the debugging locks in _impl_debug, these do not inspect the
+    stack or check the lock order, so they can be left on while a robot is
+    running. Install them with _impl.enable_lock_profiling before creating
+    any NetworkTable objects, and then switch recording on and off with
+    set_enabled.
+'''
+
+from __future__ import print_function
+
+import threading
+
+from .metrics import Histogram, timer
+
+# if False, the locks only count how deeply they are held
+enabled = False
+
+# key: lock name, value: LockStats shared by every lock with that name
+_stats = {}
+_stats_lock = threading.Lock()
+
+class LockStats:
+    """Statistics for all of the locks with a name. They are updated
+    without locking, so counts may be slightly off when several locks with
+    the same name are used by different threads at once.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.acquires = 0
+        # acquires that had to wait for another thread
+        self.contended = 0
+        self.wait = Histogram()
+        self.maxHold = 0
+        self.totalHold = 0
+
+    def getStats(self):
+        return {
+            'acquires': self.acquires,
+            'contended': self.contended,
+            'wait': self.wait.getStats(),
+            'max_hold': self.maxHold,
+            'total_hold': self.totalHold,
+        }
+
+class ProfiledRLock:
+    """A reentrant lock that records how often it is acquired, how long
+    each acquire waits, and how long it is held (from the outermost
+    acquire to the matching release)
+    """
+
+    __slots__ = ('_lock', '_stats', '_depth', '_acquired')
+
+    def __init__(self, name):
+        self._lock = threading.RLock()
+        self._stats = get_stats(name)
+        self._depth = 0
+        self._acquired = 0
+
+    def acquire(self, blocking=True, timeout=-1):
+        lock = self._lock
+        if not enabled:
+            if timeout == -1:
+                acquired = lock.acquire(blocking)
+            else:
+                acquired = lock.acquire(blocking, timeout)
+            if acquired:
+                self._depth += 1
+            return acquired
+
+        stats = self._stats
+        if lock.acquire(False):
+            wait = 0
+        elif not blocking:
+            return False
+        else:
+            start = timer()
+            if timeout == -1:
+                lock.acquire()
+            elif not lock.acquire(True, timeout):
+                return False
+            wait = timer() - start
+            stats.contended += 1
+
+        stats.acquires += 1
+        stats.wait.record(wait)
+        self._depth += 1
+        if self._depth == 1:
+            self._acquired = timer()
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._acquired:
+            self._recordHold()
+        self._lock.release()
+
+    def _recordHold(self):
+        hold = timer() - self._acquired
+        self._acquired = 0
+        stats = self._stats
+        stats.totalHold += hold
+        if hold > stats.maxHold:
+            stats.maxHold = hold
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    # used by threading.Condition, which releases the lock completely while
+    # it waits
+
+    def _is_owned(self):
+        return self._lock._is_owned()
+
+    def _release_save(self):
+        if self._acquired:
+            self._recordHold()
+        depth = self._depth
+        self._depth = 0
+        return self._lock._release_save(), depth
+
+    def _acquire_restore(self, state):
+        self._lock._acquire_restore(state[0])
+        self._depth = state[1]
+        if enabled:
+            self._acquired = timer()
+
+def create_profiled_rlock(name):
+    return ProfiledRLock(name)
+
+def get_stats(name):
+    with _stats_lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = LockStats(name)
+        return stats
+
+def set_enabled(value=True):
+    """Start or stop recording statistics. Locks that are held when
+    recording starts are not counted until they are acquired again.
+    """
+    global enabled
+    enabled = value
+
+def reset():
+    """Discard the statistics recorded so far"""
+    with _stats_lock:
+        for stats in _stats.values():
+            stats.reset()
+
+def get_report():
+    """:returns: a dictionary of lock name to its statistics. Times are
+                 in seconds.
+    """
+    with _stats_lock:
+        return dict((name, stats.getStats()) for name, stats in _stats.items())
+
+def format_report():
+    """:returns: the statistics as a table, with the most contended locks
+                 first
+    """
+    report = get_report()
+    lines = ['%-18s %10s %10s %10s %10s %10s %10s' % (
+             'lock', 'acquires', 'contended', 'wait p50', 'wait p99',
+             'wait max', 'max hold')]
+    for name, stats in sorted(report.items(),
+                              key=lambda item: (-item[1]['contended'], item[0])):
+        wait = stats['wait']
+        lines.append('%-18s %10d %10d %8.1fus %8.1fus %8.1fus %8.1fus' % (
+                     name, stats['acquires'], stats['contended'],
+                     wait['p50'] * 1e6, wait['p99'] * 1e6, wait['max'] * 1e6,
+                     stats['max_hold'] * 1e6))
+    return '\n'.join(lines)
+
+def print_report(file=None):
+    print(format_report(), file=file)
@@ -0,0 +1,248 @@
+import struct
+import time
+
+from . import _impl
+from .decoder import MessageDecoder
+from .metrics import timer
+
+__all__ = ["CaptureWriter", "CaptureReader", "CaptureStream",
+           "CaptureStreamFactory", "CaptureServerStreamProvider", "replay"]
+
+MAGIC = b'NTCAP\x01\n'
+
+# record types
+OPEN = 1
+DATA = 2
+CLOSE = 3
+
+# microseconds since the capture started, record type, connection number,
+# length of the data that follows
+RECORD = struct.Struct('>QBHI')
+
+class CaptureWriter:
+    """Writes the data received by streams to a capture file, with the
+    time it was received. The data of several connections can be written
+    to the same file, as a server does for each of its clients.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: the file to write to. It is replaced if it exists.
+        """
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.start = timer()
+        self.nextConnection = 0
+        self.lock = _impl.create_rlock('capture_lock')
+
+    def _write(self, recordType, connection, data=b''):
+        with self.lock:
+            if self.file is not None:
+                elapsed = int((timer() - self.start) * 1000000)
+                self.file.write(RECORD.pack(elapsed, recordType, connection, len(data)))
+                if data:
+                    self.file.write(data)
+
+    def openConnection(self):
+        """:returns: the number of a new connection"""
+        with self.lock:
+            connection = self.nextConnection
+            self.nextConnection = (connection + 1) & 0xffff
+            self._write(OPEN, connection)
+            return connection
+
+    def write(self, connection, data):
+        """Record data received by a connection
+        :param connection: the connection number
+        :param data: bytes-like object holding the data
+        """
+        self._write(DATA, connection, data)
+
+    def closeConnection(self, connection):
+        self._write(CLOSE, connection)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+class CaptureReader:
+    """Reads a capture file. Iterating over it gives a tuple of (time in
+    seconds, record type, connection number, data) for each record. A
+    record that was cut off, because the program writing the capture
+    stopped, ends the iteration.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        with open(self.path, 'rb') as fp:
+            if fp.read(len(MAGIC)) != MAGIC:
+                raise IOError("%s is not a NetworkTables capture" % self.path)
+
+            while True:
+                header = fp.read(RECORD.size)
+                if len(header) < RECORD.size:
+                    return
+                elapsed, recordType, connection, size = RECORD.unpack(header)
+                data = fp.read(size)
+                if len(data) < size:
+                    return
+                yield elapsed / 1000000.0, recordType, connection, data
+
+class CaptureStream:
+    """Wraps a stream, and records the data received from it"""
+
+    def __init__(self, stream, writer):
+        """
+        :param stream: the stream to wrap
+        :param writer: the capture file to record to
+        :type  writer: :class:`CaptureWriter`
+        """
+        self.stream = stream
+        self.writer = writer
+        self.connection = writer.openConnection()
+
+    def getOutputStream(self):
+        return self.stream.getOutputStream()
+
+    def getRemoteAddress(self):
+        return self.stream.getRemoteAddress()
+
+    def fileno(self):
+        return self.stream.fileno()
+
+    def recv_into(self, buffer):
+        size = self.stream.recv_into(buffer)
+        if size:
+            self.writer.write(self.connection, buffer[:size])
+        return size
+
+    def setblocking(self, flag):
+        self.stream.setblocking(flag)
+
+    def send(self, buffers):
+        return self.stream.send(buffers)
+
+    def close(self):
+        self.stream.close()
+        self.writer.closeConnection(self.connection)
+
+class CaptureStreamFactory:
+    """Wraps a stream factory, so that the data received by every stream
+    it creates is recorded
+    """
+
+    def __init__(self, factory, writer):
+        self.factory = factory
+        self.writer = writer
+
+    def createStream(self):
+        stream = self.factory.createStream()
+        if stream is not None:
+            stream = CaptureStream(stream, self.writer)
+        return stream
+
+class CaptureServerStreamProvider:
+    """Wraps a server stream provider, so that the data received from
+    every client is recorded
+    """
+
+    def __init__(self, provider, writer):
+        self.provider = provider
+        self.writer = writer
+
+    def accept(self):
+        stream = self.provider.accept()
+        if stream is not None:
+            stream = CaptureStream(stream, self.writer)
+        return stream
+
+    def close(self):
+        self.provider.close()
+
+class _ReplayAdapter:
+    """Passes the messages of a replayed connection to a node's entry
+    store. The ids in the capture are mapped to the node's entries, as
+    the node may have assigned different ids.
+    """
+
+    def __init__(self, entryStore, isServer):
+        self.entryStore = entryStore
+        self.isServer = isServer
+        self.entries = {}
+
+    def getEntry(self, id):
+        entry = self.entries.get(id)
+        if entry is None:
+            entry = self.entryStore.getEntry(id)
+        return entry
+
+    def offerIncomingAssignment(self, entry):
+        # a server assigns its own id to the entry
+        id = entry.getId()
+        if self.isServer:
+            entry.clearId()
+        self.entryStore.offerIncomingAssignment(entry)
+        # decoded names are unicode on Python 2, which getEntry would
+        # take for ids
+        self.entries[id] = self.entryStore.namedEntries.get(entry.name)
+
+    def offerIncomingUpdate(self, entry, sequenceNumber, value):
+        self.entryStore.offerIncomingUpdate(entry, sequenceNumber, value)
+
+    def keepAlive(self):
+        pass
+
+    def clientHello(self, protocolRevision):
+        pass
+
+    def serverHelloComplete(self):
+        pass
+
+    def protocolVersionUnsupported(self, protocolRevision):
+        pass
+
+def replay(path, node, speed=1.0):
+    """Replay a capture into a node, as if the node had received the data
+    from the network. The messages are decoded and applied to the node's
+    entry store on the calling thread.
+
+    Captures are usually made by a client, as every entry is assigned
+    by the server before a client receives updates for it. Data received
+    by a server refers to entries by the ids that the server assigned,
+    which only match the node if it assigned the same ids.
+
+    :param path: the capture file
+    :param node: the client or server to replay into
+    :param speed: 1 to replay the data at the rate it was received, 2
+                  for twice as fast, and so on. None replays it as fast as
+                  possible.
+    :returns: a tuple of the number of bytes replayed and the time taken
+              in seconds
+    """
+    entryStore = node.getEntryStore()
+    connections = {}
+    size = 0
+
+    start = timer()
+    for elapsed, recordType, connection, data in CaptureReader(path):
+        if recordType == OPEN:
+            connections[connection] = (MessageDecoder(node.typeManager),
+                                       _ReplayAdapter(entryStore, node.isServer()))
+
+        elif recordType == DATA:
+            if speed:
+                delay = start + elapsed / speed - timer()
+                if delay > 0:
+                    time.sleep(delay)
+            decoder, adapter = connections[connection]
+            decoder.feed(bytearray(data), adapter)
+            size += len(data)
+
+        elif recordType == CLOSE:
+            connections.pop(connection, None)
+
+    return size, timer() - start
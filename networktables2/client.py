@@ -1,8 +1,10 @@
 
 from . import _impl
+from .capture import CaptureStreamFactory
 from .common import *
 from .connection import *
 from .entry import NetworkTableEntry
+from .metrics import ConnectionMetrics
 from .networktablenode import NetworkTableNode
 from .type import NetworkTableEntryTypeManager
 
@@ -126,6 +128,9 @@ class ClientConnectionAdapter:
         self.connectionState = DISCONNECTED_FROM_SERVER
         self.connectionLock = _impl.create_rlock('client_conn_lock')
         
+        # counts the data sent and received over every connection
+        self.metrics = ConnectionMetrics(str(self))
+        
     def __str__(self):
         return 'Client 0x%08x' % id(self)
     
@@ -158,7 +163,8 @@ class ClientConnectionAdapter:
                 stream = self.streamFactory.createStream()
                 if stream is None:
                     return
-                self.connection = NetworkTableConnection(stream, self.typeManager)
+                self.connection = NetworkTableConnection(stream, self.typeManager,
+                                                         self.metrics)
                 self.readManager = ReadManager(self,
                         self.connection, name="Client Connection Reader Thread")
                 self.readManager.start()
@@ -210,26 +216,26 @@ class ClientConnectionAdapter:
                                       "to the server (state is %s)" % self.connectionState)
 
     def offerIncomingAssignment(self, entry):
+        self.metrics.transactionsReceived += 1
         self.entryStore.offerIncomingAssignment(entry)
 
     def offerIncomingUpdate(self, entry, sequenceNumber, value):
+        self.metrics.transactionsReceived += 1
         self.entryStore.offerIncomingUpdate(entry, sequenceNumber, value)
 
-    def sendEntry(self, entryBytes):
+    def sendEntries(self, data, assignments=(), updates=()):
+        """Send messages to the server
+        :param data: bytes-like object holding the messages
+        :param assignments: the entries assigned by the messages
+        :param updates: the entries updated by the messages
+        """
         try:
             with self.connectionLock:
                 if self.connectionState == IN_SYNC_WITH_SERVER:
-                    self.connection.sendEntry(entryBytes)
+                    self.connection.sendEntries(data)
+                    self.metrics.transactionsSent += len(assignments) + len(updates)
         except IOError as e:
             self.ioError(e)
-    
-    def flush(self):
-        with self.connectionLock:
-            if self.connection is not None:
-                try:
-                    self.connection.flush()
-                except IOError as e:
-                    self.ioError(e)
 
     def ensureAlive(self):
         with self.connectionLock:
@@ -261,7 +267,7 @@ class ClientNetworkTableEntryStore(AbstractNetworkTableEntryStore):
             else:
                 if newEntry.getId() != NetworkTableEntry.UNKNOWN_ID:
                     self.idEntries[newEntry.getId()] = newEntry
-                self.namedEntries[newEntry.name] = newEntry
+                self._addNamedEntry(newEntry)
         return True
 
     def updateEntry(self, entry, sequenceNumber, value):
@@ -275,16 +281,15 @@ class ClientNetworkTableEntryStore(AbstractNetworkTableEntryStore):
         """Send all unknown entries in the entry store to the given connection
         :param connection:
         """
-        transaction = []
+        transaction = bytearray()
         with self.entry_lock:
-            # Cannot hold the entry lock when calling sendEntry
+            # Cannot hold the entry lock when calling sendEntries
             for entry in self.namedEntries.values():
                 if entry.getId() == NetworkTableEntry.UNKNOWN_ID:
-                    transaction.append(entry.getAssignmentBytes())
-                    
-        for entry in transaction:
-            connection.sendEntry(entry)
-        connection.flush()
+                    entry.writeAssignmentBytes(transaction)
+        
+        if transaction:
+            connection.sendEntries(transaction)
 
 class NetworkTableClient(NetworkTableNode):
     """A client node in NetworkTables 2.0
@@ -297,10 +302,11 @@ class NetworkTableClient(NetworkTableNode):
         :param streamFactory:
         """
         NetworkTableNode.__init__(self, ClientNetworkTableEntryStore(self))
-        typeManager = NetworkTableEntryTypeManager()
+        self.typeManager = NetworkTableEntryTypeManager()
         self.adapter = ClientConnectionAdapter(self.entryStore, streamFactory,
-                                               self, typeManager)
-        self.writeManager = WriteManager(self.adapter, self.entryStore, 1.0)
+                                               self, self.typeManager)
+        self.writeManager = WriteManager(self.adapter, self.entryStore, 1.0,
+                                         self.metrics)
 
         self.entryStore.setOutgoingReceiver(self.writeManager)
         self.entryStore.setIncomingReceiver(None)
@@ -317,7 +323,10 @@ class NetworkTableClient(NetworkTableNode):
 
     def stop(self):
         self.writeManager.stop()
+        self._stopListenerThreads()
+        self.setMetricsPublishing(None)
         self.close()
+        self.stopCapture()
         
     def getRemoteAddress(self):
         return self.adapter.getRemoteAddress()
@@ -325,5 +334,16 @@ class NetworkTableClient(NetworkTableNode):
     def isConnected(self):
         return self.adapter.isConnected()
 
+    def _getConnectionMetrics(self):
+        return (self.adapter.metrics,)
+
+    def _setCapture(self, writer):
+        factory = self.adapter.streamFactory
+        if isinstance(factory, CaptureStreamFactory):
+            factory = factory.factory
+        if writer is not None:
+            factory = CaptureStreamFactory(factory, writer)
+        self.adapter.streamFactory = factory
+
     def isServer(self):
         return False
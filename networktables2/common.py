@@ -6,9 +6,14 @@ import warnings
 
 from . import _impl
 from .entry import NetworkTableEntry
+from .metrics import NodeMetrics, timer
+from .prefixindex import PrefixIndex
 
 __all__ = ["AbstractNetworkTableEntryStore", "WriteManager"]
 
+# Python 2 memoryviews cannot be released
+_MEMORYVIEW_RELEASE = hasattr(memoryview, 'release')
+
 class AbstractNetworkTableEntryStore:
     """An entry store that handles storing entries and applying transactions
     """
@@ -16,6 +21,8 @@ class AbstractNetworkTableEntryStore:
     def __init__(self, listenerManager):
         self.idEntries = {}
         self.namedEntries = {}
+        # index of entries by name, for finding entries in a subtable
+        self.nameIndex = PrefixIndex()
         self.listenerManager = listenerManager
         self.outgoingReceiver = None
         self.incomingReceiver = None
@@ -25,12 +32,15 @@ class AbstractNetworkTableEntryStore:
         """Get an entry based on its name or id
         :param name_id: the name or id of the entry to look for
         :returns: the entry or None if the entry does not exist
+        
+        .. note:: This does not acquire the entry lock. Dictionary lookups
+                  are atomic, and entries are only ever replaced as a whole
+                  in the dictionaries, so a lookup is always consistent.
         """
-        with self.entry_lock:
-            if isinstance(name_id, str):
-                return self.namedEntries.get(name_id)
-            else:
-                return self.idEntries.get(name_id)
+        if isinstance(name_id, str):
+            return self.namedEntries.get(name_id)
+        else:
+            return self.idEntries.get(name_id)
 
     def keys(self):
         """Get the list of keys.
@@ -48,6 +58,7 @@ class AbstractNetworkTableEntryStore:
         with self.entry_lock:
             self.idEntries.clear()
             self.namedEntries.clear()
+            self.nameIndex.clear()
 
     def clearIds(self):
         """clear the id's of all entries
@@ -66,6 +77,46 @@ class AbstractNetworkTableEntryStore:
     def addEntry(self, entry):
         raise NotImplementedError
 
+    def _addNamedEntry(self, entry):
+        # This is always called with the entry lock held
+        self.namedEntries[entry.name] = entry
+        self.nameIndex.add(entry.name, entry)
+
+    def containsPrefix(self, prefix):
+        """:param prefix: the prefix, which must end with a path separator
+        :returns: True if the name of an entry starts with the prefix
+        """
+        with self.entry_lock:
+            return self.nameIndex.containsPrefix(prefix)
+
+    def getValues(self, names):
+        """Get the values of multiple entries while holding the entry lock
+        once, so that none of the values change while they are read
+
+        :param names: the names of the entries
+        :returns: a dictionary of names and values. Entries that do not
+                  exist are not included.
+        """
+        values = {}
+        with self.entry_lock:
+            get = self.namedEntries.get
+            for name in names:
+                entry = get(name)
+                if entry is not None:
+                    values[name] = entry.getValue()
+        return values
+
+    def getValuesWithPrefix(self, prefix):
+        """Get the values of all entries whose names start with a prefix
+        while holding the entry lock once
+
+        :param prefix: the prefix, which must end with a path separator
+        :returns: a dictionary of names and values
+        """
+        with self.entry_lock:
+            return dict((entry.name, entry.getValue())
+                        for entry in self.nameIndex.valuesUnder(prefix))
+
     def updateEntry(self, entry, sequenceNumber, value):
         raise NotImplementedError
 
@@ -81,36 +132,77 @@ class AbstractNetworkTableEntryStore:
         changed.
         """
         with self.entry_lock:
-            tableEntry = self.namedEntries.get(name)
-            if tableEntry is None:
-                if hasattr(type, 'internalizeValue'):
-                    value = type.internalizeValue(name, value, None)
-                
-                #TODO validate type
-                tableEntry = NetworkTableEntry(name, type, value)
-                if self.addEntry(tableEntry):
-                    tableEntry.fireListener(self.listenerManager)
-                    if self.outgoingReceiver is not None:
-                        self.outgoingReceiver.offerOutgoingAssignment(tableEntry)
-            else:
-                # Note: NetworkTables only allows the type to change on a new
-                #       assignment, and existing server implementations ignore
-                #       assignment if the entry already exists. This means we 
-                #       have to raise an error here, instead of changing the type
-                if tableEntry.getType().id != type.id:
-                    raise TypeError("Cannot put %s '%s', existing value in table is a %s" % (
-                                     tableEntry.getType().name, tableEntry.name,
-                                     type.name))
-                currentValue = tableEntry.getValue() 
-                if value != currentValue:
-                    
-                    if hasattr(type, 'internalizeValue'):
-                        value = type.internalizeValue(name, value, currentValue)
-                    
-                    if self.updateEntry(tableEntry, tableEntry.getSequenceNumber()+1, value):
-                        if self.outgoingReceiver is not None:
-                            self.outgoingReceiver.offerOutgoingUpdate(tableEntry)
-                    tableEntry.fireListener(self.listenerManager)
+            tableEntry, type, value = self._internalizeOutgoing(name, type, value)
+            assignments = []
+            updates = []
+            self._applyOutgoing(name, tableEntry, type, value, assignments, updates)
+            self._offerOutgoing(assignments, updates)
+
+    def putOutgoingValues(self, values):
+        """Stores multiple values while holding the entry lock once, and
+        queues them for transmission to the remote end together. If any of
+        the values cannot be stored, none of them are.
+
+        :param values: A sequence of (name, type, value) tuples
+        """
+        with self.entry_lock:
+            # internalize all values first, which raises an error if a
+            # value cannot be stored
+            values = [(name,) + self._internalizeOutgoing(name, type, value)
+                      for name, type, value in values]
+            
+            assignments = []
+            updates = []
+            for name, tableEntry, type, value in values:
+                if tableEntry is None:
+                    # an earlier value may have created the entry
+                    tableEntry = self.namedEntries.get(name)
+                self._applyOutgoing(name, tableEntry, type, value, assignments, updates)
+            self._offerOutgoing(assignments, updates)
+
+    def _internalizeOutgoing(self, name, type, value):
+        # This is always called with the entry lock held
+        # -> returns the existing entry (or None), the type that the value
+        #    is stored as, and the internal value
+        tableEntry = self.namedEntries.get(name)
+        if tableEntry is None:
+            if hasattr(type, 'internalizeValue'):
+                value = type.internalizeValue(name, value, None)
+            #TODO validate type
+        else:
+            # Note: NetworkTables only allows the type to change on a new
+            #       assignment, and existing server implementations ignore
+            #       assignment if the entry already exists. This means we 
+            #       have to raise an error here, instead of changing the type
+            if tableEntry.getType().id != type.id:
+                raise TypeError("Cannot put %s '%s', existing value in table is a %s" % (
+                                 tableEntry.getType().name, tableEntry.name,
+                                 type.name))
+            
+            # the entry may use a different representation of the type
+            # (see NetworkTableEntryTypeManager.setNumpyArrays)
+            type = tableEntry.getType()
+            if hasattr(type, 'internalizeValue'):
+                value = type.internalizeValue(name, value, tableEntry.getValue())
+        return tableEntry, type, value
+
+    def _applyOutgoing(self, name, tableEntry, type, value, assignments, updates):
+        # This is always called with the entry lock held
+        # -> entries that need to be sent are appended to assignments/updates
+        if tableEntry is None:
+            tableEntry = NetworkTableEntry(name, type, value)
+            if self.addEntry(tableEntry):
+                tableEntry.fireListener(self.listenerManager)
+                assignments.append(tableEntry)
+        elif not type.valueEquals(value, tableEntry.getValue()):
+            if self.updateEntry(tableEntry, tableEntry.getSequenceNumber()+1, value):
+                updates.append(tableEntry)
+            tableEntry.fireListener(self.listenerManager)
+
+    def _offerOutgoing(self, assignments, updates):
+        # This is always called with the entry lock held
+        if self.outgoingReceiver is not None and (assignments or updates):
+            self.outgoingReceiver.offerOutgoingTransactions(assignments, updates)
 
     def offerIncomingAssignment(self, entry):
         '''Called when a remote NT wants to assign a value to our table'''
@@ -131,35 +223,76 @@ class AbstractNetworkTableEntryStore:
                 if self.incomingReceiver is not None:
                     self.incomingReceiver.offerOutgoingUpdate(entry)
 
-    def notifyEntries(self, table, listener):
+    def notifyEntries(self, table, listener, prefix=None):
         """Called to say that a listener should notify the listener manager
         of all of the entries
         :param listener:
         :param table:
+        :param prefix: if specified, only entries whose names start with
+                       this prefix are notified
         """
         with self.entry_lock:
-            for entry in self.namedEntries.values():
+            if prefix is None:
+                entries = self.namedEntries.values()
+            else:
+                entries = self.nameIndex.valuesUnder(prefix)
+            for entry in entries:
+                listener.valueChanged(table, entry.name, entry.getValue(), True)
+
+    def notifyEntry(self, table, listener, name):
+        """Called to say that a listener should notify the listener manager
+        of an entry, if it exists
+        :param listener:
+        :param table:
+        :param name: the name of the entry
+        """
+        with self.entry_lock:
+            entry = self.namedEntries.get(name)
+            if entry is not None:
                 listener.valueChanged(table, entry.name, entry.getValue(), True)
 
 class WriteManager:
     """A write manager is a IncomingEntryReceiver that buffers transactions
     and then dispatches them to a flushable transaction receiver that is
     periodically offered all queued transaction and then flushed
+    
+    By default transactions are flushed every ``flushPeriod`` seconds. In
+    adaptive mode (see :meth:`setAdaptiveFlush`), the write thread sleeps
+    until a transaction is queued, and then flushes it immediately if
+    nothing has been written for ``minFlushInterval`` seconds. Otherwise
+    it waits until that much time has passed (or ``maxBatchSize``
+    transactions are queued), so that transactions are coalesced when the
+    link is busy.
     """
     SLEEP_TIME = 0.050
     
+    MIN_FLUSH_INTERVAL = 0.010
+    
     queueSize = 500
 
-    def __init__(self, receiver, entryStore, keepAliveDelay):
+    def __init__(self, receiver, entryStore, keepAliveDelay, metrics=None):
         """Create a new Write manager
         :param receiver:
         :type receiver: :class:`.ServerConnectionList`, :class:`.ClientConnectionAdapter`
         :param entryStore:
+        :param metrics: records the size and duration of each flush
+        :type  metrics: :class:`.NodeMetrics`
         """
         self.receiver = receiver
         self.entryStore = entryStore
         self.keepAliveDelay = keepAliveDelay
+        self.metrics = metrics if metrics is not None else NodeMetrics()
         self.lastWrite = 0
+        # time that data was last sent, which the adaptive mode waits
+        # minFlushInterval after. It is 0 until the first flush, so that
+        # the first change is sent immediately.
+        self.lastFlush = 0
+        
+        self.flushPeriod = self.SLEEP_TIME
+        self.adaptive = False
+        self.minFlushInterval = self.MIN_FLUSH_INTERVAL
+        self.maxBatchSize = self.queueSize
+        self.flushRequested = False
 
         self.transactionsLock = _impl.create_rlock('trans_lock')
         self.transactionsCondition = threading.Condition(self.transactionsLock)
@@ -168,6 +301,10 @@ class WriteManager:
         self.incomingUpdateQueue = []
         self.outgoingAssignmentQueue = []
         self.outgoingUpdateQueue = []
+        
+        # all transactions for a flush are written to this buffer, which
+        # is reused for each flush
+        self.sendBuffer = bytearray()
 
         self.thread = None
         self.running = False
@@ -178,6 +315,7 @@ class WriteManager:
         if self.thread is not None:
             self.stop()
         self.lastWrite = time.time()
+        self.lastFlush = 0
         self.running = True
         self.thread = threading.Thread(target=self.run,
                                        name="Write Manager Thread")
@@ -193,34 +331,116 @@ class WriteManager:
                 self.transactionsCondition.notify()
             self.thread.join()
 
-    def offerOutgoingAssignment(self, entry):
-        # This is always called with the entry lock held
+    def setFlushPeriod(self, flushPeriod):
+        """Flush queued transactions every flushPeriod seconds (this is the
+        default mode)
         
-        # Mark entry as dirty to avoid duplicate updates
-        if entry.isDirty:
-            return
-        entry.makeDirty()
+        :param flushPeriod: Write flush period in seconds
+        """
+        with self.transactionsLock:
+            self.flushPeriod = flushPeriod
+            self.adaptive = False
+            self.transactionsCondition.notify()
 
+    def setAdaptiveFlush(self, minFlushInterval=MIN_FLUSH_INTERVAL, maxBatchSize=None):
+        """Flush queued transactions as soon as possible, but no more often
+        than every minFlushInterval seconds unless maxBatchSize transactions
+        are waiting to be sent
+        
+        :param minFlushInterval: Minimum time between flushes in seconds
+        :param maxBatchSize: Number of queued transactions that causes an
+                             immediate flush. Defaults to :attr:`queueSize`
+        """
         with self.transactionsLock:
-            self.incomingAssignmentQueue.append(entry)
-            if len(self.incomingAssignmentQueue) >= self.queueSize:
-                warnings.warn("assignment queue overflowed. decrease the rate at which you create new entries or increase the write buffer size", ResourceWarning)
+            self.minFlushInterval = minFlushInterval
+            self.maxBatchSize = self.queueSize if maxBatchSize is None else maxBatchSize
+            self.adaptive = True
+            self.transactionsCondition.notify()
+
+    def _queuedCount(self):
+        return len(self.incomingAssignmentQueue) + len(self.incomingUpdateQueue)
+
+    def _notifyQueued(self, previous):
+        # This is always called with the transactions lock held
+        if self.adaptive:
+            queued = self._queuedCount()
+            if previous == 0 or queued >= self.maxBatchSize:
                 self.transactionsCondition.notify()
 
+    def flush(self):
+        """Send queued transactions as soon as possible, instead of waiting
+        for the next flush
+        """
+        with self.transactionsLock:
+            self.flushRequested = True
+            self.transactionsCondition.notify()
+
+    def offerOutgoingAssignment(self, entry):
+        # This is always called with the entry lock held
+        self.offerOutgoingTransactions((entry,), ())
+
     def offerOutgoingUpdate(self, entry):
         # This is always called with the entry lock held
+        self.offerOutgoingTransactions((), (entry,))
+
+    def offerOutgoingTransactions(self, assignments, updates):
+        """Queue assignments and updates to be sent together
+        :param assignments: entries to send assignments for
+        :param updates: entries to send updates for
+        """
+        # This is always called with the entry lock held
+        
+        # Mark entries as dirty to avoid duplicate updates
+        assignments = [entry for entry in assignments if not entry.isDirty]
+        for entry in assignments:
+            entry.makeDirty()
+        updates = [entry for entry in updates if not entry.isDirty]
+        for entry in updates:
+            entry.makeDirty()
         
-        # Mark entry as dirty to avoid duplicate updates
-        if entry.isDirty:
+        if not assignments and not updates:
             return
-        entry.makeDirty()
 
         with self.transactionsLock:
-            self.incomingUpdateQueue.append(entry)
-            if len(self.incomingUpdateQueue) >= self.queueSize:
+            previous = self._queuedCount()
+            self.incomingAssignmentQueue.extend(assignments)
+            self.incomingUpdateQueue.extend(updates)
+            self._notifyQueued(previous)
+            if assignments and len(self.incomingAssignmentQueue) >= self.queueSize:
+                warnings.warn("assignment queue overflowed. decrease the rate at which you create new entries or increase the write buffer size", ResourceWarning)
+                self.transactionsCondition.notify()
+            if updates and len(self.incomingUpdateQueue) >= self.queueSize:
                 warnings.warn("update queue overflowed. decrease the rate at which you update entries or increase the write buffer size", ResourceWarning)
                 self.transactionsCondition.notify()
 
+    def _waitForFlush(self):
+        # This is always called with the transactions lock held
+        if self.flushRequested:
+            return
+        
+        if not self.adaptive:
+            self.transactionsCondition.wait(self.flushPeriod)
+            return
+        
+        # sleep until something is queued or a keep alive is due
+        while self.running and self.adaptive and self._queuedCount() == 0 and \
+              not self.flushRequested:
+            timeout = None
+            if self.keepAliveDelay is not None:
+                timeout = self.lastWrite + self.keepAliveDelay - time.time()
+                if timeout <= 0:
+                    return
+            self.transactionsCondition.wait(timeout)
+        
+        # if the link is busy, wait a bit to coalesce transactions
+        deadline = self.lastFlush + self.minFlushInterval
+        while self.running and self.adaptive and self._queuedCount() < self.maxBatchSize and \
+              not self.flushRequested:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            self.transactionsCondition.wait(timeout)
+
     def run(self):
         """the periodic method that sends all buffered transactions
         """
@@ -228,11 +448,13 @@ class WriteManager:
             
             with self.transactionsLock:
                 
-                self.transactionsCondition.wait(self.SLEEP_TIME)
+                self._waitForFlush()
                 
                 if not self.running:
                     break
                 
+                self.flushRequested = False
+                
                 #swap the assignment and update queue
                 self.incomingAssignmentQueue, self.outgoingAssignmentQueue = \
                     self.outgoingAssignmentQueue, self.incomingAssignmentQueue
@@ -244,28 +466,43 @@ class WriteManager:
             #           of one big lock. This allows the main thread to not
             #           be interrupted for an extended period of time
             
-            transactions = []
+            transactions = self.sendBuffer
+            start = timer()
     
             for entry in self.outgoingAssignmentQueue:
                 with self.entryStore.entry_lock:
                     entry.makeClean()
-                    transactions.append(entry.getAssignmentBytes())
+                    entry.writeAssignmentBytes(transactions)
                     
             for entry in self.outgoingUpdateQueue:
                 with self.entryStore.entry_lock:
                     entry.makeClean()
-                    transactions.append(entry.getUpdateBytes())
+                    entry.writeUpdateBytes(transactions)
                 
-            del self.outgoingAssignmentQueue[:]
-            del self.outgoingUpdateQueue[:]
-    
-            for entry in transactions:
-                self.receiver.sendEntry(entry)
-    
             if len(transactions) > 0:
-                self.receiver.flush()
-                self.lastWrite = time.time()
+                if _MEMORYVIEW_RELEASE:
+                    # The view must be released before the buffer can be reused
+                    view = memoryview(transactions)
+                    try:
+                        self.receiver.sendEntries(view, self.outgoingAssignmentQueue,
+                                                  self.outgoingUpdateQueue)
+                    finally:
+                        view.release()
+                else:
+                    # Python 2 file objects cannot write a memoryview
+                    self.receiver.sendEntries(bytes(transactions),
+                                              self.outgoingAssignmentQueue,
+                                              self.outgoingUpdateQueue)
+                del transactions[:]
+                self.lastWrite = self.lastFlush = time.time()
+                
+                self.metrics.flushDuration.record(timer() - start)
+                self.metrics.flushQueueDepth.record(len(self.outgoingAssignmentQueue) +
+                                                    len(self.outgoingUpdateQueue))
             elif (self.keepAliveDelay is not None and
                   (time.time()-self.lastWrite) > self.keepAliveDelay):
                 self.receiver.ensureAlive()
                 self.lastWrite = time.time()
+            
+            del self.outgoingAssignmentQueue[:]
+            del self.outgoingUpdateQueue[:]
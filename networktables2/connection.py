@@ -1,112 +1,121 @@
 
+import collections
+import errno
+import socket
 import threading
 
+try:
+    import selectors
+except ImportError:
+    selectors = None
+
 from . import _impl
-from .entry import NetworkTableEntry
+from .decoder import MessageDecoder
 from .messages import *
+from .metrics import ConnectionMetrics
 
 __all__ = ["BadMessageError", "StreamEOF", "NetworkTableConnection",
-           "ReadManager", "PROTOCOL_REVISION"]
+           "ReadManager", "SelectReadManager", "PROTOCOL_REVISION"]
 
 class StreamEOF(IOError):
     pass
 
-class ReadStream:
-    def __init__(self, f):
-        self.f = f
-
-    def read(self, size=-1):
-        data = self.f.read(size)
-        if size is not None and size > 0 and len(data) != size:
-            raise StreamEOF("end of file")
-        return data
-
-    def readStruct(self, s):
-        data = self.f.read(s.size)
-        if len(data) != s.size:
-            raise StreamEOF("end of file")
-        return s.unpack(data)
-
 class NetworkTableConnection:
     """An abstraction for the NetworkTable protocol
     """
-    def __init__(self, stream, typeManager):
+
+    # Maximum number of bytes to receive at once
+    RECV_SIZE = 4096
+
+    def __init__(self, stream, typeManager, metrics=None):
+        """
+        :param stream:
+        :param typeManager:
+        :param metrics: counts the data sent and received
+        :type  metrics: :class:`.ConnectionMetrics`
+        """
         self.stream = stream
-        self.rstream = ReadStream(stream.getInputStream())
+        self.rbuffer = bytearray(self.RECV_SIZE)
+        self.decoder = MessageDecoder(typeManager)
         self.wstream = stream.getOutputStream()
         self.typeManager = typeManager
         self.write_lock = _impl.create_rlock('write_lock')
         self.isValid = True
+        self.metrics = metrics if metrics is not None else ConnectionMetrics(str(stream))
 
     def close(self):
         if self.isValid:
             self.isValid = False
             self.stream.close()
 
-    def flush(self):
+    def _send(self, data):
         with self.write_lock:
+            self.wstream.write(data)
             self.wstream.flush()
+            self.metrics.bytesSent += len(data)
 
     def sendKeepAlive(self):
-        with self.write_lock:
-            self.wstream.write(KEEP_ALIVE.getBytes())
-            self.wstream.flush()
+        self._send(KEEP_ALIVE.getBytes())
 
     def sendClientHello(self):
-        with self.write_lock:
-            self.wstream.write(CLIENT_HELLO.getBytes(PROTOCOL_REVISION))
-            self.wstream.flush()
+        self._send(CLIENT_HELLO.getBytes(PROTOCOL_REVISION))
 
     def sendServerHelloComplete(self):
-        with self.write_lock:
-            self.wstream.write(SERVER_HELLO_COMPLETE.getBytes())
-            self.wstream.flush()
+        self._send(SERVER_HELLO_COMPLETE.getBytes())
 
     def sendProtocolVersionUnsupported(self):
+        self._send(PROTOCOL_UNSUPPORTED.getBytes(PROTOCOL_REVISION))
+
+    def sendEntries(self, *data):
+        """Sends blocks of messages (usually entry assignments and updates)
+        to the remote end in a single write
+        
+        :param data: bytes-like objects holding the messages
+        """
         with self.write_lock:
-            self.wstream.write(PROTOCOL_UNSUPPORTED.getBytes(PROTOCOL_REVISION))
+            size = 0
+            for block in data:
+                self.wstream.write(block)
+                size += len(block)
             self.wstream.flush()
+            self.metrics.bytesSent += size
 
-    def sendEntry(self, entryBytes):
-        # use entry.getAssignBytes or entry.getUpdateBytes
+    def sendAvailable(self, data):
+        """Sends as much of the blocks of messages as the stream accepts
+        without waiting, for a non-blocking stream
+        
+        :param data: a list of bytes-like objects. The blocks that were sent
+                     are removed from it, and a block that was partly sent
+                     is replaced by the rest of it.
+        :returns: True if all of the data was sent
+        """
         with self.write_lock:
-            self.wstream.write(entryBytes)
+            while data:
+                sent = self.stream.send(data)
+                if not sent:
+                    return False
+                self.metrics.bytesSent += sent
+                
+                # skip the blocks that were completely sent
+                i = 0
+                while i < len(data) and sent >= len(data[i]):
+                    sent -= len(data[i])
+                    i += 1
+                del data[:i]
+                if data and sent:
+                    data[0] = memoryview(data[0])[sent:]
+        return True
     
     def read(self, adapter):
-        messageType = self.rstream.read(1)
-        if messageType == KEEP_ALIVE.HEADER:
-            adapter.keepAlive()
-            
-        elif messageType == CLIENT_HELLO.HEADER:
-            protocolRevision = CLIENT_HELLO.read(self.rstream)[0]
-            adapter.clientHello(protocolRevision)
-            
-        elif messageType == SERVER_HELLO_COMPLETE.HEADER:
-            adapter.serverHelloComplete()
-            
-        elif messageType == PROTOCOL_UNSUPPORTED.HEADER:
-            protocolRevision = PROTOCOL_UNSUPPORTED.read(self.rstream)[0]
-            adapter.protocolVersionUnsupported(protocolRevision)
-            
-        elif messageType == ENTRY_ASSIGNMENT.HEADER:
-            entryName, (typeId, entryId, entrySequenceNumber) = \
-                    ENTRY_ASSIGNMENT.read(self.rstream)
-            entryType = self.typeManager.getType(typeId)
-            if entryType is None:
-                raise BadMessageError("Unknown data type: 0x%x" % typeId)
-            value = entryType.readValue(self.rstream)
-            adapter.offerIncomingAssignment(NetworkTableEntry(entryName, entryType, value, id=entryId, sequenceNumber=entrySequenceNumber))
-            
-        elif messageType == FIELD_UPDATE.HEADER:
-            entryId, entrySequenceNumber = FIELD_UPDATE.read(self.rstream)
-            entry = adapter.getEntry(entryId)
-            if entry is None:
-                raise BadMessageError("Received update for unknown entry id: %d " % entryId)
-            value = entry.getType().readValue(self.rstream)
-            adapter.offerIncomingUpdate(entry, entrySequenceNumber, value)
-            
-        else:
-            raise BadMessageError("Unknown Network Table Message Type: %s" % (messageType))
+        """Receives whatever data is available from the stream, blocking
+        until there is some, and passes each complete message to the
+        adapter. Any partial message is kept until the rest of it arrives.
+        """
+        size = self.stream.recv_into(self.rbuffer)
+        if size == 0:
+            raise StreamEOF("end of file")
+        self.metrics.bytesReceived += size
+        self.decoder.feed(self.rbuffer, adapter, size)
 
 class ReadManager:
     """A periodic thread that repeatedly reads from a connection
@@ -130,7 +139,11 @@ class ReadManager:
         self.thread.start()
 
     def stop(self):
+        """stop the read thread. The connection is closed, as that is the
+        only way to wake up the thread if it is blocked in a read
+        """
         self.running = False
+        self.connection.close()
         try:
             self.thread.join()
         except RuntimeError:
@@ -141,6 +154,231 @@ class ReadManager:
             try:
                 self.connection.read(self.adapter)
             except BadMessageError as e:
-                self.adapter.badMessage(e)
+                if self.running:
+                    self.adapter.badMessage(e)
             except IOError as e:
-                self.adapter.ioError(e)
+                if self.running:
+                    self.adapter.ioError(e)
+
+
+class SelectReadManager:
+    """Reads from and writes to any number of connections on a single
+    thread, using a selector to wait until one of them has data available
+    or can take more data, so that reads and writes never block. Use
+    :meth:`createReadManager` in place of :class:`ReadManager`, and pass
+    the manager to each :class:`.OutboundQueue`.
+    
+    The streams are made non-blocking, and must support ``fileno``,
+    ``setblocking`` and ``send``. The selector is only changed on the
+    manager's thread: other threads queue their changes and wake it up.
+    """
+    def __init__(self, name=None):
+        if selectors is None:
+            raise RuntimeError("selector mode requires the selectors module (python 3.4+)")
+        
+        self.selector = selectors.DefaultSelector()
+        self.running = False
+        
+        # used to wake up the selector when it needs to notice a change
+        self.wakeupReader, self.wakeupWriter = socket.socketpair()
+        self.wakeupReader.setblocking(False)
+        # a full socket means that a wakeup is already pending, and this
+        # is written to while locks are held
+        self.wakeupWriter.setblocking(False)
+        self.selector.register(self.wakeupReader, selectors.EVENT_READ, None)
+        
+        # (function, argument) pairs to call on the manager's thread.
+        # Appending to and popping from a deque are atomic, so this needs
+        # no lock.
+        self.requests = collections.deque()
+        # stream: _SelectChannel, only used on the manager's thread
+        self.channels = {}
+        
+        self.thread = threading.Thread(target=self.run, name=name)
+        self.thread.daemon = True
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup()
+        try:
+            self.thread.join()
+        except RuntimeError:
+            pass
+        self.selector.close()
+        self.wakeupReader.close()
+        self.wakeupWriter.close()
+
+    def wakeup(self):
+        try:
+            self.wakeupWriter.send(b'\x00')
+        except IOError:
+            pass
+
+    def createReadManager(self, adapter, connection, name=None):
+        """Creates an object with the same interface as :class:`ReadManager`
+        that reads from the connection on this manager's thread
+        
+        :param adapter:
+        :type  adapter: :class:`.ServerConncetionAdapter` or :class:`.ClientConnectionAdapter`
+        :param connection:
+        :type  connection: :class:`NetworkTableConnection`
+        :param name: ignored, all connections share a single thread
+        """
+        return _SelectReader(self, adapter, connection)
+
+    def register(self, reader):
+        self._request(self._addReader, reader)
+
+    def unregister(self, reader):
+        self._request(self._removeReader, reader)
+
+    def requestWrite(self, queue):
+        """Send the data queued by an :class:`.OutboundQueue` from the
+        manager's thread
+        """
+        self._request(self._write, queue)
+
+    def _request(self, function, arg):
+        self.requests.append((function, arg))
+        self.wakeup()
+
+    def _getChannel(self, stream):
+        channel = self.channels.get(stream)
+        if channel is None:
+            try:
+                stream.setblocking(False)
+            except IOError:
+                # the stream was already closed
+                return None
+            channel = self.channels[stream] = _SelectChannel(stream)
+        return channel
+
+    def _update(self, channel):
+        """Register the stream of a channel for the events it needs"""
+        events = 0
+        if channel.reader is not None:
+            events |= selectors.EVENT_READ
+        if channel.writing:
+            events |= selectors.EVENT_WRITE
+        if events == channel.events:
+            return
+        
+        try:
+            if not channel.events:
+                self.selector.register(channel.stream, events, channel)
+            elif not events:
+                self.selector.unregister(channel.stream)
+            else:
+                self.selector.modify(channel.stream, events, channel)
+        except (KeyError, ValueError, IOError):
+            # the stream was closed
+            return
+        channel.events = events
+
+    def _addReader(self, reader):
+        channel = self._getChannel(reader.connection.stream)
+        if channel is not None:
+            channel.reader = reader
+            self._update(channel)
+
+    def _removeReader(self, reader):
+        channel = self.channels.pop(reader.connection.stream, None)
+        if channel is not None and channel.events:
+            try:
+                self.selector.unregister(channel.stream)
+            except (KeyError, ValueError):
+                pass
+
+    def _write(self, queue):
+        stream = queue.connection.stream
+        if queue.running:
+            channel = self._getChannel(stream)
+        else:
+            channel = self.channels.get(stream)
+        if channel is not None:
+            channel.writer = queue
+            # wait until the stream is writable if it did not take all of
+            # the data
+            channel.writing = queue.running and not queue.sendQueued()
+            self._update(channel)
+
+    def run(self):
+        requests = self.requests
+        while self.running:
+            while requests:
+                function, arg = requests.popleft()
+                function(arg)
+            
+            try:
+                events = self.selector.select()
+            except (IOError, ValueError):
+                # the selector was closed out from under us
+                break
+            
+            for key, mask in events:
+                channel = key.data
+                if channel is None:
+                    try:
+                        while self.wakeupReader.recv(64):
+                            pass
+                    except IOError:
+                        pass
+                    continue
+                
+                if mask & selectors.EVENT_WRITE and channel.writer is not None:
+                    self._write(channel.writer)
+                reader = channel.reader
+                if mask & selectors.EVENT_READ and reader is not None and reader.running:
+                    reader.read()
+
+class _SelectChannel:
+    """The reader and the outbound queue of a stream registered with a
+    :class:`SelectReadManager`
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.reader = None
+        self.writer = None
+        # True while the writer has data that the stream did not take
+        self.writing = False
+        # the events that the stream is registered for
+        self.events = 0
+
+class _SelectReader:
+    """Reads from a single connection on behalf of a :class:`SelectReadManager`
+    """
+    def __init__(self, manager, adapter, connection):
+        self.manager = manager
+        self.adapter = adapter
+        self.connection = connection
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.manager.register(self)
+
+    def stop(self):
+        """stop reading, and close the connection as :meth:`ReadManager.stop`
+        does
+        """
+        if self.running:
+            self.running = False
+            self.manager.unregister(self)
+        self.connection.close()
+
+    def read(self):
+        try:
+            self.connection.read(self.adapter)
+        except BadMessageError as e:
+            self.stop()
+            self.adapter.badMessage(e)
+        except IOError as e:
+            # the stream is non-blocking, and had no data after all
+            if getattr(e, 'errno', None) in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            self.stop()
+            self.adapter.ioError(e)
@@ -0,0 +1,161 @@
+import struct
+
+from .entry import NetworkTableEntry
+from .messages import *
+
+__all__ = ["IncompleteMessage", "BufferReadStream", "MessageDecoder"]
+
+class IncompleteMessage(Exception):
+    """Raised when a buffer does not yet hold a complete message"""
+    pass
+
+class BufferReadStream:
+    """A ReadStream that reads from an in-memory buffer. Raises
+    :class:`IncompleteMessage` instead of blocking when it runs out of data
+    """
+    def __init__(self, buf, offset=0, end=None):
+        self.buf = buf
+        self.offset = offset
+        self.end = len(buf) if end is None else end
+
+    def read(self, size):
+        end = self.offset + size
+        if end > self.end:
+            raise IncompleteMessage()
+        data = bytes(self.buf[self.offset:end])
+        self.offset = end
+        return data
+
+    def readStruct(self, s):
+        end = self.offset + s.size
+        if end > self.end:
+            raise IncompleteMessage()
+        data = s.unpack_from(self.buf, self.offset)
+        self.offset = end
+        return data
+
+# message type ids
+_KEEP_ALIVE = ord(KEEP_ALIVE.HEADER)
+_CLIENT_HELLO = ord(CLIENT_HELLO.HEADER)
+_PROTOCOL_UNSUPPORTED = ord(PROTOCOL_UNSUPPORTED.HEADER)
+_SERVER_HELLO_COMPLETE = ord(SERVER_HELLO_COMPLETE.HEADER)
+_ENTRY_ASSIGNMENT = ord(ENTRY_ASSIGNMENT.HEADER)
+_FIELD_UPDATE = ord(FIELD_UPDATE.HEADER)
+
+class MessageDecoder:
+    """Decodes NetworkTables messages from data as it arrives, without
+    blocking. Give it whatever data was received from a stream via
+    :meth:`feed`, and every complete message is passed to the adapter.
+    A partial message at the end of the data is kept until the rest of it
+    is fed to the decoder.
+    """
+
+    _REVISION = struct.Struct('>H')
+    _NAME_LEN = ENTRY_ASSIGNMENT.NAME_LEN_STRUCT
+    _ASSIGNMENT = ENTRY_ASSIGNMENT.STRUCT
+    _UPDATE = FIELD_UPDATE.STRUCT
+
+    def __init__(self, typeManager):
+        self.typeManager = typeManager
+        self.pending = None
+
+    def feed(self, data, adapter, size=None):
+        """Decode received data
+
+        :param data: the data received from the stream
+        :type  data: bytes, bytearray or memoryview
+        :param adapter: the adapter that messages are passed to
+        :type  adapter: :class:`.ServerConncetionAdapter` or :class:`.ClientConnectionAdapter`
+        :param size: the number of bytes of data that are valid, defaults
+                     to all of them
+        """
+        if size is None:
+            size = len(data)
+
+        if self.pending is not None:
+            self.pending += data[:size]
+            data = self.pending
+            size = len(data)
+
+        offset = self.decode(data, 0, size, adapter)
+        if offset < size:
+            self.pending = bytearray(data[offset:size])
+        else:
+            self.pending = None
+
+    def decode(self, buf, offset, end, adapter):
+        """Decodes all complete messages in buf[offset:end], and passes
+        them to the adapter
+
+        :param buf: the data to decode. Other types than bytearray are
+                    copied into one, as indexing bytes on Python 2 does
+                    not give an int.
+        :returns: the offset of the first byte that was not consumed
+        """
+        if not isinstance(buf, bytearray):
+            buf = bytearray(buf)
+        getType = self.typeManager.getType
+        start = offset
+        try:
+            while offset < end:
+                start = offset
+                messageType = buf[offset]
+
+                if messageType == _FIELD_UPDATE:
+                    offset += 1 + self._UPDATE.size
+                    if offset > end:
+                        raise IncompleteMessage()
+                    entryId, entrySequenceNumber = self._UPDATE.unpack_from(buf, start + 1)
+                    entry = adapter.getEntry(entryId)
+                    if entry is None:
+                        raise BadMessageError("Received update for unknown entry id: %d " % entryId)
+                    value, offset = entry.getType().unpackFrom(buf, offset, end)
+                    adapter.offerIncomingUpdate(entry, entrySequenceNumber, value)
+
+                elif messageType == _ENTRY_ASSIGNMENT:
+                    offset += 1 + self._NAME_LEN.size
+                    if offset > end:
+                        raise IncompleteMessage()
+                    nameStart = offset
+                    nameEnd = nameStart + self._NAME_LEN.unpack_from(buf, start + 1)[0]
+                    offset = nameEnd + self._ASSIGNMENT.size
+                    if offset > end:
+                        raise IncompleteMessage()
+                    try:
+                        entryName = buf[nameStart:nameEnd].decode('utf-8')
+                    except UnicodeDecodeError as e:
+                        raise BadMessageError(e)
+                    typeId, entryId, entrySequenceNumber = self._ASSIGNMENT.unpack_from(buf, nameEnd)
+                    entryType = getType(typeId)
+                    if entryType is None:
+                        raise BadMessageError("Unknown data type: 0x%x" % typeId)
+                    value, offset = entryType.unpackFrom(buf, offset, end)
+                    adapter.offerIncomingAssignment(NetworkTableEntry(entryName, entryType, value, id=entryId, sequenceNumber=entrySequenceNumber))
+
+                elif messageType == _KEEP_ALIVE:
+                    offset += 1
+                    adapter.keepAlive()
+
+                elif messageType == _CLIENT_HELLO:
+                    offset += 1 + self._REVISION.size
+                    if offset > end:
+                        raise IncompleteMessage()
+                    adapter.clientHello(self._REVISION.unpack_from(buf, start + 1)[0])
+
+                elif messageType == _SERVER_HELLO_COMPLETE:
+                    offset += 1
+                    adapter.serverHelloComplete()
+
+                elif messageType == _PROTOCOL_UNSUPPORTED:
+                    offset += 1 + self._REVISION.size
+                    if offset > end:
+                        raise IncompleteMessage()
+                    adapter.protocolVersionUnsupported(self._REVISION.unpack_from(buf, start + 1)[0])
+
+                else:
+                    raise BadMessageError("Unknown Network Table Message Type: 0x%x" % messageType)
+
+        except IncompleteMessage:
+            return start
+
+        return offset
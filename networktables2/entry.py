@@ -1,12 +1,18 @@
 
 from .messages import ENTRY_ASSIGNMENT, FIELD_UPDATE
 
-class NetworkTableEntry:
+class NetworkTableEntry(object):
     """An entry in a network table
     """
+    # this is a new-style class, as __slots__ has no effect on Python 2
+    # classic classes
+
     # the id that represents that an id is unknown for an entry
     UNKNOWN_ID = 0xFFFF
     HALF_OF_CHAR = 32768
+    
+    __slots__ = ['id', 'name', 'sequenceNumber', 'type', 'value',
+                 'isNew', 'isDirty', '_assignment']
 
     def __init__(self, name, type, value, id=UNKNOWN_ID, sequenceNumber=0):
         """Create a new entry with the given id, name, sequence number, type
@@ -24,6 +30,10 @@ class NetworkTableEntry:
         self.value = value
         self.isNew = True
         self.isDirty = False
+        
+        # the entire encoded assignment message, which changes whenever
+        # the entry changes
+        self._assignment = None
 
     def getId(self):
         """:returns: the id of the entry
@@ -54,6 +64,7 @@ class NetworkTableEntry:
              (self.sequenceNumber - newSequenceNumber) > self.HALF_OF_CHAR)):
             self.value = newValue
             self.sequenceNumber = newSequenceNumber
+            self._assignment = None
             return True
         return False
 
@@ -64,10 +75,11 @@ class NetworkTableEntry:
         :param type:
         :param newValue:
         """
-        if type is not None:
+        if type is not None and type is not self.type:
             self.type = type
         self.value = newValue
         self.sequenceNumber = newSequenceNumber & 0xFFFF
+        self._assignment = None
 
     def makeDirty(self):
         self.isDirty = True
@@ -76,18 +88,43 @@ class NetworkTableEntry:
         self.isDirty = False
 
     def getAssignmentBytes(self):
-        """Get bytes for an assignment message"""
-        b = ENTRY_ASSIGNMENT.getBytes(self.name, self.type.id, self.id,
-                                      self.sequenceNumber)
-        self.type.writeBytes(b, self.value)
-        return b
+        """Get bytes for an assignment message. The bytes are cached until
+        the entry is changed.
+        
+        :rtype: bytes
+        """
+        assignment = self._assignment
+        if assignment is None:
+            b = ENTRY_ASSIGNMENT.getBytes(self.name, self.type.id, self.id,
+                                          self.sequenceNumber)
+            self.type.writeBytes(b, self.value)
+            assignment = self._assignment = bytes(b)
+        return assignment
         
     def getUpdateBytes(self):
         """Get bytes for an update message"""
-        b = FIELD_UPDATE.getBytes(self.id, self.sequenceNumber)
-        self.type.writeBytes(b, self.value)
+        b = bytearray()
+        self.writeUpdateBytes(b)
         return b
 
+    def writeAssignmentBytes(self, b):
+        """Append an assignment message to a bytearray. This uses the
+        cached message if there is one, but does not cache it, so that
+        only entries sent in a server hello keep a copy of their message.
+        """
+        assignment = self._assignment
+        if assignment is not None:
+            b.extend(assignment)
+        else:
+            ENTRY_ASSIGNMENT.writeBytes(b, self.name, self.type.id, self.id,
+                                        self.sequenceNumber)
+            self.type.writeBytes(b, self.value)
+
+    def writeUpdateBytes(self, b):
+        """Append an update message to a bytearray"""
+        FIELD_UPDATE.writeBytes(b, self.id, self.sequenceNumber)
+        self.type.writeBytes(b, self.value)
+
     def getSequenceNumber(self):
         """:returns: the current sequence number of the entry
         """
@@ -101,11 +138,13 @@ class NetworkTableEntry:
         if self.id != self.UNKNOWN_ID:
             raise ValueError("Cannot set the Id of a table entry that already has a valid id")
         self.id = id
+        self._assignment = None
 
     def clearId(self):
         """clear the id of the entry to unknown
         """
         self.id = self.UNKNOWN_ID
+        self._assignment = None
 
     def fireListener(self, listenerManager):
         #TODO determine best way to handle complex data
@@ -21,10 +21,14 @@ class Message:
             self.STRUCT = struct.Struct(STRUCT)
 
     def getBytes(self, *args):
-        b = bytearray(self.HEADER)
+        b = bytearray()
+        self.writeBytes(b, *args)
+        return b
+
+    def writeBytes(self, b, *args):
+        b.extend(self.HEADER)
         if self.STRUCT is not None:
             b.extend(self.STRUCT.pack(*args))
-        return b
     
     def read(self, rstream):
         return rstream.readStruct(self.STRUCT)
@@ -36,13 +40,17 @@ class NamedMessage(Message):
         Message.__init__(self, HEADER, STRUCT)
         
     def getBytes(self, name, *args):
-        b = bytearray(self.HEADER)
+        b = bytearray()
+        self.writeBytes(b, name, *args)
+        return b
+
+    def writeBytes(self, b, name, *args):
+        b.extend(self.HEADER)
         name = name.encode('utf-8')
         b.extend(self.NAME_LEN_STRUCT.pack(len(name)))
         b.extend(name)
         if self.STRUCT is not None:
             b.extend(self.STRUCT.pack(*args))
-        return b
 
     def read(self, rstream):
         nameLen = rstream.readStruct(self.NAME_LEN_STRUCT)[0]
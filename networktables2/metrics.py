@@ -0,0 +1,184 @@
+import threading
+import time
+
+import logging
+logger = logging.getLogger('nt')
+
+__all__ = ["Histogram", "ConnectionMetrics", "NodeMetrics",
+           "MetricsPublisher"]
+
+timer = getattr(time, 'perf_counter', time.time)
+
+class Histogram:
+    """Counts recorded values in buckets whose upper bounds double, so that
+    recording a value is cheap and the memory used is fixed. Percentiles
+    are estimated as the upper bound of the bucket that they fall in.
+
+    Recording is not locked, so counts may be slightly off when several
+    threads record values at the same time.
+    """
+
+    def __init__(self, unit=1e-6, buckets=32):
+        """
+        :param unit: the upper bound of the first bucket. Values are usually
+                     times in seconds, so this defaults to a microsecond
+        :param buckets: the number of buckets. The last bucket holds every
+                        value that is too large for the others
+        """
+        self.unit = unit
+        self.counts = [0] * buckets
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        i = int(value / self.unit).bit_length()
+        counts = self.counts
+        if i >= len(counts):
+            i = len(counts) - 1
+        counts[i] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def percentile(self, p):
+        """:param p: the percentile, from 0 to 100
+        :returns: an upper bound on the value, or 0 if nothing was recorded
+        """
+        target = self.count * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                return min(self.unit * 2**i, self.max)
+        return self.max
+
+    def getStats(self):
+        """:returns: a dictionary of the number of values recorded, and
+                     their mean, maximum and estimated percentiles
+        """
+        count = self.count
+        return {
+            'count': count,
+            'mean': float(self.total) / count if count else 0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+class ConnectionMetrics:
+    """Counts the data sent and received on a connection"""
+
+    def __init__(self, name):
+        self.name = name
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        # entry assignments and updates
+        self.transactionsSent = 0
+        self.transactionsReceived = 0
+
+    def getStats(self):
+        return {
+            'bytes_sent': self.bytesSent,
+            'bytes_received': self.bytesReceived,
+            'transactions_sent': self.transactionsSent,
+            'transactions_received': self.transactionsReceived,
+        }
+
+class NodeMetrics:
+    """Metrics collected by a node
+
+    * ``flushQueueDepth``: the number of transactions sent by each flush
+    * ``flushDuration``: the time taken to serialize and send each flush
+    * ``listenerDispatch``: the time taken to call the table listeners for
+      each change
+    * ``connects`` and ``disconnects``: the number of connections opened
+      and closed. For a client, connects after the first are reconnects.
+    """
+
+    def __init__(self):
+        self.flushQueueDepth = Histogram(unit=1, buckets=16)
+        self.flushDuration = Histogram()
+        self.listenerDispatch = Histogram()
+        self.connects = 0
+        self.disconnects = 0
+
+    def getStats(self, connections=()):
+        """:param connections: the :class:`ConnectionMetrics` of the node's
+                               current connections
+        :returns: a dictionary of all of the metrics
+        """
+        totals = ConnectionMetrics('total')
+        stats = {}
+        for connection in connections:
+            stats[connection.name] = connection.getStats()
+            totals.bytesSent += connection.bytesSent
+            totals.bytesReceived += connection.bytesReceived
+            totals.transactionsSent += connection.transactionsSent
+            totals.transactionsReceived += connection.transactionsReceived
+
+        return {
+            'flush_queue_depth': self.flushQueueDepth.getStats(),
+            'flush_duration': self.flushDuration.getStats(),
+            'listener_dispatch': self.listenerDispatch.getStats(),
+            'connects': self.connects,
+            'disconnects': self.disconnects,
+            'connections': stats,
+            'total': totals.getStats(),
+        }
+
+class MetricsPublisher:
+    """Periodically puts a node's metrics into a table, so that they can be
+    watched from a dashboard. Only the totals are published, not the
+    metrics of each connection, as connections come and go.
+    """
+
+    def __init__(self, node, period, prefix):
+        """
+        :param node: the node to publish the metrics of
+        :param period: time between updates in seconds
+        :param prefix: the table to publish to, ending with a path separator
+        """
+        self.node = node
+        self.period = period
+        self.prefix = prefix
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run,
+                                       name="Metrics Publisher Thread")
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def getValues(self):
+        """:returns: a dictionary of key to number for each metric"""
+        stats = self.node.getMetrics()
+        del stats['connections']
+        values = {}
+        for name, value in stats.items():
+            if isinstance(value, dict):
+                for field, v in value.items():
+                    values['%s%s/%s' % (self.prefix, name, field)] = float(v)
+            else:
+                values[self.prefix + name] = float(value)
+        return values
+
+    def run(self):
+        while not self.stopped.wait(self.period):
+            try:
+                self.node.putValues(self.getValues())
+            except Exception:
+                logger.exception("Error publishing metrics")
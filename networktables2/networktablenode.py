@@ -1,4 +1,25 @@
-from .type import DefaultEntryTypes, ComplexData, ComplexEntryType
+import os
+import socket
+
+from . import _impl
+from .capture import CaptureWriter
+from .common import WriteManager
+from .metrics import MetricsPublisher, NodeMetrics, timer
+from .notifier import LatestValueListener, ListenerNotifier
+from .prefixindex import PrefixIndex
+from .type import (
+    ArrayEntryType,
+    BooleanArray,
+    ComplexData,
+    ComplexEntryType,
+    DefaultEntryTypes,
+    NumberArray
+)
+
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
 
 import logging
 logger = logging.getLogger('nt')
@@ -10,6 +31,10 @@ except NameError:
 
 __all__ = ["NetworkTableNode"]
 
+# the table that metrics are published to by default. Each node publishes
+# to a subtable named for its role, see setMetricsPublishing
+METRICS_TABLE = '/.metrics/'
+
 class NetworkTableNode:
     """represents a node (either a client or a server) in a network tables 2.0
     """
@@ -18,12 +43,85 @@ class NetworkTableNode:
         self.entryStore = entryStore
         self.remoteListeners = []
         self.tableListeners = []
+        
+        # listeners that are only notified of changes to a single key,
+        # and the key that each listener was added with
+        self.keyListeners = {}
+        self.listenerKeys = {}
+        
+        # listeners that are only notified of changes to keys that start
+        # with a prefix, and the prefix that each listener was added with
+        self.prefixListeners = PrefixIndex()
+        self.listenerPrefixes = {}
+        self.listenerLock = _impl.create_rlock('listener_lock')
+        
+        # if set, table listeners are called by the notifier's thread
+        self.listenerNotifier = None
+        
+        self.metrics = NodeMetrics()
+        self.metricsPublisher = None
+        
+        # if set, data received from the network is recorded to it
+        self.captureWriter = None
 
     def getEntryStore(self):
         """:returns: the entry store used by this node
         """
         return self.entryStore
 
+    def setWriteFlushPeriod(self, flushPeriod):
+        """Flush queued writes to the network every flushPeriod seconds
+        (this is the default, with a period of 50ms)
+        
+        :param flushPeriod: Write flush period in seconds
+        """
+        self.writeManager.setFlushPeriod(flushPeriod)
+
+    def setAdaptiveWriteFlush(self, minFlushInterval=WriteManager.MIN_FLUSH_INTERVAL,
+                              maxBatchSize=None):
+        """Flush queued writes to the network as soon as they are made if
+        the network is idle, and coalesce them when it is busy
+        
+        :param minFlushInterval: Minimum time between flushes in seconds
+        :param maxBatchSize: Number of queued writes that causes an
+                             immediate flush
+        """
+        self.writeManager.setAdaptiveFlush(minFlushInterval, maxBatchSize)
+
+    def setAsyncListeners(self, enabled=True, maxQueueSize=1000,
+                          overflowPolicy=ListenerNotifier.DROP_OLDEST):
+        """Call table listeners from a dedicated thread instead of the
+        thread that changed the value, so that network reads and puts never
+        wait for listeners. See :class:`.ListenerNotifier` for the overflow
+        policies.
+        
+        :param enabled: True to call listeners asynchronously
+        :param maxQueueSize: Maximum number of queued notifications
+        :param overflowPolicy: What to do when the queue is full
+        """
+        notifier = None
+        if enabled:
+            notifier = ListenerNotifier(self.dispatchTableListeners,
+                                        maxQueueSize, overflowPolicy)
+            notifier.start()
+        
+        with self.listenerLock:
+            oldNotifier = self.listenerNotifier
+            self.listenerNotifier = notifier
+        
+        if oldNotifier is not None:
+            oldNotifier.stop()
+
+    def setNumpyArrays(self, enabled=True):
+        """Store boolean and number arrays as read-only NumPy arrays, so
+        that they can be retrieved by :meth:`retrieveArrayView` without
+        copying them. This should be set before the node is started, as
+        entries that already exist keep their current type.
+        
+        :param enabled: True to use NumPy arrays
+        """
+        self.typeManager.setNumpyArrays(enabled)
+
     def putBoolean(self, name, value):
         self.putValue(name, value, type=DefaultEntryTypes.BOOLEAN)
 
@@ -64,15 +162,34 @@ class NetworkTableNode:
     def putComplex(self, name, value):
         self.putValue(name, value, type=value.getType())
 
+    # Note: the getters do not acquire the entry lock. Entry values are
+    # immutable and are replaced (not modified) when they change, so a
+    # single read of entry.value is always a consistent snapshot.
+
     def retrieveValue(self, name, externalData):
-        with self.entryStore.entry_lock:
-            entry = self.entryStore.getEntry(name)
-            if entry is None:
-                raise KeyError(name)
-            entryType = entry.getType()
-            if not isinstance(entryType, ComplexEntryType):
-                raise TypeError("Cannot get complex data for '%s', is a %s" % (name, entryType.name))
-            entryType.exportValue(name, entry.getValue(), externalData)
+        entry = self.entryStore.getEntry(name)
+        if entry is None:
+            raise KeyError(name)
+        entryType = entry.getType()
+        if not isinstance(entryType, ComplexEntryType):
+            raise TypeError("Cannot get complex data for '%s', is a %s" % (name, entryType.name))
+        entryType.exportValue(name, entry.getValue(), externalData)
+
+    def retrieveArrayView(self, name):
+        """Get a boolean or number array as a read-only NumPy array. If
+        NumPy arrays are enabled (see :meth:`setNumpyArrays`), this returns
+        the stored value itself instead of a copy.
+        
+        :param name: the name of the entry
+        :returns: a read-only NumPy array
+        """
+        entry = self.entryStore.getEntry(name)
+        if entry is None:
+            raise KeyError(name)
+        entryType = entry.getType()
+        if not isinstance(entryType, ArrayEntryType):
+            raise TypeError("Cannot get array for '%s', is a %s" % (name, entryType.name))
+        return entryType.getView(entry.getValue())
 
     def putValue(self, name, value, type=None):
         """Put a value with a specific network table type
@@ -81,29 +198,66 @@ class NetworkTableNode:
         :param type: the type of the entry (if not provided, will be guessed)
         """
         if type is None:
-            # Guess type based on value
-            if isinstance(value, bool):
-                type = DefaultEntryTypes.BOOLEAN
-            elif isinstance(value, (float, int)):
-                type = DefaultEntryTypes.DOUBLE
-            elif isinstance(value, str_instance):
-                type = DefaultEntryTypes.STRING
-            elif isinstance(value, ComplexData):
-                type = value.getType()
-            elif value is None:
-                raise ValueError("Cannot put a null value into networktables")
-            else:
-                raise ValueError("Invalid Type")
+            type = self._guessType(value)
         
         self.entryStore.putOutgoing(name, type, value)
 
+    def putValues(self, values, flush=False):
+        """Put multiple values at once. The values are stored while holding
+        the entry lock once, and are sent to the remote end together. If any
+        of the values cannot be put, none of them are.
+        
+        :param values: a dictionary of entry names and values. The types
+                       of the values are guessed, as in :meth:`putValue`
+        :param flush: if True, the values are sent immediately instead of
+                      at the next write flush
+        """
+        self.entryStore.putOutgoingValues([(name, self._guessType(value), value)
+                                           for name, value in values.items()])
+        if flush:
+            self.writeManager.flush()
+
+    def _guessType(self, value):
+        if isinstance(value, bool):
+            return DefaultEntryTypes.BOOLEAN
+        elif isinstance(value, (float, int)):
+            return DefaultEntryTypes.DOUBLE
+        elif isinstance(value, str_instance):
+            return DefaultEntryTypes.STRING
+        elif isinstance(value, ComplexData):
+            return self.typeManager.getType(value.getType().id) or value.getType()
+        elif _np is not None and isinstance(value, _np.ndarray):
+            if value.dtype.kind == 'b':
+                return self.typeManager.getType(BooleanArray.BOOLEAN_ARRAY_RAW_ID)
+            elif value.dtype.kind in 'iuf':
+                return self.typeManager.getType(NumberArray.NUMBER_ARRAY_RAW_ID)
+            else:
+                raise ValueError("Cannot put an array of %s into networktables" % value.dtype)
+        elif value is None:
+            raise ValueError("Cannot put a null value into networktables")
+        else:
+            raise ValueError("Invalid Type")
+
     def getValue(self, name):
         #TODO don't allow get of complex types
-        with self.entryStore.entry_lock:
-            entry = self.entryStore.getEntry(name)
-            if entry is None:
-                raise KeyError(name)
-            return entry.getValue()
+        entry = self.entryStore.getEntry(name)
+        if entry is None:
+            raise KeyError(name)
+        return entry.getValue()
+
+    def getValues(self, names):
+        """:param names: the names of the entries
+        :returns: a dictionary of the names and values of the entries that
+                  exist, all read at the same time
+        """
+        return self.entryStore.getValues(names)
+
+    def getValuesWithPrefix(self, prefix):
+        """:param prefix: the prefix, which must end with a path separator
+        :returns: a dictionary of the names and values of all entries whose
+                  names start with the prefix, all read at the same time
+        """
+        return self.entryStore.getValuesWithPrefix(prefix)
 
     def containsKey(self, key):
         """:param key: the key to check for existence
@@ -114,6 +268,84 @@ class NetworkTableNode:
     def __contains__(self, key):
         return self.entryStore.getEntry(key) is not None
 
+    def getMetrics(self):
+        """Get the metrics collected by this node, see :class:`.NodeMetrics`.
+        Times are in seconds.
+        
+        :returns: a dictionary of metric name to value. Histograms are
+                  dictionaries of their count, mean, max and percentiles.
+                  ``'connections'`` holds the data sent and received by
+                  each current connection, and ``'total'`` their sums.
+        
+        Time spent waiting for locks is measured by lock profiling instead,
+        see :func:`._impl.enable_lock_profiling`.
+        """
+        return self.metrics.getStats(self._getConnectionMetrics())
+
+    def _getConnectionMetrics(self):
+        return ()
+
+    def _getMetricsName(self):
+        """:returns: the name of the table that this node publishes its
+                     metrics to by default"""
+        if self.isServer():
+            return 'server'
+        return 'client-%s-%d' % (socket.gethostname(), os.getpid())
+
+    def setMetricsPublishing(self, period=1.0, prefix=None):
+        """Periodically put this node's metrics into a table, so that they
+        can be watched from a dashboard. Each metric is a number, such as
+        ``/.metrics/server/flush_duration/p99``.
+        
+        :param period: time between updates in seconds, or None to stop
+                       publishing
+        :param prefix: the table to publish to. By default, a server
+                       publishes to ``/.metrics/server/``, and a client to
+                       ``/.metrics/client-<host name>-<process id>/``, so
+                       that nodes do not overwrite each other's metrics.
+        """
+        if prefix is None:
+            prefix = METRICS_TABLE + self._getMetricsName()
+        if not prefix.endswith('/'):
+            prefix += '/'
+        
+        publisher = None
+        if period is not None:
+            publisher = MetricsPublisher(self, period, prefix)
+            publisher.start()
+        
+        with self.listenerLock:
+            oldPublisher = self.metricsPublisher
+            self.metricsPublisher = publisher
+        
+        if oldPublisher is not None:
+            oldPublisher.stop()
+
+    def startCapture(self, path):
+        """Record the data that this node receives from the network to a
+        file, so that it can be replayed later with
+        :func:`.capture.replay`. Only connections made after this is
+        called are recorded.
+        
+        :param path: the file to write to. It is replaced if it exists.
+        """
+        self.stopCapture()
+        self.captureWriter = CaptureWriter(path)
+        self._setCapture(self.captureWriter)
+
+    def stopCapture(self):
+        """Stop recording the data that this node receives, and close the
+        capture file
+        """
+        writer = self.captureWriter
+        if writer is not None:
+            self._setCapture(None)
+            self.captureWriter = None
+            writer.close()
+
+    def _setCapture(self, writer):
+        raise NotImplementedError
+
     def close(self):
         """close all networking activity related to this node
         """
@@ -136,24 +368,112 @@ class NetworkTableNode:
         self.remoteListeners.remove(listener)
 
     def fireConnectedEvent(self):
+        self.metrics.connects += 1
         for listener in self.remoteListeners:
             listener.connected(self)
 
     def fireDisconnectedEvent(self):
+        self.metrics.disconnects += 1
         for listener in self.remoteListeners:
             listener.disconnected(self)
 
-    def addTableListener(self, listener, immediateNotify):
-        self.tableListeners.append(listener)
+    def addTableListener(self, listener, immediateNotify, prefix=None, key=None):
+        """Add a listener that is notified when an entry changes
+        :param listener: an object with a valueChanged function
+        :param immediateNotify: if True, the listener is notified of all
+                                existing entries
+        :param prefix: if specified, the listener is only notified of
+                       entries whose names start with this prefix, which
+                       must be empty or end with a path separator
+        :param key: if specified, the listener is only notified of the
+                    entry with this name
+        """
+        if prefix is not None and key is not None:
+            raise ValueError("Cannot specify both a prefix and a key")
+        
+        with self.listenerLock:
+            if key is not None:
+                self.keyListeners[key] = self.keyListeners.get(key, ()) + (listener,)
+                self.listenerKeys[listener] = key
+            elif prefix is not None:
+                self.prefixListeners.addPrefix(prefix, listener)
+                self.listenerPrefixes[listener] = prefix
+            else:
+                self.tableListeners.append(listener)
+        
         if immediateNotify:
-            self.entryStore.notifyEntries(None, listener)
+            if key is not None:
+                self.entryStore.notifyEntry(None, listener, key)
+            else:
+                self.entryStore.notifyEntries(None, listener, prefix)
 
     def removeTableListener(self, listener):
-        self.tableListeners.remove(listener)
+        """Remove a table listener. If it is a
+        :class:`.LatestValueListener`, its thread is stopped.
+        """
+        with self.listenerLock:
+            key = self.listenerKeys.pop(listener, None)
+            if key is not None:
+                listeners = list(self.keyListeners[key])
+                listeners.remove(listener)
+                if listeners:
+                    self.keyListeners[key] = tuple(listeners)
+                else:
+                    del self.keyListeners[key]
+            else:
+                prefix = self.listenerPrefixes.pop(listener, None)
+                if prefix is not None:
+                    self.prefixListeners.removePrefix(prefix, listener)
+                else:
+                    self.tableListeners.remove(listener)
+        
+        if isinstance(listener, LatestValueListener):
+            listener.stop()
+
+    def _stopListenerThreads(self):
+        """Stop the listener notifier, and the threads of all
+        :class:`.LatestValueListener` table listeners. This is called when
+        the node is stopped.
+        """
+        self.setAsyncListeners(False)
+        with self.listenerLock:
+            listeners = list(self.tableListeners)
+            listeners.extend(self.listenerKeys)
+            listeners.extend(self.listenerPrefixes)
+        
+        for listener in listeners:
+            if isinstance(listener, LatestValueListener):
+                listener.stop()
 
     def fireTableListeners(self, key, value, isNew):
+        notifier = self.listenerNotifier
+        if notifier is not None:
+            notifier.notify(key, value, isNew)
+        else:
+            self.dispatchTableListeners(key, value, isNew)
+
+    def dispatchTableListeners(self, key, value, isNew):
+        # Only listeners that may be interested in the key are called:
+        # listeners for all keys, listeners for this key, and listeners
+        # for prefixes of this key
+        start = timer()
+        
         for listener in self.tableListeners:
             try:
                 listener.valueChanged(None, key, value, isNew)
             except Exception:
                 logger.exception('Exception in valueChanged callback!')
+        
+        for listener in self.keyListeners.get(key, ()):
+            try:
+                listener.valueChanged(None, key, value, isNew)
+            except Exception:
+                logger.exception('Exception in valueChanged callback!')
+        
+        for listener in self.prefixListeners.prefixValuesFor(key):
+            try:
+                listener.valueChanged(None, key, value, isNew)
+            except Exception:
+                logger.exception('Exception in valueChanged callback!')
+        
+        self.metrics.listenerDispatch.record(timer() - start)
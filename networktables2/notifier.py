@@ -0,0 +1,213 @@
+import collections
+import threading
+import time
+
+from . import _impl
+
+import logging
+logger = logging.getLogger('nt')
+
+__all__ = ["ListenerNotifier", "LatestValueListener"]
+
+class ListenerNotifier:
+    """Calls table listeners on a dedicated thread, so that the thread that
+    changed a value (such as a connection's read thread) never waits for
+    user code to run
+
+    Notifications are queued, and the queue holds at most ``maxQueueSize``
+    notifications. When it is full, the overflow policy decides what
+    happens to a new notification:
+
+    * :attr:`DROP_OLDEST`: the oldest queued notification is discarded
+    * :attr:`COALESCE`: a queued notification for the same key is replaced
+      with the new value, so listeners only see the latest value of a key.
+      This happens even when the queue is not full. Notifications for keys
+      without a queued notification are always queued, as the queue can
+      only hold one notification for each key, so maxQueueSize does not
+      limit it.
+    * :attr:`BLOCK`: the caller waits until the notifier thread makes room.
+
+      .. warning:: Notifications are queued while the entry lock is held,
+                   so a listener that puts values will deadlock if the
+                   queue is full. Use one of the other policies if your
+                   listeners put values.
+    """
+
+    DROP_OLDEST = 'drop_oldest'
+    COALESCE = 'coalesce'
+    BLOCK = 'block'
+
+    POLICIES = (DROP_OLDEST, COALESCE, BLOCK)
+
+    @staticmethod
+    def checkPolicy(maxQueueSize, policy):
+        """:raises: :exc:`ValueError` if the queue size or policy is invalid"""
+        if policy not in ListenerNotifier.POLICIES:
+            raise ValueError("Invalid overflow policy '%s', must be one of %s" % (policy, ', '.join(ListenerNotifier.POLICIES)))
+        if maxQueueSize < 1:
+            raise ValueError("maxQueueSize must be at least 1")
+
+    def __init__(self, dispatch, maxQueueSize=1000, policy=DROP_OLDEST):
+        """
+        :param dispatch: called with (key, value, isNew) on the notifier
+                         thread for each notification
+        :param maxQueueSize: maximum number of queued notifications
+        :param policy: what to do when the queue is full
+        """
+        self.checkPolicy(maxQueueSize, policy)
+
+        self.dispatch = dispatch
+        self.maxQueueSize = maxQueueSize
+        self.policy = policy
+
+        # For the COALESCE policy, the queue holds keys, and the queued
+        # values are stored in pending. Otherwise it holds notifications.
+        self.queue = collections.deque()
+        self.pending = {}
+
+        # number of notifications discarded because the queue was full
+        self.dropped = 0
+
+        self.lock = _impl.create_rlock('notifier_lock')
+        self.condition = threading.Condition(self.lock)
+        self.busy = False
+
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        """start the notifier thread
+        """
+        if self.thread is not None:
+            self.stop()
+        self.running = True
+        self.thread = threading.Thread(target=self.run,
+                                       name="Listener Notifier Thread")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """stop the notifier thread. Queued notifications are discarded.
+        """
+        if self.thread is not None:
+            with self.condition:
+                self.running = False
+                self.queue.clear()
+                self.pending.clear()
+                self.condition.notify_all()
+            if self.thread is not threading.current_thread():
+                self.thread.join()
+            self.thread = None
+
+    def notify(self, key, value, isNew):
+        """Queue a notification for the listeners
+        :param key: the key that changed
+        :param value: the new value
+        :param isNew: True if the key was created
+        """
+        with self.condition:
+            if self.policy == self.COALESCE:
+                queued = self.pending.get(key)
+                if queued is not None:
+                    self.pending[key] = (value, isNew or queued[1])
+                    return
+
+                self.pending[key] = (value, isNew)
+                self.queue.append(key)
+
+            else:
+                if len(self.queue) >= self.maxQueueSize:
+                    if self.policy == self.DROP_OLDEST:
+                        self.queue.popleft()
+                        self.dropped += 1
+                    # the notifier thread cannot wait for itself to make room
+                    elif self.thread is not threading.current_thread():
+                        while self.running and len(self.queue) >= self.maxQueueSize:
+                            self.condition.wait()
+
+                self.queue.append((key, value, isNew))
+
+            if len(self.queue) == 1:
+                self.condition.notify_all()
+
+    def waitForIdle(self, timeout=None):
+        """Wait until all queued notifications have been dispatched
+        :param timeout: maximum time to wait in seconds
+        :returns: True if all notifications were dispatched
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while self.queue or self.busy:
+                if deadline is None:
+                    self.condition.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self.condition.wait(remaining)
+            return True
+
+    def run(self):
+        """the thread that dispatches queued notifications
+        """
+        while True:
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+                while self.running and not self.queue:
+                    self.condition.wait()
+
+                if not self.running:
+                    break
+
+                queue = self.queue
+                pending = self.pending
+                self.queue = collections.deque()
+                self.pending = {}
+                self.busy = True
+
+                # wake any callers waiting for room in the queue
+                self.condition.notify_all()
+
+            if self.policy == self.COALESCE:
+                for key in queue:
+                    value, isNew = pending[key]
+                    self._dispatch(key, value, isNew)
+            else:
+                for key, value, isNew in queue:
+                    self._dispatch(key, value, isNew)
+
+    def _dispatch(self, key, value, isNew):
+        try:
+            self.dispatch(key, value, isNew)
+        except Exception:
+            logger.exception('Exception dispatching listener notification')
+
+class LatestValueListener:
+    """Wraps a table listener so that it is called from its own thread,
+    with only the latest value of each key that changed since it was last
+    called. This lets a slow listener process changes at its own rate,
+    instead of falling behind by processing every intermediate value.
+    """
+
+    def __init__(self, listener):
+        """
+        :param listener: an object with a valueChanged function
+        """
+        self.listener = listener
+        self.notifier = ListenerNotifier(self._dispatch,
+                                         policy=ListenerNotifier.COALESCE)
+        self.notifier.start()
+
+    def valueChanged(self, source, key, value, isNew):
+        self.notifier.notify(key, value, isNew)
+
+    def _dispatch(self, key, value, isNew):
+        self.listener.valueChanged(None, key, value, isNew)
+
+    def stop(self):
+        """stop calling the listener. This is done by the node when the
+        listener is removed, or when the node is stopped.
+        """
+        self.notifier.stop()
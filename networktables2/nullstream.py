@@ -0,0 +1,27 @@
+import threading
+
+__all__ = ["NullStreamFactory", "NullServerStreamProvider"]
+
+
+class NullStreamFactory:
+    """A stream factory that never connects, for a client that is only
+    used locally (such as in tests and benchmarks)
+    """
+
+    def createStream(self):
+        return None
+
+class NullServerStreamProvider:
+    """A server stream provider that no client ever connects to. accept
+    waits until the provider is closed.
+    """
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def accept(self):
+        self.closed.wait()
+        return None
+
+    def close(self):
+        self.closed.set()
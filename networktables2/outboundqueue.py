@@ -0,0 +1,328 @@
+import collections
+import threading
+
+from . import _impl
+from .messages import ENTRY_ASSIGNMENT, KEEP_ALIVE
+
+__all__ = ["OutboundQueue", "OutboundQueueOverflow"]
+
+class OutboundQueueOverflow(IOError):
+    pass
+
+class OutboundQueue:
+    """Sends data to a connection from a dedicated thread, so that a
+    client that is slow to receive data cannot delay the other clients
+    of a server
+
+    Data is queued until the thread sends it, and at most
+    ``maxQueueBytes`` bytes are queued. When data does not fit, the
+    overflow policy decides what happens:
+
+    * :attr:`COALESCE`: the queued data is discarded, and the ids of the
+      entries it changed are recorded in a dirty set instead, along with
+      the entries changed by later data. When the thread is ready to send
+      again, it sends the latest value of each entry in the set, so the
+      client receives one update per changed entry instead of every
+      intermediate value.
+    * :attr:`DROP`: the data is discarded, unless it assigns new entries.
+      The client misses the updates until the entries change again.
+    * :attr:`DISCONNECT`: the connection is closed. The client receives
+      all of the entries again when it reconnects.
+
+    When the queue is given a :class:`.SelectReadManager`, the data is sent
+    from the manager's thread without blocking instead, and the queue has
+    no thread of its own.
+    """
+
+    COALESCE = 'coalesce'
+    DROP = 'drop'
+    DISCONNECT = 'disconnect'
+
+    POLICIES = (COALESCE, DROP, DISCONNECT)
+
+    # default maximum number of bytes queued for a connection
+    MAX_QUEUE_BYTES = 1024*1024
+
+    def __init__(self, connection, entryStore, onError,
+                 maxQueueBytes=MAX_QUEUE_BYTES, policy=COALESCE, name=None,
+                 selector=None):
+        """
+        :param connection: the connection to send to
+        :type  connection: :class:`.NetworkTableConnection`
+        :param entryStore: the server's entry store, which holds the lock
+                           for reading the latest values of the entries
+        :param onError: called on the queue's thread with an IOError when
+                        sending fails, or when the queue overflows and the
+                        policy is :attr:`DISCONNECT`
+        :param maxQueueBytes: maximum number of bytes to queue
+        :param policy: what to do when the queue is full
+        :param name: the name of the thread
+        :param selector: if specified, the data is sent from the thread of
+                         this :class:`.SelectReadManager`, and ``onError``
+                         is called on that thread
+        """
+        self.connection = connection
+        self.entryStore = entryStore
+        self.onError = onError
+        self.name = name
+        self.selector = selector
+        self.setPolicy(maxQueueBytes, policy)
+
+        # the server hello, which is sent before anything else
+        self.hello = None
+        # (data, assigned entries, updated entries)
+        self.queue = []
+        self.queuedBytes = 0
+        # While the client is behind, this is the dirty set: a dictionary
+        # of entry id to (entry, True if the entry was assigned)
+        self.dirty = None
+        self.overflowed = False
+
+        # number of bytes discarded because the queue was full
+        self.dropped = 0
+
+        self.lock = _impl.create_rlock('outbound_lock')
+        self.condition = threading.Condition(self.lock)
+
+        self.thread = None
+        self.running = False
+
+        # With a selector: True while the selector has been asked to send
+        # the queued data and has not finished, and the data that was taken
+        # from the queue but not sent yet
+        self.writeRequested = False
+        self.unsent = None
+
+    @staticmethod
+    def checkPolicy(maxQueueBytes, policy):
+        """:raises: :exc:`ValueError` if the queue size or policy is invalid"""
+        if policy not in OutboundQueue.POLICIES:
+            raise ValueError("Invalid overflow policy '%s', must be one of %s" % (policy, ', '.join(OutboundQueue.POLICIES)))
+        if maxQueueBytes < 1:
+            raise ValueError("maxQueueBytes must be at least 1")
+
+    def setPolicy(self, maxQueueBytes, policy):
+        """Change the size of the queue and the overflow policy
+        :param maxQueueBytes: maximum number of bytes to queue
+        :param policy: what to do when the queue is full
+        """
+        self.checkPolicy(maxQueueBytes, policy)
+        self.maxQueueBytes = maxQueueBytes
+        self.policy = policy
+
+    def start(self):
+        """start the thread that sends queued data, or start sending it
+        from the selector's thread
+        """
+        if self.selector is not None:
+            with self.condition:
+                self.running = True
+                if self._hasData():
+                    self._notify()
+            return
+
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=self.name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """stop sending data. Queued data is discarded.
+
+        The thread is not joined, as the thread may be waiting for a lock
+        held by the caller to report an error. It exits once it is done
+        sending.
+        """
+        with self.condition:
+            self.running = False
+            del self.queue[:]
+            self.queuedBytes = 0
+            self._notify()
+
+    def sendHello(self, hello):
+        """Queue the server hello. It is sent before any other data, and is
+        never discarded.
+        :param hello: a bytes object holding the server hello
+        """
+        with self.condition:
+            self.hello = hello
+            self._notify()
+
+    def send(self, data, assignments=(), updates=()):
+        """Queue data to be sent. This never blocks.
+        :param data: a bytes object holding complete messages
+        :param assignments: the entries assigned by the messages
+        :param updates: the entries updated by the messages
+        """
+        with self.condition:
+            if self.dirty is not None:
+                self._markDirty(assignments, updates)
+                return
+
+            if self.queue and self.queuedBytes + len(data) > self.maxQueueBytes:
+                if self.policy == self.COALESCE:
+                    self.dirty = collections.OrderedDict()
+                    for _, queuedAssignments, queuedUpdates in self.queue:
+                        self._markDirty(queuedAssignments, queuedUpdates)
+                    self._markDirty(assignments, updates)
+
+                    self.dropped += self.queuedBytes + len(data)
+                    del self.queue[:]
+                    self.queuedBytes = 0
+                    self._notify()
+                    return
+                elif self.policy == self.DISCONNECT:
+                    self.overflowed = True
+                    self._notify()
+                    return
+                # assignments come first in the data, and must not be
+                # dropped, or the client cannot understand later updates
+                elif data[:1] != ENTRY_ASSIGNMENT.HEADER:
+                    self.dropped += len(data)
+                    return
+
+            self.queue.append((data, assignments, updates))
+            self.queuedBytes += len(data)
+            if len(self.queue) == 1:
+                self._notify()
+
+    def _notify(self):
+        # called with the lock held when there is something to send
+        if self.selector is None:
+            self.condition.notify_all()
+        elif self.running and not self.writeRequested:
+            self.writeRequested = True
+            self.selector.requestWrite(self)
+
+    def _hasData(self):
+        return self.hello or self.queue or self.dirty or self.overflowed
+
+    def _markDirty(self, assignments, updates):
+        dirty = self.dirty
+        for entry in assignments:
+            dirty[entry.getId()] = (entry, True)
+        for entry in updates:
+            if entry.getId() not in dirty:
+                dirty[entry.getId()] = (entry, False)
+
+    def _getDirtyTransactions(self, dirty):
+        """:returns: the latest values of the entries in the dirty set, as
+                     assignments and updates
+        """
+        transactions = bytearray()
+        entry_lock = self.entryStore.entry_lock
+
+        # assignments come first, as updates may refer to assigned entries
+        for entry, assigned in dirty.values():
+            if assigned:
+                with entry_lock:
+                    entry.writeAssignmentBytes(transactions)
+        for entry, assigned in dirty.values():
+            if not assigned:
+                with entry_lock:
+                    entry.writeUpdateBytes(transactions)
+        return transactions
+
+    def ensureAlive(self):
+        """Queue a keep alive message, unless data is already waiting to
+        be sent
+        """
+        with self.condition:
+            if not self.queue and self.dirty is None:
+                self.send(KEEP_ALIVE.HEADER)
+
+    def getQueuedBytes(self):
+        """:returns: the number of bytes waiting to be sent"""
+        return self.queuedBytes
+
+    def _take(self):
+        """Take everything that is waiting to be sent. This is called with
+        the lock held, and the result is passed to :meth:`_getData` after
+        the lock is released.
+
+        :raises: :exc:`OutboundQueueOverflow` if the queue overflowed and
+                 the policy is :attr:`DISCONNECT`
+        """
+        if self.overflowed:
+            raise OutboundQueueOverflow("More than %d bytes queued for the client" % self.maxQueueBytes)
+
+        hello = self.hello
+        self.hello = None
+        dirty = self.dirty
+        self.dirty = None
+        data = [item[0] for item in self.queue]
+        self.queue = []
+        self.queuedBytes = 0
+        return hello, dirty, data
+
+    def _getData(self, hello, dirty, data):
+        """:returns: the list of buffers to send"""
+        # The dirty set replaces the queue, so there is nothing else to
+        # send. The values are read after the set is taken, so a value
+        # changed after this is sent again by the next data.
+        if dirty:
+            data = [self._getDirtyTransactions(dirty)]
+        if hello is not None:
+            data.insert(0, hello)
+        return data
+
+    def run(self):
+        error = None
+        while error is None:
+            with self.condition:
+                while self.running and not self._hasData():
+                    self.condition.wait()
+
+                if not self.running:
+                    return
+
+                try:
+                    taken = self._take()
+                except OutboundQueueOverflow as e:
+                    error = e
+                    break
+
+            try:
+                self.connection.sendEntries(*self._getData(*taken))
+            except IOError as e:
+                error = e
+
+        # errors after the queue is stopped are expected, as the connection
+        # is closed when it is stopped
+        if self.running:
+            self.onError(error)
+
+    def sendQueued(self):
+        """Send the queued data without blocking. This is called on the
+        selector's thread after data is queued, and when the connection
+        can take more after a previous call could not send all of it.
+
+        :returns: True if there is nothing left to send, False if this
+                  should be called again once the connection is writable
+        """
+        error = None
+        while error is None:
+            if not self.unsent:
+                with self.condition:
+                    if not self.running:
+                        return True
+                    if not self._hasData():
+                        self.writeRequested = False
+                        return True
+                    try:
+                        taken = self._take()
+                    except OutboundQueueOverflow as e:
+                        error = e
+                        break
+                self.unsent = self._getData(*taken)
+
+            try:
+                if not self.connection.sendAvailable(self.unsent):
+                    return False
+            except IOError as e:
+                error = e
+
+        self.unsent = None
+        if self.running:
+            self.onError(error)
+        return True
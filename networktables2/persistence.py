@@ -0,0 +1,228 @@
+import collections
+import errno
+import os
+import threading
+
+from . import _impl
+from .decoder import MessageDecoder
+from .messages import BadMessageError
+
+import logging
+logger = logging.getLogger('nt')
+
+__all__ = ["PersistentStore"]
+
+MAGIC = b'NTSTORE\x01'
+
+if hasattr(os, 'replace'):
+    _replace = os.replace
+else:
+    def _replace(src, dst):
+        # Python 2 only has os.rename, which does not replace an existing
+        # file on Windows
+        try:
+            os.rename(src, dst)
+        except OSError:
+            if not os.path.exists(dst):
+                raise
+            os.remove(dst)
+            os.rename(src, dst)
+
+class _LoadAdapter:
+    """Collects the entries decoded from a persistent store file. Later
+    records of an entry replace earlier ones.
+    """
+
+    def __init__(self):
+        self.entries = collections.OrderedDict()
+        self.records = 0
+
+    def offerIncomingAssignment(self, entry):
+        self.entries[entry.name] = entry
+        self.records += 1
+
+    def _unexpected(self, *args):
+        raise BadMessageError("Persistent store files only hold entry assignments")
+
+    getEntry = offerIncomingUpdate = keepAlive = clientHello = \
+        serverHelloComplete = protocolVersionUnsupported = _unexpected
+
+class PersistentStore:
+    """Saves the entries of a server to a file, so that they are restored
+    when the server restarts and clients do not have to send them again
+
+    The file is an append-only log of entry assignment messages, which
+    hold the name, type, sequence number and value of an entry in the
+    protocol's own encoding. Entries that changed are appended every
+    ``period`` seconds. When the log holds many more records than there
+    are entries, it is compacted by writing the current entries to a new
+    file, which then replaces the log.
+
+    Entries are never removed from the file, and a crash can lose the
+    changes made since the last write.
+    """
+
+    # the log is compacted when it holds more than COMPACT_RATIO records
+    # for each entry, and at least MIN_COMPACT_RECORDS records
+    COMPACT_RATIO = 2
+    MIN_COMPACT_RECORDS = 1000
+
+    def __init__(self, node, path, period=1.0):
+        """
+        :param node: the server to save the entries of
+        :type  node: :class:`.NetworkTableServer`
+        :param path: the file to save the entries to
+        :param period: time between writes in seconds
+        """
+        self.node = node
+        self.entryStore = node.getEntryStore()
+        self.path = path
+        self.period = period
+
+        self.file = None
+        # number of records in the file
+        self.records = 0
+
+        # names of the entries that changed since they were last written
+        self.dirty = set()
+        self.lock = _impl.create_rlock('persist_lock')
+
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run,
+                                       name="Persistent Store Thread")
+        self.thread.daemon = True
+
+    def load(self):
+        """Add the entries saved in the file to the node. Entries that the
+        node already has are not changed. This should be called before any
+        clients connect, as they receive the loaded entries in the server
+        hello.
+
+        :returns: the number of entries added
+        """
+        try:
+            with open(self.path, 'rb') as fp:
+                data = fp.read()
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            data = b''
+
+        if not data:
+            self._compact()
+            return 0
+
+        if not data.startswith(MAGIC):
+            raise IOError("%s is not a NetworkTables persistent store" % self.path)
+
+        adapter = _LoadAdapter()
+        decoder = MessageDecoder(self.node.typeManager)
+        try:
+            end = decoder.decode(bytearray(data), len(MAGIC), len(data), adapter)
+        except BadMessageError as e:
+            # keep the original, as compacting only saves the entries
+            # before the error
+            corruptPath = self.path + '.corrupt'
+            logger.error("Persistent store %s is corrupt, loading the entries before the error and moving it to %s: %s",
+                         self.path, corruptPath, e)
+            _replace(self.path, corruptPath)
+            end = None
+
+        entries = list(adapter.entries.values())
+        for entry in entries:
+            entry.clearId()
+        added = self.entryStore.loadEntries(entries)
+
+        # a partial record is left if the server stopped while writing,
+        # which is dropped by compacting
+        if end != len(data) or adapter.records > len(entries):
+            self._compact()
+        else:
+            self.file = open(self.path, 'ab')
+            self.records = adapter.records
+
+        logger.info("Loaded %d entries from %s", added, self.path)
+        return added
+
+    def start(self):
+        """start saving the entries that change"""
+        self.node.addTableListener(self, False)
+        self.thread.start()
+
+    def stop(self):
+        """stop saving entries. Changes that were not written yet are
+        written before this returns.
+        """
+        self.node.removeTableListener(self)
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self._save()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def valueChanged(self, source, key, value, isNew):
+        with self.lock:
+            self.dirty.add(key)
+
+    def run(self):
+        while not self.stopped.wait(self.period):
+            try:
+                self._save()
+            except IOError as e:
+                logger.error("Error saving entries to %s: %s", self.path, e)
+
+    def _save(self):
+        with self.lock:
+            names = self.dirty
+            self.dirty = set()
+
+        if not names or self.file is None:
+            return
+
+        records = bytearray()
+        entry_lock = self.entryStore.entry_lock
+        # not getEntry, as the names of loaded entries are unicode on
+        # Python 2, which getEntry would take for ids
+        getEntry = self.entryStore.namedEntries.get
+        for name in names:
+            entry = getEntry(name)
+            if entry is not None:
+                with entry_lock:
+                    entry.writeAssignmentBytes(records)
+
+        self.file.write(records)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.records += len(names)
+
+        if self.records > max(self.MIN_COMPACT_RECORDS,
+                              self.COMPACT_RATIO * len(self.entryStore.namedEntries)):
+            self._compact()
+
+    def _compact(self):
+        """Replace the file with one that only holds the current entries.
+        The new file is complete before it replaces the old one, so one of
+        them is always intact.
+        """
+        with self.entryStore.entry_lock:
+            entries = list(self.entryStore.namedEntries.values())
+
+        records = bytearray(MAGIC)
+        entry_lock = self.entryStore.entry_lock
+        for entry in entries:
+            with entry_lock:
+                entry.writeAssignmentBytes(records)
+
+        tmpPath = self.path + '.tmp'
+        with open(tmpPath, 'wb') as fp:
+            fp.write(records)
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        if self.file is not None:
+            self.file.close()
+        _replace(tmpPath, self.path)
+        self.file = open(self.path, 'ab')
+        self.records = len(entries)
@@ -0,0 +1,159 @@
+__all__ = ["PrefixIndex"]
+
+class _IndexNode:
+    __slots__ = ['children', 'values', 'prefixValues']
+
+    def __init__(self):
+        self.children = {}
+        # values stored for the key that ends at this node
+        self.values = ()
+        # values stored for the prefix that ends at this node
+        self.prefixValues = ()
+
+class PrefixIndex:
+    """An index of values by NetworkTables key, stored as a tree of the
+    path components of the keys. This allows the values for keys under a
+    prefix, or for prefixes of a key, to be found without looking at
+    every key in the index.
+
+    A prefix is either empty (which matches all keys), or ends with
+    :attr:`SEPARATOR`, and matches keys that start with it.
+
+    The value lists are replaced instead of modified, so the index can be
+    read while another thread modifies it. Modifications must be
+    serialized by the caller.
+    """
+
+    SEPARATOR = '/'
+
+    def __init__(self):
+        self.root = _IndexNode()
+
+    def clear(self):
+        self.root = _IndexNode()
+
+    def _keyPath(self, key):
+        return key.split(self.SEPARATOR)
+
+    def _prefixPath(self, prefix):
+        if not prefix:
+            return []
+        if not prefix.endswith(self.SEPARATOR):
+            raise ValueError("Prefix '%s' must end with '%s'" % (prefix, self.SEPARATOR))
+        return prefix.split(self.SEPARATOR)[:-1]
+
+    def _find(self, path):
+        node = self.root
+        for component in path:
+            node = node.children.get(component)
+            if node is None:
+                return None
+        return node
+
+    def _create(self, path):
+        node = self.root
+        for component in path:
+            child = node.children.get(component)
+            if child is None:
+                child = node.children[component] = _IndexNode()
+            node = child
+        return node
+
+    def _prune(self, path):
+        # remove nodes that no longer have values or children
+        nodes = [self.root]
+        for component in path:
+            nodes.append(nodes[-1].children[component])
+        for i in range(len(path), 0, -1):
+            node = nodes[i]
+            if node.children or node.values or node.prefixValues:
+                break
+            del nodes[i-1].children[path[i-1]]
+
+    def add(self, key, value):
+        """Add a value for a key
+        :param key: the key
+        :param value: the value to add
+        """
+        node = self._create(self._keyPath(key))
+        node.values = node.values + (value,)
+
+    def remove(self, key, value):
+        """Remove a value for a key
+        :param key: the key
+        :param value: the value to remove
+        :raises: :exc:`ValueError` if the value is not in the index
+        """
+        path = self._keyPath(key)
+        node = self._find(path)
+        if node is None or value not in node.values:
+            raise ValueError("%s is not in the index for '%s'" % (value, key))
+        values = list(node.values)
+        values.remove(value)
+        node.values = tuple(values)
+        self._prune(path)
+
+    def get(self, key):
+        """:returns: the values for a key"""
+        node = self._find(self._keyPath(key))
+        if node is None:
+            return ()
+        return node.values
+
+    def addPrefix(self, prefix, value):
+        """Add a value for a prefix
+        :param prefix: the prefix
+        :param value: the value to add
+        """
+        node = self._create(self._prefixPath(prefix))
+        node.prefixValues = node.prefixValues + (value,)
+
+    def removePrefix(self, prefix, value):
+        """Remove a value for a prefix
+        :param prefix: the prefix
+        :param value: the value to remove
+        :raises: :exc:`ValueError` if the value is not in the index
+        """
+        path = self._prefixPath(prefix)
+        node = self._find(path)
+        if node is None or value not in node.prefixValues:
+            raise ValueError("%s is not in the index for '%s'" % (value, prefix))
+        values = list(node.prefixValues)
+        values.remove(value)
+        node.prefixValues = tuple(values)
+        self._prune(path)
+
+    def containsPrefix(self, prefix):
+        """:returns: True if there is a key that starts with the prefix"""
+        node = self._find(self._prefixPath(prefix))
+        return node is not None and len(node.children) > 0
+
+    def valuesUnder(self, prefix):
+        """Iterate over the values for all keys that start with a prefix
+
+        :param prefix: the prefix
+        """
+        node = self._find(self._prefixPath(prefix))
+        if node is None:
+            return
+        stack = list(node.children.values())
+        while stack:
+            node = stack.pop()
+            for value in node.values:
+                yield value
+            stack.extend(node.children.values())
+
+    def prefixValuesFor(self, key):
+        """Iterate over the values for all prefixes that the key starts with
+
+        :param key: the key
+        """
+        node = self.root
+        path = self._keyPath(key)
+        # the last component of the key is not part of any matching prefix
+        for component in path:
+            for value in node.prefixValues:
+                yield value
+            node = node.children.get(component)
+            if node is None:
+                return
@@ -1,10 +1,14 @@
 import threading
-import time
 
 from . import _impl
+from .capture import CaptureServerStreamProvider
 from .common import *
 from .connection import *
+from .messages import SERVER_HELLO_COMPLETE
+from .metrics import ConnectionMetrics
 from .networktablenode import NetworkTableNode
+from .outboundqueue import OutboundQueue
+from .persistence import PersistentStore
 from .type import NetworkTableEntryTypeManager
 
 import logging
@@ -59,21 +63,41 @@ class ServerConnectionAdapter:
             logger.info("%s entered connection state: %s", self, newState)
             self.connectionState = newState
 
-    def __init__(self, stream, entryStore, adapterListener, typeManager):
+    def __init__(self, stream, entryStore, adapterListener, typeManager,
+                 selector=None,
+                 maxQueueBytes=OutboundQueue.MAX_QUEUE_BYTES,
+                 overflowPolicy=OutboundQueue.COALESCE):
         """Create a server connection adapter for a given stream
 
         :param stream:
         :param entryStore:
         :param adapterListener:
+        :param typeManager:
+        :param selector: if specified, the connection is read from and
+            written to on the thread of this :class:`.SelectReadManager`,
+            instead of on a read thread and a write thread of its own
+        :param maxQueueBytes: maximum number of bytes queued to be sent to
+            the client
+        :param overflowPolicy: what to do when the queue is full, see
+            :class:`.OutboundQueue`
         """
-        self.connection = NetworkTableConnection(stream, typeManager)
+        self.connection = NetworkTableConnection(stream, typeManager,
+                                                 ConnectionMetrics(str(self)))
         self.entryStore = entryStore
         self.adapterListener = adapterListener
 
         self.connectionState = None
         self.gotoState(GOT_CONNECTION_FROM_CLIENT)
-        self.readManager = ReadManager(self,
-                self.connection, name="Server Connection Reader Thread")
+        self.outboundQueue = OutboundQueue(self.connection, entryStore, self.ioError,
+                                           maxQueueBytes, overflowPolicy,
+                                           name="Server Connection Writer Thread",
+                                           selector=selector)
+        self.outboundQueue.start()
+        if selector is not None:
+            self.readManager = selector.createReadManager(self, self.connection)
+        else:
+            self.readManager = ReadManager(self, self.connection,
+                                           name="Server Connection Reader Thread")
         self.readManager.start()
         
     def __str__(self):
@@ -91,8 +115,9 @@ class ServerConnectionAdapter:
         self.adapterListener.close(self, False)
 
     def shutdown(self, closeStream):
-        """stop the read thread and close the stream
+        """stop the read and write threads and close the stream
         """
+        self.outboundQueue.stop()
         self.readManager.stop()
         if closeStream:
             self.connection.close()
@@ -107,7 +132,7 @@ class ServerConnectionAdapter:
             self.connection.sendProtocolVersionUnsupported()
             raise BadMessageError("Client Connected with bad protocol revision: 0x%x" % protocolRevision)
         else:
-            self.entryStore.sendServerHello(self.connection)
+            self.outboundQueue.sendHello(self.entryStore.getServerHello())
             self.gotoState(CONNECTED_TO_CLIENT)
 
     def protocolVersionUnsupported(self, protocolRevision):
@@ -117,26 +142,25 @@ class ServerConnectionAdapter:
         raise BadMessageError("A server should not receive a server hello complete message")
 
     def offerIncomingAssignment(self, entry):
+        self.connection.metrics.transactionsReceived += 1
         self.entryStore.offerIncomingAssignment(entry)
 
     def offerIncomingUpdate(self, entry, sequenceNumber, value):
+        self.connection.metrics.transactionsReceived += 1
         self.entryStore.offerIncomingUpdate(entry, sequenceNumber, value)
 
     def getEntry(self, id):
         return self.entryStore.getEntry(id)
 
-    def sendEntry(self, entryBytes):
-        try:
-            if self.connectionState == CONNECTED_TO_CLIENT:
-                self.connection.sendEntry(entryBytes)
-        except IOError as e:
-            self.ioError(e)
-    
-    def flush(self):
-        try:
-            self.connection.flush()
-        except IOError as e:
-            self.ioError(e)
+    def sendEntries(self, data, assignments=(), updates=()):
+        """Queue messages to be sent to the client. This never blocks.
+        :param data: a bytes object holding the messages
+        :param assignments: the entries assigned by the messages
+        :param updates: the entries updated by the messages
+        """
+        if self.connectionState == CONNECTED_TO_CLIENT:
+            self.connection.metrics.transactionsSent += len(assignments) + len(updates)
+            self.outboundQueue.send(data, assignments, updates)
 
     def getConnectionState(self):
         """:returns: the state of the connection
@@ -144,10 +168,7 @@ class ServerConnectionAdapter:
         return self.connectionState
 
     def ensureAlive(self):
-        try:
-            self.connection.sendKeepAlive()
-        except IOError as e:
-            self.ioError(e)
+        self.outboundQueue.ensureAlive()
 
 class ServerNetworkTableEntryStore(AbstractNetworkTableEntryStore):
     """The entry store for a {@link NetworkTableServer}
@@ -160,6 +181,13 @@ class ServerNetworkTableEntryStore(AbstractNetworkTableEntryStore):
         """
         AbstractNetworkTableEntryStore.__init__(self, listenerManager)
         self.nextId = 0
+        
+        # The server hello is cached until an entry is added or changed. The
+        # version is incremented on each change, so that a hello built
+        # without holding the entry lock is only cached if it is current
+        self.version = 0
+        self.helloCache = None
+        self.helloCacheVersion = None
 
     def addEntry(self, newEntry):
         with self.entry_lock:
@@ -169,39 +197,84 @@ class ServerNetworkTableEntryStore(AbstractNetworkTableEntryStore):
                 newEntry.setId(self.nextId)
                 self.nextId += 1
                 self.idEntries[newEntry.getId()] = newEntry
-                self.namedEntries[newEntry.name] = newEntry
+                self._addNamedEntry(newEntry)
+                self.version += 1
                 return True
             return False
 
+    def loadEntries(self, entries):
+        """Add entries that were saved by a previous server, keeping
+        their sequence numbers. They are not sent to connected clients,
+        so this should be called before clients connect.
+        :param entries: entries without ids
+        :returns: the number of entries added
+        """
+        added = 0
+        with self.entry_lock:
+            for entry in entries:
+                if self.addEntry(entry):
+                    entry.fireListener(self.listenerManager)
+                    added += 1
+        return added
+
     def updateEntry(self, entry, sequenceNumber, value):
         with self.entry_lock:
             if entry.putValue(sequenceNumber, value):
+                self.version += 1
                 return True
             return False
 
+    def clearEntries(self):
+        with self.entry_lock:
+            AbstractNetworkTableEntryStore.clearEntries(self)
+            self.version += 1
+
+    def getServerHello(self):
+        """Get all entries in the entry store as entry assignments, followed
+        by a server hello complete message
+        
+        Each entry caches its own assignment message, so only entries that
+        changed since the last hello are serialized while the entry lock is
+        held. The messages are joined after the lock is released.
+        
+        :rtype: bytes
+        """
+        with self.entry_lock:
+            version = self.version
+            if self.helloCacheVersion == version:
+                return self.helloCache
+            transactions = [entry.getAssignmentBytes()
+                            for entry in self.namedEntries.values()]
+        
+        transactions.append(SERVER_HELLO_COMPLETE.HEADER)
+        hello = b''.join(transactions)
+        
+        with self.entry_lock:
+            if self.version == version:
+                self.helloCache = hello
+                self.helloCacheVersion = version
+        return hello
+
     def sendServerHello(self, connection):
         """Send all entries in the entry store as entry assignments in a
         single transaction
         :param connection:
         """
-        transaction = []
-        with self.entry_lock:
-            # Cannot use sendEntry while holding entry lock!
-            for entry in self.namedEntries.values():
-                transaction.append(entry.getAssignmentBytes())
-                
-        for entry in transaction:
-            connection.sendEntry(entry)
-        connection.sendServerHelloComplete()
-        connection.flush()
+        # Cannot use sendEntries while holding entry lock!
+        connection.sendEntries(self.getServerHello())
 
 class ServerConnectionList:
     """A list of connections that the server currently has
     """
 
-    def __init__(self):
+    def __init__(self, metrics):
+        """
+        :param metrics: counts the connections that are closed
+        :type  metrics: :class:`.NodeMetrics`
+        """
         self.connections = []
         self.connectionsLock = _impl.create_rlock('server_conn_lock')
+        self.metrics = metrics
 
     def add(self, connection):
         """Add a connection to the list
@@ -218,6 +291,7 @@ class ServerConnectionList:
                 return
             logger.info("Close: %s", connectionAdapter)
             connectionAdapter.shutdown(closeStream)
+            self.metrics.disconnects += 1
 
     def closeAll(self):
         """close all connections and remove them
@@ -226,37 +300,65 @@ class ServerConnectionList:
             for connection in self.connections:
                 logger.info("Close: %s", connection)
                 connection.shutdown(True)
+                self.metrics.disconnects += 1
             del self.connections[:]
 
-    def sendEntry(self, entryBytes):
+    def sendEntries(self, data, assignments=(), updates=()):
+        # the data and lists may be reused once this returns, and are used
+        # later by each connection's thread
+        data = bytes(data)
+        assignments = tuple(assignments)
+        updates = tuple(updates)
         with self.connectionsLock:
             for connection in self.connections:
-                connection.sendEntry(entryBytes)
+                connection.sendEntries(data, assignments, updates)
 
-    def flush(self):
+    def setOutboundQueue(self, maxQueueBytes, overflowPolicy):
         with self.connectionsLock:
             for connection in self.connections:
-                connection.flush()
+                connection.outboundQueue.setPolicy(maxQueueBytes, overflowPolicy)
 
     def ensureAlive(self):
         with self.connectionsLock:
             for connection in self.connections:
                 connection.ensureAlive()
 
+    def getMetrics(self):
+        """:returns: the :class:`.ConnectionMetrics` of each connection"""
+        with self.connectionsLock:
+            return [connection.connection.metrics
+                    for connection in self.connections]
+
 class NetworkTableServer(NetworkTableNode):
     """A server node in NetworkTables 2.0
     """
 
-    def __init__(self, streamProvider):
+    def __init__(self, streamProvider, useSelector=False):
         """Create a NetworkTable Server
         :param streamProvider:
+        :param useSelector: If True, all client connections are read from
+            and written to on a single thread using a selector, instead of
+            two threads per client. The streams created by the
+            streamProvider must support ``fileno``, ``setblocking`` and
+            ``send``.
         """
         NetworkTableNode.__init__(self, ServerNetworkTableEntryStore(self))
         self.typeManager = NetworkTableEntryTypeManager()
         self.streamProvider = streamProvider
+        
+        if useSelector:
+            self.readSelector = SelectReadManager(name="Server Connection Selector Thread")
+            self.readSelector.start()
+        else:
+            self.readSelector = None
+
+        self.maxQueueBytes = OutboundQueue.MAX_QUEUE_BYTES
+        self.overflowPolicy = OutboundQueue.COALESCE
+        self.persistentStore = None
 
-        self.connectionList = ServerConnectionList()
-        self.writeManager = WriteManager(self.connectionList, self.entryStore, None)
+        self.connectionList = ServerConnectionList(self.metrics)
+        self.writeManager = WriteManager(self.connectionList, self.entryStore, None,
+                                         self.metrics)
 
         self.entryStore.setIncomingReceiver(self.writeManager)
         self.entryStore.setOutgoingReceiver(self.writeManager)
@@ -274,15 +376,73 @@ class NetworkTableServer(NetworkTableNode):
     def close(self):
         try:
             self.running = False
+            # closing the provider wakes up the monitor thread if it is
+            # waiting for a connection
+            self.streamProvider.close()
             self.monitorThread.join()
             self.writeManager.stop()
+            self._stopListenerThreads()
+            self.setMetricsPublishing(None)
             self.connectionList.closeAll()
-            time.sleep(1) #To get around bug where an error will occur in select if the socket server is closed before all sockets finish closing
-            self.streamProvider.close()
-            time.sleep(1)
+            self.stopCapture()
+            self.setPersistentFile(None)
+            if self.readSelector is not None:
+                self.readSelector.stop()
         except IOError as e:
             logger.error("Error during close: %s", e)
 
+    def setOutboundQueue(self, maxQueueBytes=OutboundQueue.MAX_QUEUE_BYTES,
+                         overflowPolicy=OutboundQueue.COALESCE):
+        """Each client has a queue of data waiting to be sent to it, so
+        that a slow client does not delay the others. This sets the size of
+        the queues, and what to do when a client falls so far behind that
+        its queue is full:
+        
+        * ``'coalesce'``: discard the queued data, and send only the latest
+          value of each key that changed once the client catches up
+        * ``'drop'``: discard updates until there is room in the queue
+        * ``'disconnect'``: disconnect the client
+        
+        :param maxQueueBytes: maximum number of bytes queued for a client
+        :param overflowPolicy: what to do when a client's queue is full
+        """
+        OutboundQueue.checkPolicy(maxQueueBytes, overflowPolicy)
+        self.maxQueueBytes = maxQueueBytes
+        self.overflowPolicy = overflowPolicy
+        self.connectionList.setOutboundQueue(maxQueueBytes, overflowPolicy)
+
+    def setPersistentFile(self, path, period=1.0):
+        """Save the entries of the server to a file, and restore the
+        entries saved in it. Entries that changed are written every
+        ``period`` seconds. This should be called before clients connect.
+        
+        :param path: the file to save entries to, or None to stop saving
+        :param period: time between writes in seconds
+        :returns: the number of entries restored
+        """
+        if self.persistentStore is not None:
+            self.persistentStore.stop()
+            self.persistentStore = None
+        if path is None:
+            return 0
+        
+        store = PersistentStore(self, path, period)
+        added = store.load()
+        store.start()
+        self.persistentStore = store
+        return added
+
+    def _getConnectionMetrics(self):
+        return self.connectionList.getMetrics()
+
+    def _setCapture(self, writer):
+        provider = self.streamProvider
+        if isinstance(provider, CaptureServerStreamProvider):
+            provider = provider.provider
+        if writer is not None:
+            provider = CaptureServerStreamProvider(provider, writer)
+        self.streamProvider = provider
+
     def isConnected(self):
         return True
 
@@ -294,8 +454,11 @@ class NetworkTableServer(NetworkTableNode):
             try:
                 newStream = self.streamProvider.accept()
                 if newStream is not None:
-                    connectionAdapter = ServerConnectionAdapter(newStream, self.entryStore, self.connectionList, self.typeManager)
+                    connectionAdapter = ServerConnectionAdapter(newStream, self.entryStore, self.connectionList, self.typeManager,
+                                                                self.readSelector,
+                                                                self.maxQueueBytes, self.overflowPolicy)
                     self.connectionList.add(connectionAdapter)
+                    self.metrics.connects += 1
             except IOError:
                 pass #could not get a new stream for some reason. ignore and continue
 
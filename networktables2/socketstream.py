@@ -1,48 +1,328 @@
 
+import errno
+import os
+import select
 import socket
-import sys
+import stat
 
 from . import _impl
 
-__all__ = ["SocketStreamFactory", "SocketServerStreamProvider"]
+__all__ = ["SocketStreamFactory", "SocketServerStreamProvider",
+           "UnixSocketStreamFactory", "UnixSocketServerStreamProvider"]
 
 
-class SocketStream:
+class SocketWriter:
+    """The output stream of a :class:`SocketStream`. Writes are not copied:
+    the writer keeps a reference to each buffer until flush, which sends
+    them to the socket with a single system call (``sendmsg`` if there is
+    more than one).
+
+    .. note:: The caller must not modify or release a buffer that it
+              wrote until flush has returned. :class:`.NetworkTableConnection`
+              always flushes before it returns from a send.
+    """
+
     def __init__(self, conn):
         self.conn = conn
+        self.buffers = []
+
+    def write(self, data):
+        self.buffers.append(data)
 
-    def getInputStream(self):
-        return _impl.sock_makefile(self.conn, 'rb')
+    def flush(self):
+        buffers = self.buffers
+        if buffers:
+            self.buffers = []
+            _impl.sock_sendmsg(self.conn, buffers)
+
+class SocketStream:
+    def __init__(self, conn, noDelay=True, sendBufferSize=None,
+                 recvBufferSize=None):
+        """
+        :param conn: a connected socket
+        :param noDelay: if True, disables Nagle's algorithm for TCP sockets,
+                        so that small writes are sent immediately instead of
+                        waiting for previous writes to be acknowledged
+        :param sendBufferSize: if specified, the size of the socket's send
+                               buffer in bytes (SO_SNDBUF)
+        :param recvBufferSize: if specified, the size of the socket's
+                               receive buffer in bytes (SO_RCVBUF)
+        """
+        self.conn = conn
+
+        if noDelay and conn.family in (socket.AF_INET, socket.AF_INET6):
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if sendBufferSize is not None:
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sendBufferSize)
+        if recvBufferSize is not None:
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recvBufferSize)
 
     def getOutputStream(self):
-        return _impl.sock_makefile(self.conn, 'wb')
+        return SocketWriter(self.conn)
     
     def getRemoteAddress(self):
         return self.conn.getpeername()[0]
 
+    def fileno(self):
+        return self.conn.fileno()
+
+    def recv_into(self, buffer):
+        return _impl.sock_recv_into(self.conn, buffer)
+
+    def setblocking(self, flag):
+        self.conn.setblocking(flag)
+
+    def send(self, buffers):
+        """Send as much of the buffers as the socket accepts. This does not
+        block if the socket is non-blocking.
+
+        :param buffers: a list of bytes-like objects
+        :returns: the number of bytes sent, which is 0 if the socket's send
+                  buffer is full
+        """
+        try:
+            return _impl.sock_send(self.conn, buffers)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return 0
+            raise
+
     def close(self):
+        # shutdown wakes up any thread that is blocked reading the socket
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except IOError:
+            pass
         self.conn.close()
 
 class SocketStreamFactory:
-    def __init__(self, host, port):
+
+    def __init__(self, host, port, noDelay=True, sendBufferSize=None,
+                 recvBufferSize=None):
+        """
+        :param host: the host to connect to
+        :param port: the port to connect to
+        :param noDelay: see :class:`SocketStream`
+        :param sendBufferSize: see :class:`SocketStream`
+        :param recvBufferSize: see :class:`SocketStream`
+        """
         self.host = host
         self.port = port
+        self.noDelay = noDelay
+        self.sendBufferSize = sendBufferSize
+        self.recvBufferSize = recvBufferSize
 
     def createStream(self):
-        return SocketStream(_impl.sock_create_connection((self.host, self.port)))
+        return SocketStream(_impl.sock_create_connection((self.host, self.port)),
+                            self.noDelay, self.sendBufferSize, self.recvBufferSize)
+
+class _Acceptor:
+    """Waits for connections to a listening socket. A thread waiting for a
+    connection is woken up immediately when the acceptor is closed, by
+    writing to a socket pair that is waited on with the listening socket.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.server.setblocking(False)
+        self.wakeupReader, self.wakeupWriter = socket.socketpair()
+        self.closed = False
+
+        # number of threads in accept. The wakeup sockets are closed by
+        # the last one to leave, or by close if there are none.
+        self.accepting = 0
+        self.lock = _impl.create_rlock('acceptor_lock')
+
+    def accept(self):
+        """Wait for a connection
+        :returns: the connected socket, or None if the acceptor was closed
+        """
+        with self.lock:
+            if self.closed:
+                return None
+            self.accepting += 1
+
+        try:
+            return self._accept()
+        finally:
+            with self.lock:
+                self.accepting -= 1
+                if self.closed and not self.accepting:
+                    self._closeWakeup()
+
+    def _accept(self):
+        wait = self._createWait()
+        while not self.closed:
+            try:
+                readable = wait()
+            except (ValueError, socket.error, select.error):
+                # the listening socket was closed by another thread
+                if self.closed:
+                    break
+                raise
+            if self.closed or self.wakeupReader.fileno() in readable:
+                break
+
+            try:
+                conn = self.server.accept()[0]
+            except socket.error as e:
+                # another thread accepted the connection, or the client
+                # gave up on it
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.ECONNABORTED):
+                    continue
+                raise
+
+            conn.setblocking(True)
+            return conn
+
+        return None
+
+    def _createWait(self):
+        """:returns: a function that waits until the listening socket or
+                     the wakeup socket is readable, and returns the file
+                     descriptors that are
+        """
+        fds = [self.server.fileno(), self.wakeupReader.fileno()]
+
+        # poll has no limit on file descriptor numbers, unlike select
+        if hasattr(select, 'poll'):
+            poller = select.poll()
+            for fd in fds:
+                poller.register(fd, select.POLLIN)
+            return lambda: [fd for fd, _ in poller.poll()]
+
+        return lambda: select.select(fds, [], [])[0]
+
+    def _closeWakeup(self):
+        # This is always called with the lock held
+        self.wakeupReader.close()
+        self.wakeupWriter.close()
+
+    def close(self):
+        """Stop accepting connections, and wake up the threads waiting for
+        a connection
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self.accepting:
+                try:
+                    self.wakeupWriter.send(b'\0')
+                except socket.error:
+                    pass
+            else:
+                self._closeWakeup()
+        self.server.close()
 
 class SocketServerStreamProvider:
-    def __init__(self, port):
+    def __init__(self, port, noDelay=True, sendBufferSize=None,
+                 recvBufferSize=None):
+        """
+        :param port: the port to listen on
+        :param noDelay: see :class:`SocketStream`
+        :param sendBufferSize: see :class:`SocketStream`
+        :param recvBufferSize: see :class:`SocketStream`
+        """
+        self.noDelay = noDelay
+        self.sendBufferSize = sendBufferSize
+        self.recvBufferSize = recvBufferSize
+
         self.server = socket.socket()
         self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server.bind(('', port))
         self.server.listen(50)
-        
-        # this fails in 2.7... need a better way of dealing with this
-        # -> However, robot servers are only running python 3, so it doesn't
-        #    really matter at the moment..
-        if sys.version_info[0] > 2:
-            self.server.settimeout(1.0)
+        self.acceptor = _Acceptor(self.server)
 
     def accept(self):
-        return SocketStream(self.server.accept()[0])
+        """Wait for a client to connect
+        :returns: a stream for the client, or None if the provider was closed
+        """
+        conn = self.acceptor.accept()
+        if conn is None:
+            return None
+        return SocketStream(conn, self.noDelay,
+                            self.sendBufferSize, self.recvBufferSize)
+
+    def close(self):
+        self.acceptor.close()
+
+class UnixSocketStream(SocketStream):
+    """A stream over a Unix domain socket, for processes on the same host"""
+
+    def getRemoteAddress(self):
+        return 'localhost'
+
+class UnixSocketStreamFactory:
+    """Creates streams that connect to a
+    :class:`UnixSocketServerStreamProvider` on the same host. This avoids
+    the overhead of the TCP stack for processes on the same host.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: the filesystem path of the server's socket
+        """
+        self.path = path
+
+    def createStream(self):
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(self.path)
+        except:
+            conn.close()
+            raise
+        return UnixSocketStream(conn)
+
+class UnixSocketServerStreamProvider:
+    """Accepts connections from a :class:`UnixSocketStreamFactory` on the
+    same host
+    """
+
+    def __init__(self, path):
+        """
+        :param path: the filesystem path to create the socket at. A socket
+                     left at this path by a server that is no longer running
+                     is removed.
+        """
+        self.path = path
+        if os.path.lexists(path):
+            self._removeStaleSocket(path)
+
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(50)
+        self.acceptor = _Acceptor(self.server)
+
+    def _removeStaleSocket(self, path):
+        if not stat.S_ISSOCK(os.lstat(path).st_mode):
+            raise IOError("'%s' exists and is not a socket" % path)
+
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except socket.error as e:
+            # only a socket that nothing is listening on is removed
+            if e.errno != errno.ECONNREFUSED:
+                raise
+            os.unlink(path)
+        else:
+            raise IOError("A server is already listening at '%s'" % path)
+        finally:
+            probe.close()
+
+    def accept(self):
+        """Wait for a client to connect
+        :returns: a stream for the client, or None if the provider was closed
+        """
+        conn = self.acceptor.accept()
+        if conn is None:
+            return None
+        return UnixSocketStream(conn)
+
+    def close(self):
+        self.acceptor.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
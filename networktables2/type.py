@@ -1,6 +1,13 @@
+import array as _array
 import struct as _struct
 
 from .connection import BadMessageError
+from .decoder import BufferReadStream, IncompleteMessage
+
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
 
 class ComplexData:
     def __init__(self, type):
@@ -40,10 +47,32 @@ class NetworkTableEntryType:
         """
         raise NotImplementedError
 
+    def unpackFrom(self, buf, offset, end):
+        """read a value from a buffer. Types should override this if they
+        can do it faster than readValue
+        :param buf: the buffer to read the value from
+        :param offset: the offset of the value in the buffer
+        :param end: the end of the valid data in the buffer
+        :returns: the value, and the offset of the data following it
+        
+        Raises :class:`.IncompleteMessage` if the buffer does not hold
+        the entire value
+        """
+        rstream = BufferReadStream(buf, offset, end)
+        value = self.readValue(rstream)
+        return value, rstream.offset
+
+    def valueEquals(self, value1, value2):
+        """:returns: True if the two values of this type are equal"""
+        return value1 == value2
+
 class BasicEntryType(NetworkTableEntryType):
     def __init__(self, id, name, STRUCT):
         NetworkTableEntryType.__init__(self, id, name)
         self.STRUCT = _struct.Struct(STRUCT)
+        # format of a single value without the byte order, used to build
+        # structs for arrays of this type
+        self.FORMAT = STRUCT.lstrip('@=<>!')
 
     def writeBytes(self, b, value):
         b.extend(self.STRUCT.pack(value))
@@ -51,6 +80,12 @@ class BasicEntryType(NetworkTableEntryType):
     def readValue(self, rstream):
         return rstream.readStruct(self.STRUCT)[0]
 
+    def unpackFrom(self, buf, offset, end):
+        valueEnd = offset + self.STRUCT.size
+        if valueEnd > end:
+            raise IncompleteMessage()
+        return self.STRUCT.unpack_from(buf, offset)[0], valueEnd
+
 class StringEntryType(NetworkTableEntryType):
     """a string type
     """
@@ -71,6 +106,18 @@ class StringEntryType(NetworkTableEntryType):
         except UnicodeDecodeError as e:
             raise BadMessageError(e)
 
+    def unpackFrom(self, buf, offset, end):
+        start = offset + self.LEN.size
+        if start > end:
+            raise IncompleteMessage()
+        valueEnd = start + self.LEN.unpack_from(buf, offset)[0]
+        if valueEnd > end:
+            raise IncompleteMessage()
+        try:
+            return buf[start:valueEnd].decode('utf-8'), valueEnd
+        except UnicodeDecodeError as e:
+            raise BadMessageError(e)
+
 class DefaultEntryTypes:
     BOOLEAN_RAW_ID = 0x00
     DOUBLE_RAW_ID = 0x01
@@ -94,48 +141,190 @@ class ArrayEntryType(ComplexEntryType):
     
     LEN = _struct.Struct('>B')
     
+    MAX_LEN = 255
+    
     #TODO allow for array of complex type
-    def __init__(self, id, elementType, externalArrayType):
+    def __init__(self, id, elementType, externalArrayType, arrayTypecodes=()):
+        """
+        :param id: the raw id of the type
+        :param elementType: the type of the array elements
+        :param externalArrayType: the :class:`ArrayData` subclass that
+                                  users store values in
+        :param arrayTypecodes: typecodes of :class:`array.array` objects
+                               that values can also be exported to
+        """
         ComplexEntryType.__init__(self, id, "Array of [%s]" % elementType.name)
         if not issubclass(externalArrayType, ArrayData):
             raise TypeError("External Array Data Type must extend ArrayData")
         self.externalArrayType = externalArrayType
         self.elementType = elementType
+        self.arrayTypecodes = arrayTypecodes
+        
+        # Arrays of fixed size elements are packed and unpacked with a
+        # single struct that includes the length, which is created the first
+        # time an array of that length is used
+        self.elementFormat = getattr(elementType, 'FORMAT', None)
+        self.structs = {}
+        
+        # kinds of NumPy arrays whose elements can be stored as this type
+        self.numpyKinds = {'?': 'b', 'd': 'iuf'}.get(self.elementFormat)
+
+    def checkNumpyArray(self, value):
+        """Raises TypeError if a NumPy array cannot be stored as this
+        type, so that the error is raised when it is put instead of when
+        it is written to the network
+        """
+        if value.ndim != 1:
+            raise TypeError("%s is not a one dimensional array" % (value,))
+        if value.size and (self.numpyKinds is None or
+                           value.dtype.kind not in self.numpyKinds):
+            raise TypeError("An array of %s cannot be stored as %s" % (value.dtype, self.name))
+
+    def getStruct(self, length):
+        """:returns: a struct for an array of the given length, or None
+                     if the elements are not of fixed size
+        """
+        s = self.structs.get(length)
+        if s is None and self.elementFormat is not None:
+            s = _struct.Struct('>B%d%s' % (length, self.elementFormat))
+            self.structs[length] = s
+        return s
 
     def writeBytes(self, b, value):
-        if len(value) > 255:
+        sLen = len(value)
+        if sLen > self.MAX_LEN:
             raise IOError("Cannot write %s as %s. Arrays have a max length of 255 values" % (value, self.name))
-        b.extend(self.LEN.pack(len(value)))
-        for v in value:
-            self.elementType.writeBytes(b, v)
+        s = self.getStruct(sLen)
+        if s is not None:
+            b.extend(s.pack(sLen, *value))
+        else:
+            b.extend(self.LEN.pack(sLen))
+            for v in value:
+                self.elementType.writeBytes(b, v)
+
+    # Note: internal array values are tuples, so that they can be read
+    # without holding the entry lock
 
     def readValue(self, rstream):
         sLen = rstream.readStruct(self.LEN)[0]
-        dataArray = [] #TODO cache object arrays
+        s = self.getStruct(sLen)
+        if s is not None:
+            return s.unpack(self.LEN.pack(sLen) + rstream.read(s.size - 1))[1:]
+        readElement = self.elementType.readValue
+        return tuple([readElement(rstream) for _ in range(sLen)])
+
+    def unpackFrom(self, buf, offset, end):
+        if offset >= end:
+            raise IncompleteMessage()
+        sLen = buf[offset]
+        s = self.getStruct(sLen)
+        if s is not None:
+            valueEnd = offset + s.size
+            if valueEnd > end:
+                raise IncompleteMessage()
+            return s.unpack_from(buf, offset)[1:], valueEnd
+        
+        offset += 1
+        unpackElement = self.elementType.unpackFrom
+        dataArray = []
         for _ in range(sLen):
-            dataArray.append(self.elementType.readValue(rstream))
-        return dataArray
+            value, offset = unpackElement(buf, offset, end)
+            dataArray.append(value)
+        return tuple(dataArray), offset
 
     def internalizeValue(self, key, externalRepresentation, currentInternalValue):
+        if _np is not None and isinstance(externalRepresentation, _np.ndarray) and \
+           self.elementFormat is not None:
+            self.checkNumpyArray(externalRepresentation)
+            return tuple(externalRepresentation.tolist())
+        
         if not isinstance(externalRepresentation, self.externalArrayType):
             raise TypeError("%s is not a %s" % (externalRepresentation, self.externalArrayType))
-
-        if currentInternalValue is not None and \
-           len(currentInternalValue) == len(externalRepresentation):
-            internalArray = currentInternalValue
-            del internalArray[:]
-        else:
-            internalArray = []
-        internalArray.extend(externalRepresentation)
-        return internalArray
+        
+        # never modify currentInternalValue, it may be being read
+        return tuple(externalRepresentation)
+
+    def getView(self, internalData):
+        """:returns: a read-only NumPy array of the value"""
+        if _np is None or self.elementFormat is None:
+            raise TypeError("%s cannot be converted to a NumPy array" % self.name)
+        value = _np.array(internalData, dtype='>' + self.elementFormat)
+        value.flags.writeable = False
+        return value
 
     def exportValue(self, key, internalData, externalRepresentation):
-        if not isinstance(externalRepresentation, self.externalArrayType):
+        if not isinstance(externalRepresentation, self.externalArrayType) and \
+           not (isinstance(externalRepresentation, _array.array) and
+                externalRepresentation.typecode in self.arrayTypecodes):
             raise TypeError("%s is not a %s" % (externalRepresentation, self.externalArrayType))
 
         del externalRepresentation[:]
         externalRepresentation.extend(internalData)
 
+class NumpyArrayEntryType(ArrayEntryType):
+    """An array type whose internal values are read-only NumPy arrays with
+    a big-endian dtype, so that values are encoded with ``tobytes`` and
+    decoded with ``frombuffer`` without converting each element.
+    
+    Values may be put as the external array type, a NumPy array, or any
+    other sequence.
+    """
+    
+    def __init__(self, id, elementType, externalArrayType, dtype, arrayTypecodes=()):
+        """
+        :param dtype: the big-endian NumPy dtype of the elements
+        """
+        ArrayEntryType.__init__(self, id, elementType, externalArrayType, arrayTypecodes)
+        self.dtype = _np.dtype(dtype)
+
+    def writeBytes(self, b, value):
+        sLen = len(value)
+        if sLen > self.MAX_LEN:
+            raise IOError("Cannot write %s as %s. Arrays have a max length of 255 values" % (value, self.name))
+        b.extend(self.LEN.pack(sLen))
+        b.extend(value.tobytes())
+
+    # Note: arrays created from bytes objects are read-only, so they can be
+    # read without holding the entry lock
+
+    def readValue(self, rstream):
+        sLen = rstream.readStruct(self.LEN)[0]
+        return _np.frombuffer(rstream.read(sLen * self.dtype.itemsize), self.dtype)
+
+    def unpackFrom(self, buf, offset, end):
+        if offset >= end:
+            raise IncompleteMessage()
+        start = offset + 1
+        valueEnd = start + buf[offset] * self.dtype.itemsize
+        if valueEnd > end:
+            raise IncompleteMessage()
+        # buf is reused to receive later messages, so copy the data out
+        return _np.frombuffer(bytes(buf[start:valueEnd]), self.dtype), valueEnd
+
+    def internalizeValue(self, key, externalRepresentation, currentInternalValue):
+        if isinstance(externalRepresentation, _np.ndarray):
+            self.checkNumpyArray(externalRepresentation)
+        try:
+            value = _np.array(externalRepresentation, dtype=self.dtype)
+        except (TypeError, ValueError) as e:
+            raise TypeError("%s is not a %s: %s" % (externalRepresentation, self.externalArrayType, e))
+        if value.ndim != 1:
+            raise TypeError("%s is not a one dimensional array" % (externalRepresentation,))
+        
+        value.flags.writeable = False
+        return value
+
+    def exportValue(self, key, internalData, externalRepresentation):
+        ArrayEntryType.exportValue(self, key, internalData.tolist(), externalRepresentation)
+
+    def valueEquals(self, value1, value2):
+        return _np.array_equal(value1, value2)
+
+    def getView(self, internalData):
+        """:returns: a read-only NumPy array of the value, which is the
+                     internal value itself"""
+        return internalData
+
 class BooleanArray(ArrayData):
     '''
         A list of boolean values, can be used like a python list. Use
@@ -175,7 +364,13 @@ class BooleanArray(ArrayData):
 
 BooleanArray.TYPE = ArrayEntryType(BooleanArray.BOOLEAN_ARRAY_RAW_ID,
                                    DefaultEntryTypes.BOOLEAN,
-                                   BooleanArray)
+                                   BooleanArray, ('b', 'B'))
+
+BooleanArray.NUMPY_TYPE = None
+if _np is not None:
+    BooleanArray.NUMPY_TYPE = NumpyArrayEntryType(BooleanArray.BOOLEAN_ARRAY_RAW_ID,
+                                                  DefaultEntryTypes.BOOLEAN,
+                                                  BooleanArray, '?', ('b', 'B'))
 
 class NumberArray(ArrayData):
     '''
@@ -216,7 +411,13 @@ class NumberArray(ArrayData):
 
 NumberArray.TYPE = ArrayEntryType(NumberArray.NUMBER_ARRAY_RAW_ID,
                                   DefaultEntryTypes.DOUBLE,
-                                  NumberArray)
+                                  NumberArray, ('d', 'f'))
+
+NumberArray.NUMPY_TYPE = None
+if _np is not None:
+    NumberArray.NUMPY_TYPE = NumpyArrayEntryType(NumberArray.NUMBER_ARRAY_RAW_ID,
+                                                 DefaultEntryTypes.DOUBLE,
+                                                 NumberArray, '>f8', ('d', 'f'))
 
 class StringArray(ArrayData):
     '''
@@ -272,5 +473,21 @@ class NetworkTableEntryTypeManager:
     def getType(self, id):
         return self.typeMap.get(id)
 
+    def setNumpyArrays(self, enabled=True):
+        """Received boolean and number arrays are stored as read-only NumPy
+        arrays if enabled, or as tuples if not. Entries that already exist
+        keep their current type.
+        
+        :param enabled: True to use NumPy arrays
+        """
+        if enabled:
+            if _np is None:
+                raise ImportError("NumPy is required to use NumPy arrays")
+            self.registerType(BooleanArray.NUMPY_TYPE)
+            self.registerType(NumberArray.NUMPY_TYPE)
+        else:
+            self.registerType(BooleanArray.TYPE)
+            self.registerType(NumberArray.TYPE)
+
     def registerType(self, type):
         self.typeMap[type.id] = type
@@ -0,0 +1,73 @@
+import time
+
+from networktables2 import (
+    NetworkTableClient,
+    NetworkTableServer,
+    SocketStreamFactory,
+    SocketServerStreamProvider
+)
+from networktables2.capture import (
+    CaptureReader,
+    CaptureWriter,
+    DATA,
+    OPEN,
+    replay
+)
+from networktables2.nullstream import NullStreamFactory
+
+from test_loopback import get_number, wait_for
+
+
+def test_capture_and_replay(tmpdir):
+    path = str(tmpdir.join('client.ntcap'))
+    provider = SocketServerStreamProvider(0)
+    server = NetworkTableServer(provider)
+    server.putNumber('/before', 1)
+
+    client = NetworkTableClient(SocketStreamFactory('127.0.0.1', provider.server.getsockname()[1]))
+    client.startCapture(path)
+    try:
+        client.reconnect()
+        assert wait_for(client.isConnected)
+        for i in range(10):
+            server.putNumber('/test/number', i)
+        server.putString('/test/string', 'hello')
+        assert wait_for(lambda: client.containsKey('/test/string'))
+        assert wait_for(lambda: get_number(client, '/test/number') == 9)
+    finally:
+        client.stop()
+        server.close()
+
+    records = list(CaptureReader(path))
+    assert records[0][1] == OPEN
+    assert any(record[1] == DATA for record in records)
+
+    client = NetworkTableClient(NullStreamFactory())
+    server = NetworkTableServer(SocketServerStreamProvider(0))
+    try:
+        for target in (client, server):
+            size, elapsed = replay(path, target, speed=None)
+            assert size == sum(len(record[3]) for record in records)
+            assert target.getNumber('/before') == 1
+            assert target.getNumber('/test/number') == 9
+            assert target.getString('/test/string') == 'hello'
+    finally:
+        client.stop()
+        server.close()
+
+def test_replay_speed(tmpdir):
+    path = str(tmpdir.join('timed.ntcap'))
+    writer = CaptureWriter(path)
+    connection = writer.openConnection()
+    time.sleep(0.1)
+    writer.write(connection, b'\x00')
+    # a truncated record at the end is ignored
+    writer.file.write(b'\x00\x01')
+    writer.close()
+
+    client = NetworkTableClient(NullStreamFactory())
+    try:
+        assert replay(path, client)[1] >= 0.1
+        assert replay(path, client, speed=None)[1] < 0.1
+    finally:
+        client.stop()
@@ -0,0 +1,89 @@
+import pytest
+
+from networktables2.decoder import MessageDecoder
+from networktables2.entry import NetworkTableEntry
+from networktables2.messages import *
+from networktables2.type import (
+    DefaultEntryTypes,
+    NetworkTableEntryTypeManager,
+    NumberArray,
+    StringArray
+)
+
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
+
+
+@pytest.fixture(scope='function')
+def decoder():
+    return MessageDecoder(NetworkTableEntryTypeManager())
+
+@pytest.fixture(scope='function')
+def adapter():
+    adapter = Mock()
+    adapter.getEntry.return_value = NetworkTableEntry('/num', DefaultEntryTypes.DOUBLE, 0.0, id=1)
+    return adapter
+
+def get_messages():
+    b = bytearray()
+    b.extend(CLIENT_HELLO.getBytes(PROTOCOL_REVISION))
+    b.extend(NetworkTableEntry('/num', DefaultEntryTypes.DOUBLE, 1.5, id=1, sequenceNumber=2).getAssignmentBytes())
+    b.extend(NetworkTableEntry('/str', DefaultEntryTypes.STRING, u'h\xe9llo', id=2).getAssignmentBytes())
+    b.extend(NetworkTableEntry('/arr', StringArray.TYPE, ['a', 'bc'], id=3).getAssignmentBytes())
+    b.extend(NetworkTableEntry('/num', DefaultEntryTypes.DOUBLE, 2.5, id=1, sequenceNumber=3).getUpdateBytes())
+    b.extend(KEEP_ALIVE.getBytes())
+    b.extend(SERVER_HELLO_COMPLETE.getBytes())
+    return b
+
+def check_calls(adapter):
+    adapter.clientHello.assert_called_once_with(PROTOCOL_REVISION)
+    adapter.keepAlive.assert_called_once_with()
+    adapter.serverHelloComplete.assert_called_once_with()
+
+    assignments = [c[0][0] for c in adapter.offerIncomingAssignment.call_args_list]
+    assert [(e.name, e.getType(), e.getValue(), e.getId()) for e in assignments] == [
+        ('/num', DefaultEntryTypes.DOUBLE, 1.5, 1),
+        ('/str', DefaultEntryTypes.STRING, u'h\xe9llo', 2),
+        ('/arr', StringArray.TYPE, ('a', 'bc'), 3),
+    ]
+    assert assignments[0].getSequenceNumber() == 2
+
+    adapter.getEntry.assert_called_with(1)
+    adapter.offerIncomingUpdate.assert_called_once_with(adapter.getEntry.return_value, 3, 2.5)
+
+def test_decode_all(decoder, adapter):
+    decoder.feed(get_messages(), adapter)
+    check_calls(adapter)
+    assert decoder.pending is None
+
+def test_decode_bytewise(decoder, adapter):
+    for b in get_messages():
+        decoder.feed(bytearray([b]), adapter)
+    check_calls(adapter)
+    assert decoder.pending is None
+
+def test_decode_size(decoder, adapter):
+    buf = get_messages()
+    buf.extend(b'\x11\x00')
+
+    decoder.feed(buf, adapter, len(buf) - 2)
+    check_calls(adapter)
+    assert decoder.pending is None
+
+def test_decode_number_array(decoder, adapter):
+    decoder.feed(NetworkTableEntry('/arr', NumberArray.TYPE, [1.0, 2.0, 3.0], id=3).getAssignmentBytes()[:-1], adapter)
+    assert not adapter.offerIncomingAssignment.called
+
+    decoder.feed(b'\x00', adapter)
+    entry = adapter.offerIncomingAssignment.call_args[0][0]
+    assert entry.getValue() == (1.0, 2.0, 3.0)
+
+def test_decode_bad_message(decoder, adapter):
+    with pytest.raises(BadMessageError):
+        decoder.feed(b'\x42', adapter)
+
+    adapter.getEntry.return_value = None
+    with pytest.raises(BadMessageError):
+        decoder.feed(FIELD_UPDATE.getBytes(5, 1), adapter)
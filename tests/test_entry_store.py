@@ -0,0 +1,78 @@
+import pytest
+
+from networktables2.entry import NetworkTableEntry
+from networktables2.messages import SERVER_HELLO_COMPLETE
+from networktables2.server import ServerNetworkTableEntryStore
+from networktables2.type import DefaultEntryTypes
+
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
+
+
+@pytest.fixture(scope='function')
+def server_store():
+    return ServerNetworkTableEntryStore(Mock())
+
+def get_hello(store):
+    b = bytearray()
+    for entry in store.namedEntries.values():
+        b.extend(NetworkTableEntry(entry.name, entry.getType(), entry.getValue(),
+                                   id=entry.getId(),
+                                   sequenceNumber=entry.getSequenceNumber()).getAssignmentBytes())
+    b.extend(SERVER_HELLO_COMPLETE.getBytes())
+    return bytes(b)
+
+
+def test_server_hello(server_store):
+    server_store.putOutgoing('/num', DefaultEntryTypes.DOUBLE, 1.0)
+    server_store.putOutgoing('/str', DefaultEntryTypes.STRING, 'hi')
+
+    hello = server_store.getServerHello()
+    assert hello == get_hello(server_store)
+
+    # unchanged store reuses the cached hello
+    assert server_store.getServerHello() is hello
+
+def test_server_hello_invalidated(server_store):
+    server_store.putOutgoing('/num', DefaultEntryTypes.DOUBLE, 1.0)
+    hello = server_store.getServerHello()
+
+    # putting the same value does not change anything
+    server_store.putOutgoing('/num', DefaultEntryTypes.DOUBLE, 1.0)
+    assert server_store.getServerHello() is hello
+
+    server_store.putOutgoing('/num', DefaultEntryTypes.DOUBLE, 2.0)
+    hello = server_store.getServerHello()
+    assert hello == get_hello(server_store)
+
+    entry = server_store.getEntry('/num')
+    server_store.offerIncomingUpdate(entry, entry.getSequenceNumber() + 1, 3.0)
+    assert server_store.getServerHello() == get_hello(server_store)
+
+    server_store.putOutgoing('/new', DefaultEntryTypes.BOOLEAN, True)
+    hello = server_store.getServerHello()
+    assert hello == get_hello(server_store)
+    assert len(server_store.namedEntries) == 2
+
+    server_store.clearEntries()
+    assert server_store.getServerHello() == SERVER_HELLO_COMPLETE.getBytes()
+
+def test_prefix(server_store):
+    for name in ['/SmartDashboard/a', '/SmartDashboard/sub/b', '/other/c']:
+        server_store.putOutgoing(name, DefaultEntryTypes.DOUBLE, 1.0)
+
+    assert server_store.containsPrefix('/SmartDashboard/')
+    assert server_store.containsPrefix('/SmartDashboard/sub/')
+    assert not server_store.containsPrefix('/SmartDashboard/a/')
+    assert not server_store.containsPrefix('/Smart/')
+
+    listener = Mock()
+    server_store.notifyEntries(None, listener, '/SmartDashboard/')
+    assert sorted(c[0][1] for c in listener.valueChanged.call_args_list) == [
+        '/SmartDashboard/a', '/SmartDashboard/sub/b'
+    ]
+
+    server_store.clearEntries()
+    assert not server_store.containsPrefix('/SmartDashboard/')
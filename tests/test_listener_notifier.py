@@ -0,0 +1,151 @@
+import threading
+
+import pytest
+
+from networktables2 import NetworkTableClient
+from networktables2.notifier import LatestValueListener, ListenerNotifier
+
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
+
+
+class Dispatcher:
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, key, value, isNew):
+        self.started.set()
+        self.release.wait(5)
+        self.calls.append((key, value, isNew))
+
+@pytest.fixture(scope='function')
+def dispatcher():
+    return Dispatcher()
+
+def create_notifier(dispatcher, maxQueueSize, policy):
+    notifier = ListenerNotifier(dispatcher, maxQueueSize, policy)
+    notifier.start()
+    return notifier
+
+def block_dispatch(notifier, dispatcher):
+    # hold up the notifier thread in a dispatch, so that notifications queue
+    dispatcher.release.clear()
+    notifier.notify('/block', 0, True)
+    assert dispatcher.started.wait(1)
+
+
+def test_invalid_policy(dispatcher):
+    with pytest.raises(ValueError):
+        ListenerNotifier(dispatcher, 10, 'nope')
+
+def test_notify(dispatcher):
+    notifier = create_notifier(dispatcher, 10, ListenerNotifier.DROP_OLDEST)
+    try:
+        notifier.notify('/a', 1, True)
+        notifier.notify('/a', 2, False)
+        assert notifier.waitForIdle(1)
+        assert dispatcher.calls == [('/a', 1, True), ('/a', 2, False)]
+    finally:
+        notifier.stop()
+
+def test_drop_oldest(dispatcher):
+    notifier = create_notifier(dispatcher, 2, ListenerNotifier.DROP_OLDEST)
+    try:
+        block_dispatch(notifier, dispatcher)
+        for i in range(4):
+            notifier.notify('/a', i, False)
+        dispatcher.release.set()
+
+        assert notifier.waitForIdle(1)
+        assert dispatcher.calls[1:] == [('/a', 2, False), ('/a', 3, False)]
+        assert notifier.dropped == 2
+    finally:
+        notifier.stop()
+
+def test_coalesce(dispatcher):
+    notifier = create_notifier(dispatcher, 2, ListenerNotifier.COALESCE)
+    try:
+        block_dispatch(notifier, dispatcher)
+        notifier.notify('/a', 1, True)
+        notifier.notify('/b', 1, False)
+        notifier.notify('/a', 2, False)
+        notifier.notify('/b', 2, False)
+        assert notifier.dropped == 0
+
+        # keys are not dropped when the queue is full of other keys
+        notifier.notify('/c', 1, False)
+        assert notifier.dropped == 0
+        dispatcher.release.set()
+
+        assert notifier.waitForIdle(1)
+        assert dispatcher.calls[1:] == [('/a', 2, True), ('/b', 2, False), ('/c', 1, False)]
+    finally:
+        notifier.stop()
+
+def test_coalesce_is_new(dispatcher):
+    notifier = create_notifier(dispatcher, 10, ListenerNotifier.COALESCE)
+    try:
+        block_dispatch(notifier, dispatcher)
+        notifier.notify('/a', 1, True)
+        notifier.notify('/a', 2, False)
+        dispatcher.release.set()
+
+        assert notifier.waitForIdle(1)
+        assert dispatcher.calls[1:] == [('/a', 2, True)]
+    finally:
+        notifier.stop()
+
+def test_block(dispatcher):
+    notifier = create_notifier(dispatcher, 1, ListenerNotifier.BLOCK)
+    try:
+        block_dispatch(notifier, dispatcher)
+        notifier.notify('/a', 1, False)
+
+        done = threading.Event()
+        def notify():
+            notifier.notify('/a', 2, False)
+            done.set()
+
+        thread = threading.Thread(target=notify)
+        thread.start()
+        assert not done.wait(0.2)
+
+        dispatcher.release.set()
+        assert done.wait(1)
+        thread.join()
+
+        assert notifier.waitForIdle(1)
+        assert dispatcher.calls[1:] == [('/a', 1, False), ('/a', 2, False)]
+        assert notifier.dropped == 0
+    finally:
+        notifier.stop()
+
+def test_latest_value_listener():
+    listener = Mock()
+    adapter = LatestValueListener(listener)
+    try:
+        adapter.valueChanged(None, '/a', 1, True)
+        assert adapter.notifier.waitForIdle(1)
+        listener.valueChanged.assert_called_once_with(None, '/a', 1, True)
+    finally:
+        adapter.stop()
+
+def test_latest_value_listener_stopped_by_node():
+    client = NetworkTableClient(Mock(**{'createStream.return_value': None}))
+    removed = LatestValueListener(Mock())
+    kept = LatestValueListener(Mock())
+    try:
+        client.addTableListener(removed, False)
+        client.addTableListener(kept, False, key='/a')
+
+        client.removeTableListener(removed)
+        assert removed.notifier.thread is None
+        assert kept.notifier.thread is not None
+    finally:
+        client.stop()
+    assert kept.notifier.thread is None
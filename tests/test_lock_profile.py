@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from networktables2 import _impl, _impl_profile, NetworkTableClient
+from networktables2.nullstream import NullStreamFactory
+
+
+@pytest.fixture(scope='function')
+def profiling():
+    create_rlock = _impl.create_rlock
+    _impl.enable_lock_profiling()
+    _impl_profile.reset()
+    yield
+    _impl_profile.set_enabled(False)
+    _impl.create_rlock = create_rlock
+
+
+def test_contention(profiling):
+    lock = _impl.create_rlock('test_lock')
+    acquired = threading.Event()
+
+    def hold():
+        with lock:
+            acquired.set()
+            time.sleep(0.05)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    acquired.wait()
+    with lock:
+        with lock:
+            pass
+    thread.join()
+
+    stats = _impl_profile.get_report()['test_lock']
+    assert stats['acquires'] == 3
+    assert stats['contended'] == 1
+    assert stats['wait']['max'] > 0.01
+    assert stats['max_hold'] > 0.04
+
+def test_condition(profiling):
+    lock = _impl.create_rlock('test_lock')
+    condition = threading.Condition(lock)
+    ready = []
+
+    def notify():
+        with condition:
+            ready.append(True)
+            condition.notify()
+
+    with condition:
+        thread = threading.Thread(target=notify)
+        thread.start()
+        while not ready:
+            condition.wait(1)
+    thread.join()
+
+    # the lock is released
+    assert lock.acquire(False)
+    lock.release()
+
+def test_toggle(profiling):
+    client = NetworkTableClient(NullStreamFactory())
+    try:
+        client.putNumber('/test/number', 1)
+        report = _impl_profile.get_report()
+        acquires = report['entry_lock']['acquires']
+        assert acquires > 0
+        assert 'entry_lock' in _impl_profile.format_report()
+
+        _impl_profile.set_enabled(False)
+        client.putNumber('/test/number', 2)
+        assert _impl_profile.get_report()['entry_lock']['acquires'] == acquires
+    finally:
+        client.stop()
+
+def test_disable(profiling):
+    _impl.enable_lock_profiling(False)
+    lock = _impl.create_rlock('test_lock')
+    assert not isinstance(lock, _impl_profile.ProfiledRLock)
@@ -0,0 +1,227 @@
+#
+# These tests run a real server and client over the loopback interface
+#
+
+import socket
+import threading
+import time
+
+import pytest
+
+try:
+    import selectors
+except ImportError:
+    selectors = None
+
+from networktables2 import (
+    NetworkTableClient,
+    NetworkTableServer,
+    SocketStreamFactory,
+    SocketServerStreamProvider,
+    UnixSocketStreamFactory,
+    UnixSocketServerStreamProvider
+)
+from networktables2.messages import CLIENT_HELLO, PROTOCOL_REVISION
+
+
+def wait_for(fn, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if fn():
+            return True
+        time.sleep(0.01)
+    return False
+
+def get_number(node, key):
+    try:
+        return node.getNumber(key)
+    except KeyError:
+        return None
+
+@pytest.fixture(scope='function',
+                params=[('tcp', False), ('tcp', True), ('unix', False)],
+                ids=['threaded', 'selector', 'unix'])
+def transport(request, tmpdir):
+    kind, useSelector = request.param
+    if useSelector and selectors is None:
+        pytest.skip("selector mode requires the selectors module")
+    if kind == 'tcp':
+        provider = SocketServerStreamProvider(0)
+        port = provider.server.getsockname()[1]
+        return provider, SocketStreamFactory('127.0.0.1', port), useSelector
+
+    path = str(tmpdir.join('nt.sock'))
+    return (UnixSocketServerStreamProvider(path),
+            UnixSocketStreamFactory(path), useSelector)
+
+@pytest.fixture(scope='function')
+def server(transport):
+    provider, _, useSelector = transport
+    server = NetworkTableServer(provider, useSelector=useSelector)
+    yield server
+    server.close()
+
+@pytest.fixture(scope='function')
+def stream_factory(transport):
+    return transport[1]
+
+def create_client(stream_factory):
+    client = NetworkTableClient(stream_factory)
+    client.reconnect()
+    assert wait_for(client.isConnected)
+    return client
+
+@pytest.fixture(scope='function')
+def client(stream_factory):
+    client = create_client(stream_factory)
+    yield client
+    client.stop()
+
+
+def test_server_to_client(server, client):
+    server.putNumber('/test/number', 1)
+    assert wait_for(lambda: get_number(client, '/test/number') == 1)
+
+    server.putNumber('/test/number', 2)
+    assert wait_for(lambda: get_number(client, '/test/number') == 2)
+
+def test_client_to_server(server, client):
+    client.putNumber('/test/number', 1)
+    assert wait_for(lambda: get_number(server, '/test/number') == 1)
+
+    # updates are only sent once the server has assigned the entry an id
+    entry = client.getEntryStore().getEntry('/test/number')
+    assert wait_for(lambda: entry.getId() != entry.UNKNOWN_ID)
+
+    client.putNumber('/test/number', 2)
+    assert wait_for(lambda: get_number(server, '/test/number') == 2)
+
+def test_server_hello(server, stream_factory):
+    for i in range(100):
+        server.putNumber('/hello/%d' % i, i)
+
+    client = create_client(stream_factory)
+    try:
+        for i in range(100):
+            assert client.getNumber('/hello/%d' % i) == i
+    finally:
+        client.stop()
+
+def test_many_clients(server, stream_factory):
+    clients = [create_client(stream_factory) for _ in range(5)]
+    try:
+        clients[0].putString('/test/string', 'hello')
+        for client in clients:
+            assert wait_for(lambda: client.containsKey('/test/string'))
+            assert client.getString('/test/string') == 'hello'
+    finally:
+        for client in clients:
+            client.stop()
+
+def test_large_values(server, client):
+    # received over several reads
+    value = 'x' * 20000
+    server.putString('/test/large', value)
+    assert wait_for(lambda: client.containsKey('/test/large'))
+    assert client.getString('/test/large') == value
+
+    client.putString('/test/large2', value)
+    assert wait_for(lambda: server.containsKey('/test/large2'))
+    assert server.getString('/test/large2') == value
+
+def test_unix_socket_in_use(tmpdir):
+    path = str(tmpdir.join('nt.sock'))
+    provider = UnixSocketServerStreamProvider(path)
+    try:
+        with pytest.raises(IOError):
+            UnixSocketServerStreamProvider(path)
+    finally:
+        provider.close()
+
+    # a socket left behind by a server that is not running is replaced
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    UnixSocketServerStreamProvider(path).close()
+
+    # other files are never removed
+    with open(path, 'w') as fp:
+        fp.write('data')
+    with pytest.raises(IOError):
+        UnixSocketServerStreamProvider(path)
+    with open(path) as fp:
+        assert fp.read() == 'data'
+
+def test_close(transport):
+    provider, stream_factory, useSelector = transport
+    server = NetworkTableServer(provider, useSelector=useSelector)
+    client = create_client(stream_factory)
+    try:
+        start = time.time()
+        server.close()
+        assert time.time() - start < 1
+        assert wait_for(lambda: not client.isConnected())
+    finally:
+        client.stop()
+
+def test_selector_threads(transport):
+    provider, stream_factory, useSelector = transport
+    if not useSelector:
+        pytest.skip("only selector mode shares threads")
+    server = NetworkTableServer(provider, useSelector=True)
+    clients = [create_client(stream_factory) for _ in range(3)]
+    try:
+        server.putNumber('/test/number', 1)
+        for client in clients:
+            assert wait_for(lambda: get_number(client, '/test/number') == 1)
+        # the clients are read from and written to by the selector thread
+        names = [thread.name for thread in threading.enumerate()]
+        assert not [name for name in names if name.startswith('Server Connection')
+                    and name != 'Server Connection Selector Thread']
+    finally:
+        for client in clients:
+            client.stop()
+        server.close()
+
+def test_client_disconnect(server, stream_factory):
+    client = create_client(stream_factory)
+    connections = server.connectionList.connections
+    assert wait_for(lambda: len(connections) == 1)
+    stream = connections[0].connection.stream
+    client.stop()
+
+    # the server closes its end of the connection
+    assert wait_for(lambda: stream.fileno() == -1)
+    assert not connections
+
+@pytest.mark.parametrize('useSelector', [False, True], ids=['threaded', 'selector'])
+def test_slow_client(useSelector):
+    if useSelector and selectors is None:
+        pytest.skip("selector mode requires the selectors module")
+    provider = SocketServerStreamProvider(0, sendBufferSize=4096)
+    server = NetworkTableServer(provider, useSelector=useSelector)
+    server.setOutboundQueue(16384, 'coalesce')
+    port = provider.server.getsockname()[1]
+
+    # a client that never reads what the server sends
+    slow = socket.socket()
+    slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    slow.connect(('127.0.0.1', port))
+    slow.sendall(CLIENT_HELLO.getBytes(PROTOCOL_REVISION))
+
+    client = create_client(SocketStreamFactory('127.0.0.1', port))
+    try:
+        value = 'x' * 1000
+        for i in range(500):
+            server.putString('/test/%d' % (i % 100), '%s%d' % (value, i))
+            if i % 100 == 99:
+                # let the server send each round separately
+                time.sleep(0.1)
+        assert wait_for(lambda: client.containsKey('/test/99') and
+                                client.getString('/test/99') == '%s%d' % (value, 499))
+        # the slow client fell behind and its queue was coalesced
+        assert sum(c.outboundQueue.dropped for c in server.connectionList.connections) > 0
+    finally:
+        slow.close()
+        client.stop()
+        server.close()
@@ -0,0 +1,68 @@
+from networktables2 import (
+    NetworkTableServer,
+    SocketStreamFactory,
+    SocketServerStreamProvider
+)
+from networktables2.metrics import Histogram
+
+from test_loopback import create_client, get_number, wait_for
+
+
+def test_histogram():
+    h = Histogram(unit=1, buckets=10)
+    assert h.getStats()['p50'] == 0
+
+    for value in range(1, 101):
+        h.record(value)
+
+    stats = h.getStats()
+    assert stats['count'] == 100
+    assert stats['mean'] == 50.5
+    assert stats['max'] == 100
+    # 50 falls in the bucket holding 32-63
+    assert stats['p50'] == 64
+    assert stats['p99'] == 100
+
+    # values that are too large are counted in the last bucket
+    h.record(1000000)
+    assert h.counts[-1] == 1
+
+def test_loopback_metrics():
+    provider = SocketServerStreamProvider(0)
+    server = NetworkTableServer(provider)
+    client = create_client(SocketStreamFactory('127.0.0.1', provider.server.getsockname()[1]))
+    try:
+        client.putNumber('/test/number', 1)
+        assert wait_for(lambda: get_number(server, '/test/number') == 1)
+        assert wait_for(lambda: client.getMetrics()['flush_duration']['count'] > 0)
+
+        metrics = client.getMetrics()
+        assert metrics['connects'] == 1
+        assert metrics['flush_queue_depth']['max'] == 1
+        assert metrics['total']['transactions_sent'] == 1
+        assert metrics['total']['bytes_sent'] > 0
+
+        metrics = server.getMetrics()
+        assert metrics['connects'] == 1
+        assert len(metrics['connections']) == 1
+        assert metrics['total']['transactions_received'] == 1
+        assert metrics['total']['bytes_received'] > 0
+
+        # the metrics are published as numbers
+        server.setMetricsPublishing(0.01)
+        assert wait_for(lambda: get_number(client, '/.metrics/server/total/bytes_received') is not None)
+        assert get_number(client, '/.metrics/server/connects') == 1
+
+        # each client publishes to its own table
+        client.setMetricsPublishing(0.01)
+        prefix = '/.metrics/%s/' % client._getMetricsName()
+        assert prefix.startswith('/.metrics/client-')
+        assert wait_for(lambda: get_number(server, prefix + 'connects') == 1)
+
+        server.setMetricsPublishing(None)
+        client.setMetricsPublishing(None)
+    finally:
+        client.stop()
+        server.close()
+
+    assert server.getMetrics()['disconnects'] == 1
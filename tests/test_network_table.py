@@ -1,12 +1,19 @@
 
 import pytest
 
-from networktables.networktable import NetworkTableProvider
-from networktables2 import NetworkTableClient
+from networktables.networktable import NetworkTable, NetworkTableProvider
+from networktables2 import BooleanArray, NetworkTableClient, NumberArray, StringArray
+from networktables2.nullstream import NullStreamFactory
 
-class NullStreamFactory:
-    def createStream(self):
-        return None
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 @pytest.fixture(scope='function')
 def client():
@@ -126,3 +133,147 @@ def test_get_table(provider, table1, table2):
     table3 = provider.getTable('/test3')
     assert table1 is not table3
     assert table2 is not table3
+
+def test_put_values(client, table1):
+    table1.putNumber('number', 1)
+    
+    client.writeManager.flush = Mock()
+    table1.putValues({'number': 2, 'string': 'hi', 'bool': True,
+                      'array': NumberArray.from_list([1, 2])}, flush=True)
+    
+    assert table1.getNumber('number') == 2
+    assert table1.getString('string') == 'hi'
+    assert table1.getBoolean('bool') == True
+    assert table1.getValue('array') == (1.0, 2.0)
+    client.writeManager.flush.assert_called_once_with()
+    
+    # nothing is put if any of the values cannot be put
+    with pytest.raises(TypeError):
+        table1.putValues({'number': 3, 'string': 4})
+    assert table1.getNumber('number') == 2
+    assert table1.getString('string') == 'hi'
+    
+    with pytest.raises(ValueError):
+        table1.putValues({'number': 3, 'none': None})
+    assert table1.getNumber('number') == 2
+
+def test_get_values(provider, table1, table2):
+    table1.putValues({'x': 1, 'y': 2, 'valid': True})
+    table2.putNumber('x', 3)
+    provider.getTable('/test1/sub').putString('name', 'target')
+    
+    assert table1.getValues(['x', 'valid']) == {'x': 1, 'valid': True}
+    
+    with pytest.raises(KeyError):
+        table1.getValues(['x', 'Non-Existant'])
+    assert table1.getValues(['x', 'Non-Existant'], None) == {'x': 1, 'Non-Existant': None}
+    
+    assert table1.snapshot() == {'x': 1, 'y': 2, 'valid': True}
+    assert table1.snapshot(includeSubTables=True) == {'x': 1, 'y': 2, 'valid': True,
+                                                      'sub/name': 'target'}
+    assert provider.getTable('/test3').snapshot() == {}
+
+def test_contains_sub_table(provider, table1):
+    subtable = provider.getTable('/test1/sub1')
+    subtable.putNumber('value', 1)
+
+    assert table1.containsSubTable('sub1')
+    assert not table1.containsSubTable('sub')
+    assert not table1.containsSubTable('sub1/value')
+    assert not subtable.containsSubTable('value')
+
+def test_put_array(table1):
+    
+    table1.putValue('array', NumberArray.from_list([1, 2, 3]))
+    
+    value = NumberArray()
+    table1.retrieveValue('array', value)
+    assert value == [1, 2, 3]
+    
+    # values are immutable snapshots, later puts do not modify them
+    snapshot = table1.getValue('array')
+    table1.putValue('array', NumberArray.from_list([4, 5, 6]))
+    assert snapshot == (1, 2, 3)
+    assert table1.getValue('array') == (4, 5, 6)
+    
+    table1.retrieveValue('array', value)
+    assert value == [4, 5, 6]
+    
+    with pytest.raises(TypeError):
+        table1.retrieveValue('array', StringArray())
+
+@pytest.mark.skipif(np is None, reason="requires numpy")
+def test_numpy_arrays(client, table1):
+    client.setNumpyArrays()
+
+    table1.putValue('array', np.array([1.0, 2.0]))
+    view = table1.retrieveArrayView('array')
+    assert view.tolist() == [1.0, 2.0]
+    assert table1.retrieveArrayView('array') is view
+    with pytest.raises(ValueError):
+        view[0] = 3
+
+    # putting an equal value does not change anything
+    table1.putValue('array', NumberArray.from_list([1, 2]))
+    assert table1.retrieveArrayView('array') is view
+
+    table1.putValue('array', NumberArray.from_list([3, 4]))
+    assert table1.retrieveArrayView('array').tolist() == [3.0, 4.0]
+
+    value = NumberArray()
+    table1.retrieveValue('array', value)
+    assert value == [3.0, 4.0]
+
+    table1.putValue('bools', np.array([True, False]))
+    assert table1.retrieveArrayView('bools').tolist() == [True, False]
+
+@pytest.mark.skipif(np is None, reason="requires numpy")
+def test_array_view(table1):
+    table1.putValue('array', NumberArray.from_list([1, 2]))
+    view = table1.retrieveArrayView('array')
+    assert view.tolist() == [1.0, 2.0]
+    assert not view.flags.writeable
+
+    # without numpy arrays enabled, numpy arrays are stored as tuples
+    table1.putValue('array', np.array([3.0, 4.0]))
+    assert table1.getValue('array') == (3.0, 4.0)
+
+    table1.putString('str', 'hi')
+    with pytest.raises(TypeError):
+        table1.retrieveArrayView('str')
+
+@pytest.mark.skipif(np is None, reason="requires numpy")
+@pytest.mark.parametrize('numpyArrays', [False, True])
+def test_invalid_numpy_arrays(client, table1, numpyArrays):
+    client.setNumpyArrays(numpyArrays)
+
+    with pytest.raises(ValueError):
+        table1.putValue('array', np.array(['a', 'b']))
+    with pytest.raises(ValueError):
+        table1.putValue('array', np.array([1j]))
+    with pytest.raises(TypeError):
+        table1.putValue('array', np.array([[1.0, 2.0]]))
+
+    table1.putValue('array', np.array([1, 2]))
+    with pytest.raises(TypeError):
+        client.putValue('/test1/array', np.array(['a']), NumberArray.TYPE)
+    with pytest.raises(TypeError):
+        client.putValue('/test1/bools', np.array([1.0]), BooleanArray.TYPE)
+    assert list(table1.getValue('array')) == [1.0, 2.0]
+
+def test_shutdown(provider):
+    NetworkTable.setTableProvider(provider)
+    NetworkTable.setWriteFlushPeriod(0.5)
+    assert provider.getNode().writeManager.flushPeriod == 0.5
+    NetworkTable.shutdown()
+
+    assert NetworkTable._staticProvider is None
+    assert NetworkTable._nodeConfig == {}
+    assert not provider.getNode().writeManager.running
+
+def test_invalid_async_listeners():
+    with pytest.raises(ValueError):
+        NetworkTable.setAsyncListeners(overflowPolicy='bad')
+    with pytest.raises(ValueError):
+        NetworkTable.setAsyncListeners(maxQueueSize=0)
+    assert 'asyncListeners' not in NetworkTable._nodeConfig
@@ -1,17 +1,16 @@
+import threading
+
 import pytest
 
 from networktables.networktable import NetworkTableProvider
 from networktables2 import NetworkTableClient
+from networktables2.nullstream import NullStreamFactory
 
 try:
     from unittest.mock import call, Mock
 except ImportError:
     from mock import call, Mock
 
-class NullStreamFactory:
-    def createStream(self):
-        return None
-
 @pytest.fixture(scope='function')
 def client():
     return NetworkTableClient(NullStreamFactory())
@@ -134,7 +133,27 @@ def test_specific_key_listener(table1):
     table1.putBoolean('MyKey2', True)
     assert len(listener1.mock_calls) == 0
     
+def test_specific_key_listener_immediate_notify(table1):
+    
+    listener1 = Mock()
+    listener2 = Mock()
     
+    table1.putBoolean('MyKey1', True)
+    table1.putBoolean('MyKey2', True)
+    table1.addTableListener(listener1.valueChanged, True, key='MyKey1')
+    table1.addTableListener(listener2.valueChanged, True, key='MyKey1')
+    table1.addTableListener(listener2.valueChanged, True, key='MyKey3')
+    
+    listener1.valueChanged.assert_called_once_with(table1, "MyKey1", True, True)
+    listener2.valueChanged.assert_called_once_with(table1, "MyKey1", True, True)
+    listener1.reset_mock()
+    listener2.reset_mock()
+    
+    table1.removeTableListener(listener2.valueChanged)
+    table1.putBoolean('MyKey1', False)
+    table1.putBoolean('MyKey3', False)
+    listener1.valueChanged.assert_called_once_with(table1, "MyKey1", False, False)
+    assert len(listener2.mock_calls) == 0
     
 def test_subtable_listener(table2, subtable1, subtable2):
     
@@ -195,4 +214,73 @@ def test_subsubtable_listener(table3, subtable3, subtable4):
     assert len(listener1.mock_calls) == 0
     assert len(listener2.mock_calls) == 3
     listener2.reset_mock()
-    
\ No newline at end of file
+    
+def test_listener_similar_prefix(provider, table1):
+    listener1 = Mock()
+    subListener = Mock()
+
+    table1.addTableListener(listener1.valueChanged)
+    table1.addSubTableListener(subListener.valueChanged)
+
+    # keys in tables whose names start with the same string are ignored
+    other = provider.getTable('/test1other')
+    other.putBoolean('MyKey1', True)
+    provider.getTable('/test1other/sub').putBoolean('MyKey1', True)
+    assert len(listener1.mock_calls) == 0
+    assert len(subListener.mock_calls) == 0
+
+    table1.removeTableListener(listener1.valueChanged)
+    table1.putBoolean('MyKey1', True)
+    assert len(listener1.mock_calls) == 0
+
+def test_async_listener(client, table1):
+    threads = []
+    def listener(source, key, value, isNew):
+        threads.append((threading.current_thread(), key, value))
+
+    client.setAsyncListeners()
+    try:
+        table1.addTableListener(listener)
+        table1.putBoolean('MyKey1', True)
+        assert client.listenerNotifier.waitForIdle(1)
+
+        assert threads == [(client.listenerNotifier.thread, 'MyKey1', True)]
+    finally:
+        client.setAsyncListeners(False)
+
+    # listeners are called synchronously again
+    table1.putBoolean('MyKey1', False)
+    assert threads[-1] == (threading.current_thread(), 'MyKey1', False)
+
+def test_latest_only_listener(table1):
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+    def listener(source, key, value, isNew):
+        started.set()
+        release.wait(5)
+        calls.append((key, value, isNew))
+
+    table1.addTableListener(listener, latestOnly=True)
+    adapter = table1.listenerMap[listener][0]
+    try:
+        table1.putNumber('MyKey1', 0)
+        assert started.wait(1)
+
+        # changes made while the listener is busy are collapsed
+        for i in range(1, 1000):
+            table1.putNumber('MyKey1', i)
+            table1.putNumber('MyKey2', i)
+        release.set()
+
+        assert adapter.notifier.waitForIdle(1)
+        assert calls == [
+            ('MyKey1', 0, True),
+            ('MyKey1', 999, False),
+            ('MyKey2', 999, True),
+        ]
+    finally:
+        release.set()
+        table1.removeTableListener(listener)
+
+    assert adapter.notifier.thread is None
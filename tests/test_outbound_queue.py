@@ -0,0 +1,199 @@
+import threading
+
+import pytest
+
+from networktables2.entry import NetworkTableEntry
+from networktables2.outboundqueue import OutboundQueue, OutboundQueueOverflow
+from networktables2.type import DefaultEntryTypes
+
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
+
+
+class SlowConnection:
+    """Blocks sending until it is released"""
+    def __init__(self):
+        self.sent = []
+        self.release = threading.Event()
+        self.sending = threading.Event()
+        self.condition = threading.Condition()
+
+    def sendEntries(self, *data):
+        self.sending.set()
+        self.release.wait()
+        with self.condition:
+            self.sent.append(b''.join(bytes(d) for d in data))
+            self.condition.notify_all()
+
+    def wait_for_sent(self, count):
+        with self.condition:
+            for _ in range(50):
+                if len(self.sent) >= count:
+                    break
+                self.condition.wait(0.1)
+        return self.sent
+
+@pytest.fixture(scope='function')
+def connection():
+    return SlowConnection()
+
+@pytest.fixture(scope='function')
+def entry_store():
+    entry_store = Mock()
+    entry_store.entry_lock = threading.RLock()
+    return entry_store
+
+def create_entry(id):
+    return NetworkTableEntry('/entry%d' % id, DefaultEntryTypes.DOUBLE, float(id), id=id)
+
+def create_queue(connection, entry_store, policy, onError=None):
+    queue = OutboundQueue(connection, entry_store, onError or Mock(),
+                          maxQueueBytes=8, policy=policy)
+    queue.start()
+    return queue
+
+def fill(queue, connection):
+    # the first send is taken by the thread, which then blocks sending it
+    queue.send(b'\x11first')
+    assert connection.sending.wait(1)
+    queue.send(b'\x1112')
+    queue.send(b'\x113456')
+
+
+def test_send(connection, entry_store):
+    queue = create_queue(connection, entry_store, OutboundQueue.COALESCE)
+    connection.release.set()
+    queue.send(b'\x11a')
+    assert connection.wait_for_sent(1) == [b'\x11a']
+
+    queue.ensureAlive()
+    assert connection.wait_for_sent(2) == [b'\x11a', b'\x00']
+    queue.stop()
+
+def test_hello_first(connection, entry_store):
+    queue = OutboundQueue(connection, entry_store, Mock())
+    queue.send(b'\x11a')
+    queue.sendHello(b'\x03')
+    queue.start()
+    connection.release.set()
+    assert connection.wait_for_sent(1) == [b'\x03\x11a']
+    queue.stop()
+
+def test_coalesce(connection, entry_store):
+    queue = create_queue(connection, entry_store, OutboundQueue.COALESCE)
+    e1, e2, e3, e4 = [create_entry(id) for id in range(1, 5)]
+
+    queue.send(b'\x11first', updates=[e4])
+    assert connection.sending.wait(1)
+    queue.send(b'\x1112', updates=[e1])
+    queue.send(b'\x113456', assignments=[e2])
+
+    # the queue overflows, so the data is discarded and replaced by the
+    # latest values of the entries that changed
+    queue.send(b'\x11overflow', updates=[e1, e3])
+    queue.send(b'\x11ignored', updates=[e2, e3])
+    assert queue.dropped == 17
+
+    e1.putValue(5, 10.0)
+    e3.putValue(6, 30.0)
+
+    connection.release.set()
+    expected = bytearray()
+    e2.writeAssignmentBytes(expected)
+    e1.writeUpdateBytes(expected)
+    e3.writeUpdateBytes(expected)
+    assert connection.wait_for_sent(2) == [b'\x11first', bytes(expected)]
+
+    queue.send(b'\x11after')
+    assert connection.wait_for_sent(3)[2] == b'\x11after'
+    queue.stop()
+
+def test_drop(connection, entry_store):
+    queue = create_queue(connection, entry_store, OutboundQueue.DROP)
+    fill(queue, connection)
+
+    queue.send(b'\x11dropped')
+    # assignments are never dropped
+    queue.send(b'\x10assigned')
+    assert queue.dropped == 8
+
+    connection.release.set()
+    assert connection.wait_for_sent(2) == [b'\x11first', b'\x1112\x113456\x10assigned']
+    queue.stop()
+
+def test_disconnect(connection, entry_store):
+    onError = Mock()
+    queue = create_queue(connection, entry_store, OutboundQueue.DISCONNECT, onError)
+    fill(queue, connection)
+    queue.send(b'\x11overflow')
+
+    connection.release.set()
+    queue.thread.join(1)
+    assert not queue.thread.is_alive()
+    assert isinstance(onError.call_args[0][0], OutboundQueueOverflow)
+
+def test_error_after_stop(connection, entry_store):
+    onError = Mock()
+    connection.sendEntries = Mock(side_effect=IOError)
+    queue = create_queue(connection, entry_store, OutboundQueue.COALESCE, onError)
+    queue.stop()
+    queue.send(b'\x11a')
+    queue.thread.join(1)
+    assert not onError.called
+
+class NonBlockingConnection:
+    """Takes at most ``room`` bytes, as a socket with a full send buffer
+    would
+    """
+    def __init__(self, room):
+        self.room = room
+        self.sent = b''
+
+    def sendAvailable(self, data):
+        while data and self.room:
+            block = bytes(bytearray(data[0]))
+            size = min(len(block), self.room)
+            self.sent += block[:size]
+            self.room -= size
+            if size == len(block):
+                del data[0]
+            else:
+                data[0] = block[size:]
+        return not data
+
+def test_selector(entry_store):
+    connection = NonBlockingConnection(4)
+    selector = Mock()
+    queue = OutboundQueue(connection, entry_store, Mock(), selector=selector)
+    queue.start()
+    assert not selector.requestWrite.called
+
+    queue.send(b'\x11abc')
+    queue.send(b'\x11def')
+    # the selector is only asked once to send the data
+    selector.requestWrite.assert_called_once_with(queue)
+
+    # the connection takes part of the data, and the rest is sent once it
+    # is writable again
+    assert not queue.sendQueued()
+    assert connection.sent == b'\x11abc'
+    queue.send(b'\x11ghi')
+    connection.room = 100
+    assert queue.sendQueued()
+    assert connection.sent == b'\x11abc\x11def\x11ghi'
+
+    # the next data asks the selector again
+    queue.send(b'\x11j')
+    assert selector.requestWrite.call_count == 2
+    assert queue.sendQueued()
+    assert connection.sent.endswith(b'\x11j')
+    queue.stop()
+    assert queue.thread is None
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        OutboundQueue.checkPolicy(1000, 'invalid')
+    with pytest.raises(ValueError):
+        OutboundQueue.checkPolicy(0, OutboundQueue.DROP)
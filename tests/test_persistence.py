@@ -0,0 +1,129 @@
+import pytest
+
+from networktables2 import NetworkTableServer, NumberArray
+from networktables2.nullstream import NullServerStreamProvider
+from networktables2.persistence import MAGIC, PersistentStore
+
+
+@pytest.fixture(scope='function')
+def path(tmpdir):
+    return str(tmpdir.join('server.ntstore'))
+
+def create_server(path, period=1.0):
+    server = NetworkTableServer(NullServerStreamProvider())
+    loaded = server.setPersistentFile(path, period)
+    return server, loaded
+
+
+def test_round_trip(path):
+    server, loaded = create_server(path)
+    try:
+        assert loaded == 0
+        for i in range(5):
+            server.putNumber('/test/number', i)
+        server.putString('/test/string', 'hello')
+        server.putValue('/test/array', NumberArray.from_list([1, 2, 3]))
+        sequenceNumber = server.getEntryStore().getEntry('/test/number').getSequenceNumber()
+    finally:
+        server.close()
+
+    server, loaded = create_server(path)
+    try:
+        assert loaded == 3
+        assert server.getNumber('/test/number') == 4
+        assert server.getString('/test/string') == 'hello'
+        assert list(server.getValue('/test/array')) == [1, 2, 3]
+        assert server.getEntryStore().getEntry('/test/number').getSequenceNumber() == sequenceNumber
+
+        # changes after a restart are saved too
+        server.putNumber('/test/number', 10)
+    finally:
+        server.close()
+
+    server, loaded = create_server(path)
+    try:
+        assert server.getNumber('/test/number') == 10
+    finally:
+        server.close()
+
+def test_compaction(path, monkeypatch):
+    monkeypatch.setattr(PersistentStore, 'MIN_COMPACT_RECORDS', 10)
+
+    server, _ = create_server(path, period=0.01)
+    try:
+        store = server.persistentStore
+        for i in range(50):
+            server.putNumber('/test/number', i)
+            store._save()
+            assert store.records <= 10
+    finally:
+        server.close()
+
+    server, loaded = create_server(path)
+    try:
+        assert loaded == 1
+        assert server.getNumber('/test/number') == 49
+    finally:
+        server.close()
+
+def test_truncated(path):
+    server, _ = create_server(path)
+    try:
+        server.putNumber('/test/a', 1)
+        server.putNumber('/test/b', 2)
+    finally:
+        server.close()
+
+    # the server stopped while writing a record
+    with open(path, 'ab') as fp:
+        fp.write(b'\x10\x00\x07/test/c')
+
+    server, loaded = create_server(path)
+    try:
+        assert loaded == 2
+        assert server.getNumber('/test/b') == 2
+    finally:
+        server.close()
+
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    assert data.startswith(MAGIC)
+    assert b'/test/c' not in data
+
+def test_corrupt(path):
+    server, _ = create_server(path)
+    try:
+        server.putNumber('/test/a', 1)
+    finally:
+        server.close()
+
+    with open(path, 'rb') as fp:
+        data = fp.read()
+
+    # a record with an unknown type, followed by a valid one
+    with open(path, 'ab') as fp:
+        fp.write(b'\x10\x00\x07/test/b\x7f\x00\x02\x00\x03' + data[len(MAGIC):])
+
+    server, loaded = create_server(path)
+    try:
+        assert loaded == 1
+        assert server.getNumber('/test/a') == 1
+    finally:
+        server.close()
+
+    with open(path + '.corrupt', 'rb') as fp:
+        assert fp.read().startswith(data + b'\x10\x00\x07/test/b')
+
+    with open(path, 'rb') as fp:
+        assert b'/test/b' not in fp.read()
+
+def test_not_a_store(path):
+    with open(path, 'wb') as fp:
+        fp.write(b'something else')
+
+    server = NetworkTableServer(NullServerStreamProvider())
+    try:
+        with pytest.raises(IOError):
+            server.setPersistentFile(path)
+    finally:
+        server.close()
@@ -0,0 +1,59 @@
+import pytest
+
+from networktables2.prefixindex import PrefixIndex
+
+
+@pytest.fixture(scope='function')
+def index():
+    index = PrefixIndex()
+    for key in ['/a/x', '/a/y', '/a/b/z', '/ab/x', '/c', 'd']:
+        index.add(key, key)
+    return index
+
+
+def test_get(index):
+    assert index.get('/a/x') == ('/a/x',)
+    assert index.get('/a') == ()
+    assert index.get('/nope/x') == ()
+
+def test_contains_prefix(index):
+    assert index.containsPrefix('')
+    assert index.containsPrefix('/')
+    assert index.containsPrefix('/a/')
+    assert index.containsPrefix('/a/b/')
+    assert not index.containsPrefix('/c/')
+    assert not index.containsPrefix('/a/x/')
+    assert not index.containsPrefix('/nope/')
+
+    with pytest.raises(ValueError):
+        index.containsPrefix('/a')
+
+@pytest.mark.parametrize('prefix', ['', '/', '/a/', '/a/b/', '/c/', '/nope/'])
+def test_values_under(index, prefix):
+    keys = ['/a/x', '/a/y', '/a/b/z', '/ab/x', '/c', 'd']
+    expected = sorted(k for k in keys if k.startswith(prefix))
+    assert sorted(index.valuesUnder(prefix)) == expected
+
+def test_prefix_values(index):
+    prefixes = ['', '/', '/a/', '/a/b/', '/ab/', '/a/x/']
+    for prefix in prefixes:
+        index.addPrefix(prefix, prefix)
+
+    for key in ['/a/x', '/a/b/z', '/ab/x', '/a', 'd', '/zz/y']:
+        expected = sorted(p for p in prefixes if key.startswith(p))
+        assert sorted(index.prefixValuesFor(key)) == expected
+
+def test_remove(index):
+    index.addPrefix('/q/r/', 1)
+    index.removePrefix('/q/r/', 1)
+    assert list(index.prefixValuesFor('/q/r/s')) == []
+    assert not index.containsPrefix('/q/')
+
+    index.remove('/a/b/z', '/a/b/z')
+    assert not index.containsPrefix('/a/b/')
+    assert index.containsPrefix('/a/')
+
+    with pytest.raises(ValueError):
+        index.remove('/a/b/z', '/a/b/z')
+    with pytest.raises(ValueError):
+        index.removePrefix('/a/', 1)
@@ -0,0 +1,103 @@
+import socket
+import threading
+
+import pytest
+
+from networktables2 import _impl
+from networktables2.socketstream import (
+    SocketStreamFactory,
+    SocketServerStreamProvider
+)
+
+
+@pytest.fixture(scope='function')
+def provider():
+    provider = SocketServerStreamProvider(0, sendBufferSize=65536,
+                                          recvBufferSize=65536)
+    yield provider
+    provider.close()
+
+def connect(provider, **kwargs):
+    port = provider.server.getsockname()[1]
+    client = SocketStreamFactory('127.0.0.1', port, **kwargs).createStream()
+    return client, provider.accept()
+
+
+def test_socket_options(provider):
+    client, server = connect(provider, noDelay=False)
+    try:
+        assert not client.conn.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        assert server.conn.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        # linux doubles the requested size
+        assert server.conn.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) >= 65536
+        assert server.conn.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) >= 65536
+    finally:
+        client.close()
+        server.close()
+
+def test_write(provider):
+    client, server = connect(provider)
+    try:
+        wstream = client.getOutputStream()
+        wstream.write(b'hello ')
+        wstream.write(memoryview(b'world'))
+        wstream.flush()
+        # nothing left to send
+        wstream.flush()
+
+        buffer = bytearray(64)
+        received = b''
+        while len(received) < 11:
+            size = server.recv_into(buffer)
+            received += bytes(buffer[:size])
+        assert received == b'hello world'
+    finally:
+        client.close()
+        server.close()
+
+class SendallSocket:
+    """A socket without sendmsg, as on Python 2"""
+    def __init__(self):
+        self.sent = b''
+
+    def sendall(self, data):
+        # bytes(memoryview) is the repr of the memoryview on Python 2
+        self.sent += bytes(bytearray(data))
+
+class PartialSocket(SendallSocket):
+    """Sends at most 3 bytes at a time"""
+    def sendmsg(self, buffers):
+        data = b''.join(bytes(bytearray(b)) for b in buffers)[:3]
+        self.sent += data
+        return len(data)
+
+def test_sendmsg_partial():
+    s = PartialSocket()
+    _impl.sock_sendmsg(s, [b'ab', b'', b'cdefg', bytearray(b'hi')])
+    assert s.sent == b'abcdefghi'
+
+def test_sendmsg_without_sendmsg():
+    s = SendallSocket()
+    _impl.sock_sendmsg(s, [memoryview(b'ab'), b'cd', bytearray(b'ef')])
+    assert s.sent == b'abcdef'
+
+def test_close_wakes_accept():
+    provider = SocketServerStreamProvider(0)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(provider.accept()))
+    thread.start()
+
+    provider.close()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert result == [None]
+    assert provider.acceptor.wakeupReader.fileno() == -1
+
+def test_close_without_accept():
+    provider = SocketServerStreamProvider(0)
+    acceptor = provider.acceptor
+    provider.close()
+    # nothing was waiting for a connection, so close releases the sockets
+    assert acceptor.wakeupReader.fileno() == -1
+    assert acceptor.wakeupWriter.fileno() == -1
+    assert provider.accept() is None
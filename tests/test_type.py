@@ -0,0 +1,107 @@
+import array
+import struct
+
+import pytest
+
+from networktables2.decoder import BufferReadStream, IncompleteMessage
+from networktables2.type import BooleanArray, NumberArray, StringArray
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+requires_numpy = pytest.mark.skipif(np is None, reason="requires numpy")
+
+
+@pytest.mark.parametrize('arrayType, value', [
+    (NumberArray.TYPE, ()),
+    (NumberArray.TYPE, (1.5, -2.0, 3.25)),
+    (NumberArray.TYPE, tuple(float(i) for i in range(255))),
+    (BooleanArray.TYPE, (True, False, True)),
+    (StringArray.TYPE, ('a', u'h\xe9llo', '')),
+])
+def test_array_roundtrip(arrayType, value):
+    b = bytearray()
+    arrayType.writeBytes(b, value)
+    assert b[0] == len(value)
+
+    assert arrayType.readValue(BufferReadStream(b)) == value
+    assert arrayType.unpackFrom(b, 0, len(b)) == (value, len(b))
+
+    with pytest.raises(IncompleteMessage):
+        arrayType.unpackFrom(b, 0, len(b) - 1)
+
+def test_number_array_encoding():
+    b = bytearray()
+    NumberArray.TYPE.writeBytes(b, (1.0, 2.0))
+    assert bytes(b) == b'\x02' + struct.pack('>dd', 1.0, 2.0)
+
+    # structs are only created once per length
+    assert NumberArray.TYPE.getStruct(2) is NumberArray.TYPE.getStruct(2)
+    assert StringArray.TYPE.getStruct(2) is None
+
+def test_array_too_long():
+    with pytest.raises(IOError):
+        NumberArray.TYPE.writeBytes(bytearray(), [0.0] * 256)
+
+def test_export_array():
+    out = array.array('d', [9.0])
+    NumberArray.TYPE.exportValue('key', (1.0, 2.0), out)
+    assert out == array.array('d', [1.0, 2.0])
+
+    out = array.array('B')
+    BooleanArray.TYPE.exportValue('key', (True, False), out)
+    assert out == array.array('B', [1, 0])
+
+    with pytest.raises(TypeError):
+        NumberArray.TYPE.exportValue('key', (1.0,), array.array('i'))
+
+@requires_numpy
+@pytest.mark.parametrize('arrayType, numpyType, value', [
+    (NumberArray.TYPE, NumberArray.NUMPY_TYPE, (1.5, -2.0, 3.25)),
+    (BooleanArray.TYPE, BooleanArray.NUMPY_TYPE, (True, False, True)),
+])
+def test_numpy_array_encoding(arrayType, numpyType, value):
+    b = bytearray()
+    arrayType.writeBytes(b, value)
+
+    internal = numpyType.internalizeValue('key', list(value), None)
+    assert not internal.flags.writeable
+
+    nb = bytearray()
+    numpyType.writeBytes(nb, internal)
+    assert nb == b
+
+    buf = bytearray(b)
+    decoded, offset = numpyType.unpackFrom(buf, 0, len(buf))
+    assert offset == len(buf)
+    assert decoded.tolist() == list(value)
+    assert not decoded.flags.writeable
+
+    # the receive buffer is reused, the value must not change with it
+    buf[1:] = bytes(len(buf) - 1)
+    assert decoded.tolist() == list(value)
+
+    assert numpyType.readValue(BufferReadStream(b)).tolist() == list(value)
+
+    with pytest.raises(IncompleteMessage):
+        numpyType.unpackFrom(b, 0, len(b) - 1)
+
+@requires_numpy
+def test_numpy_array_values():
+    numpyType = NumberArray.NUMPY_TYPE
+
+    value = numpyType.internalizeValue('key', NumberArray.from_list([1, 2]), None)
+    assert numpyType.valueEquals(value, numpyType.internalizeValue('key', (1.0, 2.0), value))
+    assert not numpyType.valueEquals(value, numpyType.internalizeValue('key', [1.0], value))
+    assert numpyType.getView(value) is value
+
+    out = NumberArray()
+    numpyType.exportValue('key', value, out)
+    assert out == [1.0, 2.0]
+
+    with pytest.raises(TypeError):
+        numpyType.internalizeValue('key', ['a'], None)
+    with pytest.raises(TypeError):
+        numpyType.internalizeValue('key', [[1.0]], None)
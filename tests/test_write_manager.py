@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from networktables2.common import AbstractNetworkTableEntryStore, WriteManager
+from networktables2.entry import NetworkTableEntry
+from networktables2.type import DefaultEntryTypes
+
+
+class Receiver:
+    def __init__(self):
+        self.sent = []
+        self.event = threading.Event()
+
+    def sendEntries(self, data, assignments, updates):
+        self.sent.append(bytes(data))
+        self.event.set()
+
+    def ensureAlive(self):
+        pass
+
+@pytest.fixture(scope='function')
+def receiver():
+    return Receiver()
+
+@pytest.fixture(scope='function')
+def writeManager(receiver):
+    writeManager = WriteManager(receiver, AbstractNetworkTableEntryStore(None), None)
+    yield writeManager
+    writeManager.stop()
+
+def create_entry(id):
+    return NetworkTableEntry('/entry%d' % id, DefaultEntryTypes.DOUBLE, float(id), id=id)
+
+
+def test_periodic_flush(writeManager, receiver):
+    writeManager.setFlushPeriod(10)
+    writeManager.start()
+
+    entry = create_entry(1)
+    writeManager.offerOutgoingUpdate(entry)
+    assert not receiver.event.wait(0.2)
+
+    writeManager.setFlushPeriod(0.01)
+    assert receiver.event.wait(1)
+    assert receiver.sent == [bytes(entry.getUpdateBytes())]
+    assert not entry.isDirty
+
+def test_adaptive_flush_when_idle(writeManager, receiver):
+    writeManager.setAdaptiveFlush(minFlushInterval=0.01)
+    writeManager.start()
+
+    entry = create_entry(1)
+    writeManager.offerOutgoingAssignment(entry)
+    assert receiver.event.wait(1)
+    assert receiver.sent == [bytes(entry.getAssignmentBytes())]
+
+def test_adaptive_flush_coalesces(writeManager, receiver):
+    writeManager.setAdaptiveFlush(minFlushInterval=0.5)
+    writeManager.start()
+
+    entries = [create_entry(i) for i in range(3)]
+    writeManager.offerOutgoingUpdate(entries[0])
+    assert receiver.event.wait(1)
+    receiver.event.clear()
+
+    # these are sent together once the minimum interval has passed
+    start = time.time()
+    writeManager.offerOutgoingUpdate(entries[1])
+    writeManager.offerOutgoingUpdate(entries[2])
+    assert receiver.event.wait(2)
+    assert time.time() - start > 0.2
+
+    assert receiver.sent[1] == bytes(entries[1].getUpdateBytes() + entries[2].getUpdateBytes())
+
+def test_adaptive_flush_max_batch(writeManager, receiver):
+    writeManager.setAdaptiveFlush(minFlushInterval=10, maxBatchSize=2)
+    writeManager.start()
+
+    # the first change after starting is sent immediately
+    writeManager.offerOutgoingUpdate(create_entry(0))
+    assert receiver.event.wait(1)
+    receiver.event.clear()
+
+    writeManager.offerOutgoingUpdate(create_entry(1))
+    assert not receiver.event.wait(0.2)
+
+    writeManager.offerOutgoingUpdate(create_entry(2))
+    assert receiver.event.wait(1)
+
+def test_flush(writeManager, receiver):
+    writeManager.setFlushPeriod(10)
+    writeManager.start()
+
+    entries = [create_entry(i) for i in range(3)]
+    writeManager.offerOutgoingTransactions(entries[:1], entries[1:])
+    assert not receiver.event.wait(0.2)
+
+    writeManager.flush()
+    assert receiver.event.wait(1)
+    assert receiver.sent == [bytes(entries[0].getAssignmentBytes() +
+                                   entries[1].getUpdateBytes() +
+                                   entries[2].getUpdateBytes())]
+
+def test_adaptive_flush_transactions(writeManager, receiver):
+    writeManager.setAdaptiveFlush(minFlushInterval=0.01)
+    writeManager.start()
+
+    entries = [create_entry(i) for i in range(3)]
+    writeManager.offerOutgoingTransactions((), entries)
+    assert receiver.event.wait(1)
+    assert len(receiver.sent) == 1
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+#
+# Measures the memory used by NetworkTableEntry objects, and how fast they
+# can be serialized as assignments (which is what the server does for every
+# entry when a client connects).
+#
+#     python3 entry_benchmark.py [--entries N] [--repeat N]
+#
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from networktables2.entry import NetworkTableEntry
+from networktables2.type import DefaultEntryTypes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # the names are created outside of the measurement, as the entry
+    # store does not own them
+    names = ['/SmartDashboard/subsystem%d/key%d' % (i // 10, i) for i in range(args.entries)]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entries = [NetworkTableEntry(name, DefaultEntryTypes.DOUBLE, float(i), id=i)
+               for i, name in enumerate(names)]
+    after = tracemalloc.get_traced_memory()[0]
+
+    # entries are not changed by writing them to the network
+    buf = bytearray()
+    for entry in entries:
+        entry.writeAssignmentBytes(buf)
+    del buf
+    written = tracemalloc.get_traced_memory()[0]
+
+    # but they keep their message once it has been sent in a server hello
+    for entry in entries:
+        entry.getAssignmentBytes()
+    hello = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print('memory:     %8.1f bytes/entry (%.1f after writing, %.1f after a hello)' % (
+          (after - before) / float(args.entries),
+          (written - before) / float(args.entries),
+          (hello - before) / float(args.entries)))
+
+    fresh = [NetworkTableEntry(name, DefaultEntryTypes.DOUBLE, float(i), id=i)
+             for i, name in enumerate(names)]
+    for label, timed in (('assignment', fresh), ('cached', entries)):
+        buf = bytearray()
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            del buf[:]
+            for entry in timed:
+                entry.writeAssignmentBytes(buf)
+        elapsed = time.perf_counter() - start
+
+        print('%-11s %8.0f entries/s (%.2fms for %d entries)' % (
+              label + ':', args.entries * args.repeat / elapsed,
+              elapsed / args.repeat * 1000, args.entries))
+
+if __name__ == '__main__':
+    main()
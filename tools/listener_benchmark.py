@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+#
+# Measures how long it takes to fire listeners for a single remote update,
+# as the number of key listeners registered on other keys grows.
+#
+# Each listener is registered twice: once as a key listener (which is what
+# NetworkTable.addTableListener(key=...) does), and once as a listener that
+# is called for every key and filters the key itself (which is what every
+# listener used to be).
+#
+#     python3 listener_benchmark.py [--updates N] [--counts 10,100,...]
+#
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from networktables.networktable import NetworkTableKeyListenerAdapter
+from networktables2 import NetworkTableClient
+from networktables2.entry import NetworkTableEntry
+from networktables2.metrics import timer
+from networktables2.nullstream import NullStreamFactory
+from networktables2.type import DefaultEntryTypes
+
+
+def listener(source, key, value, isNew):
+    pass
+
+def measure(count, updates, keyed):
+    node = NetworkTableClient(NullStreamFactory())
+    store = node.getEntryStore()
+
+    keys = ['/SmartDashboard/key%d' % i for i in range(count)]
+    for key in keys:
+        adapter = NetworkTableKeyListenerAdapter(key, key, None, listener)
+        if keyed:
+            node.addTableListener(adapter, False, key=key)
+        else:
+            node.addTableListener(adapter, False)
+
+    entry = NetworkTableEntry(keys[0], DefaultEntryTypes.DOUBLE, 0.0, id=0)
+    store.offerIncomingAssignment(entry)
+
+    start = timer()
+    for seq in range(1, updates + 1):
+        store.offerIncomingUpdate(entry, seq, float(seq))
+    elapsed = timer() - start
+
+    node.stop()
+    return elapsed / updates
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--counts', default='10,100,1000,10000')
+    args = parser.parse_args()
+
+    print('%10s %14s %14s' % ('listeners', 'unkeyed', 'keyed'))
+    for count in [int(c) for c in args.counts.split(',')]:
+        unkeyed = measure(count, args.updates, False)
+        keyed = measure(count, args.updates, True)
+        print('%10d %12.2fus %12.2fus' % (count, unkeyed * 1e6, keyed * 1e6))
+
+if __name__ == '__main__':
+    main()
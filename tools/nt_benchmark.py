@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+#
+# Benchmark suite that runs a real server and clients in one process over
+# the loopback interface, so that the results are reproducible without
+# starting processes by hand.
+#
+# Benchmarks:
+#
+#   latency     time from a put on the server until a listener on the
+#               client is called with the value
+#   throughput  time to deliver rounds of updates to every key, as the
+#               number of keys grows
+#   fanout      put to listener latency as the number of clients grows
+#   hello       time for a client to connect and receive every entry, as
+#               the size of the table grows
+#   arrays      cost of encoding and decoding array values
+#
+# Results are printed as tables, and can also be written as JSON so that
+# they can be compared between versions:
+#
+#     python3 nt_benchmark.py [--only latency,fanout] [--json results.json]
+#
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from networktables2 import (
+    NetworkTableClient,
+    NetworkTableServer,
+    SocketStreamFactory,
+    SocketServerStreamProvider,
+    UnixSocketStreamFactory,
+    UnixSocketServerStreamProvider
+)
+from networktables2.metrics import timer
+from networktables2.type import NumberArray, StringArray
+
+# the tables are written to stderr when the JSON is written to stdout
+out = sys.stdout
+
+def show(text):
+    print(text, file=out)
+
+
+class Recorder:
+    """A table listener that records when each value arrives. The values
+    put by the benchmarks are their index in the list of put times.
+    """
+
+    def __init__(self, count):
+        self.times = [None] * count
+        self.received = 0
+        self.condition = threading.Condition()
+
+    def valueChanged(self, source, key, value, isNew):
+        now = timer()
+        with self.condition:
+            self.times[int(value)] = now
+            self.received += 1
+            self.condition.notify_all()
+
+    def waitFor(self, index, timeout=5.0):
+        end = timer() + timeout
+        with self.condition:
+            while self.times[index] is None:
+                remaining = end - timer()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+class Loopback:
+    """A server and its clients"""
+
+    def __init__(self, transport, path):
+        if transport == 'unix':
+            if os.path.exists(path):
+                os.unlink(path)
+            provider = UnixSocketServerStreamProvider(path)
+            self.factory = UnixSocketStreamFactory(path)
+        else:
+            provider = SocketServerStreamProvider(0)
+            port = provider.server.getsockname()[1]
+            self.factory = SocketStreamFactory('127.0.0.1', port)
+
+        self.server = NetworkTableServer(provider)
+        self.server.setAdaptiveWriteFlush()
+        self.clients = []
+
+    def connect(self, timeout=10.0):
+        """:returns: a new client, once it has received every entry"""
+        client = NetworkTableClient(self.factory)
+        client.setAdaptiveWriteFlush()
+        self.clients.append(client)
+        client.reconnect()
+        end = timer() + timeout
+        while not client.isConnected():
+            if timer() > end:
+                raise IOError("Client did not connect")
+            time.sleep(0.0001)
+        return client
+
+    def close(self):
+        for client in self.clients:
+            client.stop()
+        self.server.close()
+
+def percentiles(values):
+    if not values:
+        return {'count': 0}
+    values = sorted(values)
+    result = {'count': len(values), 'max_us': values[-1] * 1e6}
+    for p in (50, 90, 99):
+        result['p%d_us' % p] = values[min(len(values) - 1, len(values) * p // 100)] * 1e6
+    return result
+
+def putAndRecord(server, key, recorders, samples, interval):
+    """Put values to a key at a fixed interval
+    :returns: the latency of each value that was received by every
+              recorder, measured to the last recorder to receive it
+    """
+    sent = [None] * samples
+    for i in range(samples):
+        sent[i] = timer()
+        server.putNumber(key, float(i))
+        # sleep rather than busy wait, which would hold the GIL and delay
+        # the threads that deliver the value
+        delay = sent[i] + interval - timer()
+        if delay > 0:
+            time.sleep(delay)
+
+    for recorder in recorders:
+        recorder.waitFor(samples - 1)
+
+    latencies = []
+    for i, start in enumerate(sent):
+        times = [recorder.times[i] for recorder in recorders]
+        if None not in times:
+            latencies.append(max(times) - start)
+    return latencies
+
+def addRecorder(client, key, samples):
+    recorder = Recorder(samples)
+    client.addTableListener(recorder, False, key=key)
+    return recorder
+
+
+def benchLatency(args):
+    loopback = Loopback(args.transport, args.path)
+    try:
+        client = loopback.connect()
+        key = '/benchmark/latency'
+        recorder = addRecorder(client, key, args.samples)
+        latencies = putAndRecord(loopback.server, key, [recorder],
+                                 args.samples, args.interval)
+    finally:
+        loopback.close()
+
+    result = percentiles(latencies)
+    show('latency (%d samples, %gms apart)' % (args.samples, args.interval * 1000))
+    show('  p50 %.1fus  p90 %.1fus  p99 %.1fus  max %.1fus  received %d' % (
+          result.get('p50_us', 0), result.get('p90_us', 0),
+          result.get('p99_us', 0), result.get('max_us', 0), result['count']))
+    return result
+
+def benchThroughput(args):
+    results = []
+    show('throughput (%d rounds)' % args.rounds)
+    show('  %8s %14s %14s %14s' % ('keys', 'puts/s', 'received/s', 'elapsed'))
+    for count in args.keys:
+        loopback = Loopback(args.transport, args.path)
+        try:
+            server = loopback.server
+            client = loopback.connect()
+            keys = ['/benchmark/throughput/%d' % i for i in range(count)]
+            # the entries are assigned before the listeners are added
+            for key in keys:
+                server.putNumber(key, -1.0)
+            end = timer() + 10.0
+            while not all(client.containsKey(key) for key in keys):
+                if timer() > end:
+                    raise IOError("Entries were not received")
+                time.sleep(0.001)
+
+            recorders = [addRecorder(client, key, args.rounds) for key in keys]
+
+            start = timer()
+            for i in range(args.rounds):
+                value = float(i)
+                for key in keys:
+                    server.putNumber(key, value)
+            for recorder in recorders:
+                if not recorder.waitFor(args.rounds - 1, timeout=30.0):
+                    raise IOError("Updates were not received")
+            elapsed = timer() - start
+            received = sum(recorder.received for recorder in recorders)
+        finally:
+            loopback.close()
+
+        puts = count * args.rounds
+        results.append({'keys': count, 'puts': puts, 'received': received,
+                        'elapsed_s': elapsed,
+                        'puts_per_s': puts / elapsed,
+                        'received_per_s': received / elapsed})
+        show('  %8d %14.0f %14.0f %12.1fms' % (count, puts / elapsed,
+              received / elapsed, elapsed * 1000))
+    return results
+
+def benchFanout(args):
+    results = []
+    show('fanout (%d samples, %gms apart, latency to the last client)' % (
+          args.samples, args.interval * 1000))
+    show('  %8s %10s %10s %10s %10s' % ('clients', 'p50', 'p90', 'p99', 'max'))
+    for count in args.clients:
+        loopback = Loopback(args.transport, args.path)
+        try:
+            key = '/benchmark/fanout'
+            recorders = [addRecorder(loopback.connect(), key, args.samples)
+                         for _ in range(count)]
+            latencies = putAndRecord(loopback.server, key, recorders,
+                                     args.samples, args.interval)
+        finally:
+            loopback.close()
+
+        result = percentiles(latencies)
+        result['clients'] = count
+        results.append(result)
+        show('  %8d %8.1fus %8.1fus %8.1fus %8.1fus' % (count,
+              result.get('p50_us', 0), result.get('p90_us', 0),
+              result.get('p99_us', 0), result.get('max_us', 0)))
+    return results
+
+def benchHello(args):
+    results = []
+    show('hello')
+    show('  %8s %14s %14s' % ('entries', 'serialize', 'connect'))
+    for count in args.entries:
+        loopback = Loopback(args.transport, args.path)
+        try:
+            server = loopback.server
+            server.putValues(dict(('/benchmark/hello/%d' % i, float(i))
+                                  for i in range(count)))
+
+            # the hello and the assignment message of each entry are cached
+            # until they change, so the caches are discarded to measure
+            # building the hello from scratch
+            store = server.getEntryStore()
+            entries = list(store.namedEntries.values())
+            serialize = []
+            for _ in range(args.repeat):
+                store.helloCacheVersion = None
+                for entry in entries:
+                    entry._assignment = None
+                start = timer()
+                store.getServerHello()
+                serialize.append(timer() - start)
+
+            connect = []
+            for _ in range(args.repeat):
+                start = timer()
+                loopback.connect()
+                connect.append(timer() - start)
+        finally:
+            loopback.close()
+
+        serialize = min(serialize)
+        connect = min(connect)
+        results.append({'entries': count, 'serialize_us': serialize * 1e6,
+                        'connect_us': connect * 1e6})
+        show('  %8d %12.1fus %12.1fus' % (count, serialize * 1e6, connect * 1e6))
+    return results
+
+def benchArrays(args):
+    results = []
+    show('arrays (%d iterations)' % args.iterations)
+    show('  %8s %8s %12s %12s' % ('type', 'length', 'encode', 'decode'))
+    for arrayType, makeElement in ((NumberArray, float),
+                                   (StringArray, lambda i: 'value%d' % i)):
+        entryType = arrayType.TYPE
+        for length in args.lengths:
+            value = tuple(makeElement(i) for i in range(length))
+
+            b = bytearray()
+            start = timer()
+            for _ in range(args.iterations):
+                del b[:]
+                entryType.writeBytes(b, value)
+            encode = (timer() - start) / args.iterations
+
+            buf = bytes(b)
+            end = len(buf)
+            start = timer()
+            for _ in range(args.iterations):
+                entryType.unpackFrom(buf, 0, end)
+            decode = (timer() - start) / args.iterations
+
+            results.append({'type': arrayType.__name__, 'length': length,
+                            'encode_us': encode * 1e6,
+                            'decode_us': decode * 1e6})
+            show('  %8s %8d %10.2fus %10.2fus' % (arrayType.__name__[:-5],
+                  length, encode * 1e6, decode * 1e6))
+    return results
+
+BENCHMARKS = (
+    ('latency', benchLatency),
+    ('throughput', benchThroughput),
+    ('fanout', benchFanout),
+    ('hello', benchHello),
+    ('arrays', benchArrays),
+)
+
+def intList(value):
+    return [int(v) for v in value.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--only', default=','.join(name for name, _ in BENCHMARKS),
+                        help='comma separated benchmarks to run')
+    parser.add_argument('--json', help='write the results to this file, or - for stdout')
+    parser.add_argument('--transport', choices=('tcp', 'unix'), default='tcp')
+    parser.add_argument('--path', default='/tmp/nt_benchmark.sock',
+                        help='socket path for the unix transport')
+    parser.add_argument('--samples', type=int, default=300)
+    parser.add_argument('--interval', type=float, default=0.02,
+                        help='seconds between latency samples')
+    parser.add_argument('--rounds', type=int, default=100)
+    parser.add_argument('--keys', type=intList, default=[1, 10, 100, 1000])
+    parser.add_argument('--clients', type=intList, default=[1, 2, 4, 8])
+    parser.add_argument('--entries', type=intList, default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--lengths', type=intList, default=[1, 16, 255])
+    parser.add_argument('--iterations', type=int, default=10000)
+    args = parser.parse_args()
+
+    only = args.only.split(',')
+    for name in only:
+        if name not in dict(BENCHMARKS):
+            parser.error("Unknown benchmark '%s'" % name)
+
+    if args.json == '-':
+        global out
+        out = sys.stderr
+
+    results = {}
+    for name, fn in BENCHMARKS:
+        if name in only:
+            results[name] = fn(args)
+
+    if args.json is not None:
+        report = {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'transport': args.transport,
+            'results': results,
+        }
+        if args.json == '-':
+            json.dump(report, sys.stdout, indent=2, sort_keys=True)
+            sys.stdout.write('\n')
+        else:
+            with open(args.json, 'w') as fp:
+                json.dump(report, fp, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
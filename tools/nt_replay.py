@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+#
+# Replays a capture of the data received by a NetworkTables node into a
+# new client or server, to profile the decoder and entry store against
+# real traffic without a robot.
+#
+# Record a capture by calling NetworkTable.setCaptureFile('match.ntcap')
+# (or node.startCapture) before initializing NetworkTables, then:
+#
+#     python3 nt_replay.py match.ntcap [--speed max] [--server] [--repeat N]
+#                                      [--listeners N] [--profile]
+#
+# At --speed 1 the data is replayed at the rate it was received, which
+# shows whether the node keeps up; at max speed the throughput of the
+# hot path is measured.
+#
+
+from __future__ import print_function
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from networktables2 import NetworkTableClient, NetworkTableServer
+from networktables2.capture import CaptureReader, DATA, OPEN, replay
+from networktables2.nullstream import NullServerStreamProvider, NullStreamFactory
+
+
+class CountingListener:
+    def __init__(self):
+        self.count = 0
+
+    def valueChanged(self, source, key, value, isNew):
+        self.count += 1
+
+
+def createNode(server):
+    if server:
+        return NetworkTableServer(NullServerStreamProvider())
+    return NetworkTableClient(NullStreamFactory())
+
+def stopNode(node):
+    if node.isServer():
+        node.close()
+    else:
+        node.stop()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('capture')
+    parser.add_argument('--speed', default='max',
+                        help="replay speed, 1 for the recorded rate or 'max'")
+    parser.add_argument('--server', action='store_true',
+                        help='replay into a server instead of a client')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--listeners', type=int, default=1,
+                        help='number of table listeners on the node')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the functions that took the most time')
+    args = parser.parse_args()
+
+    speed = None if args.speed == 'max' else float(args.speed)
+
+    records = list(CaptureReader(args.capture))
+    connections = sum(1 for record in records if record[1] == OPEN)
+    duration = records[-1][0] if records else 0
+    print('capture: %d connections, %d data records, %.1fs' % (
+          connections, sum(1 for record in records if record[1] == DATA), duration))
+
+    profile = cProfile.Profile() if args.profile else None
+
+    for i in range(args.repeat):
+        # each repetition uses a new node, so that every update is applied
+        node = createNode(args.server)
+        listeners = [CountingListener() for _ in range(args.listeners)]
+        for listener in listeners:
+            node.addTableListener(listener, False)
+        try:
+            if profile is not None:
+                profile.enable()
+            size, elapsed = replay(args.capture, node, speed)
+            if profile is not None:
+                profile.disable()
+        finally:
+            stopNode(node)
+
+        changes = listeners[0].count if listeners else 0
+        print('run %d: %d bytes in %.3fs, %.1f MB/s, %.0f changes/s' % (
+              i + 1, size, elapsed, size / elapsed / 1e6 if elapsed else 0,
+              changes / elapsed if elapsed else 0))
+
+    if profile is not None:
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(25)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+# Measures how long NetworkTables getters take while another thread is
+# applying remote updates (as the ReadManager thread does), and firing
+# listeners for them while holding the entry lock.
+#
+# Reads are measured twice: once taking the entry lock around each read
+# (which is what the getters used to do), and once using the lock-free
+# getters.
+#
+#     python3 read_benchmark.py [--keys N] [--reads N] [--listener-work N]
+#
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from networktables2 import NetworkTableClient
+from networktables2.entry import NetworkTableEntry
+from networktables2.metrics import timer
+from networktables2.nullstream import NullStreamFactory
+from networktables2.type import DefaultEntryTypes
+
+
+class _GlobalListener:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def valueChanged(self, source, key, value, isNew):
+        self.fn(key, value, isNew)
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def updater(node, entries, stop):
+    store = node.getEntryStore()
+    seq = 1
+    while not stop.is_set():
+        for entry in entries:
+            store.offerIncomingUpdate(entry, seq, float(seq))
+        seq += 1
+
+def measure(node, keys, reads, locked):
+    lock = node.getEntryStore().entry_lock
+    getNumber = node.getNumber
+    times = []
+
+    for i in range(reads):
+        key = keys[i % len(keys)]
+        start = timer()
+        if locked:
+            with lock:
+                getNumber(key)
+        else:
+            getNumber(key)
+        times.append(timer() - start)
+
+    return sorted(times)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--keys', type=int, default=100)
+    parser.add_argument('--reads', type=int, default=200000)
+    parser.add_argument('--listener-work', type=int, default=200)
+    args = parser.parse_args()
+
+    node = NetworkTableClient(NullStreamFactory())
+    store = node.getEntryStore()
+
+    keys = ['/SmartDashboard/key%d' % i for i in range(args.keys)]
+    for i, key in enumerate(keys):
+        store.offerIncomingAssignment(NetworkTableEntry(key, DefaultEntryTypes.DOUBLE, 0.0, id=i))
+    entries = [store.getEntry(key) for key in keys]
+
+    def listener(key, value, isNew):
+        # simulate a user callback doing some work
+        for _ in range(args.listener_work):
+            pass
+
+    node.addTableListener(_GlobalListener(listener), False)
+
+    stop = threading.Event()
+    thread = threading.Thread(target=updater, args=(node, entries, stop))
+    thread.daemon = True
+    thread.start()
+
+    try:
+        for name, locked in (('locked', True), ('lock-free', False)):
+            start = timer()
+            times = measure(node, keys, args.reads, locked)
+            elapsed = timer() - start
+
+            print('%-10s %10.0f reads/s   p50 %6.2fus   p99 %8.2fus   max %9.2fus' % (
+                  name, args.reads / elapsed,
+                  percentile(times, 0.50) * 1e6,
+                  percentile(times, 0.99) * 1e6,
+                  times[-1] * 1e6))
+    finally:
+        stop.set()
+        thread.join()
+        node.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+#
+# Measures the round trip latency of SocketStream over the loopback
+# interface, compared to the previous implementation which wrote through
+# a buffered file from socket.makefile and left Nagle's algorithm enabled.
+#
+# The client sends a request and waits for the server to echo it back.
+# In the 'split' pattern, each request is written with two separate
+# flushes (as happens when a keep alive or a second batch of updates is
+# sent right after the first), which is where Nagle's algorithm stalls.
+#
+#     python3 socket_benchmark.py [--requests N] [--size BYTES]
+#
+
+from __future__ import print_function
+
+import argparse
+import os
+import socket
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from networktables2 import _impl
+from networktables2.metrics import timer
+from networktables2.socketstream import (
+    SocketStream,
+    SocketStreamFactory,
+    SocketServerStreamProvider
+)
+
+
+class MakefileSocketStream(SocketStream):
+    """The previous SocketStream implementation"""
+
+    def __init__(self, conn):
+        SocketStream.__init__(self, conn)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 0)
+
+    def getOutputStream(self):
+        return _impl.sock_makefile(self.conn, 'wb')
+
+
+def connect(streamClass):
+    provider = SocketServerStreamProvider(0)
+    port = provider.server.getsockname()[1]
+    factory = SocketStreamFactory('127.0.0.1', port)
+
+    client = factory.createStream()
+    server = provider.accept()
+    provider.close()
+
+    if streamClass is MakefileSocketStream:
+        client = MakefileSocketStream(client.conn)
+        server = MakefileSocketStream(server.conn)
+
+    return client, server
+
+def echo(stream, size):
+    buffer = bytearray(65536)
+    wstream = stream.getOutputStream()
+    received = 0
+    while True:
+        try:
+            n = stream.recv_into(buffer)
+        except IOError:
+            return
+        if n == 0:
+            return
+        received += n
+        if received >= size:
+            received -= size
+            wstream.write(bytes(size))
+            wstream.flush()
+
+def measure(streamClass, split, requests, size):
+    client, server = connect(streamClass)
+    thread = threading.Thread(target=echo, args=(server, size))
+    thread.daemon = True
+    thread.start()
+
+    wstream = client.getOutputStream()
+    buffer = bytearray(65536)
+    half = size // 2
+    first, second = bytes(half), bytes(size - half)
+
+    times = []
+    for _ in range(requests):
+        start = timer()
+        if split:
+            wstream.write(first)
+            wstream.flush()
+            wstream.write(second)
+            wstream.flush()
+        else:
+            wstream.write(first)
+            wstream.write(second)
+            wstream.flush()
+
+        received = 0
+        while received < size:
+            received += client.recv_into(buffer)
+        times.append(timer() - start)
+
+    client.close()
+    server.close()
+    thread.join()
+
+    times.sort()
+    return [times[int(len(times)*p)] for p in (0.5, 0.9, 0.99)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--size', type=int, default=64)
+    args = parser.parse_args()
+
+    print('%-10s %-8s %12s %12s %12s' % ('stream', 'pattern', 'p50', 'p90', 'p99'))
+    for name, streamClass in (('makefile', MakefileSocketStream),
+                              ('sendmsg', SocketStream)):
+        for split in (False, True):
+            p50, p90, p99 = measure(streamClass, split, args.requests, args.size)
+            print('%-10s %-8s %10.1fus %10.1fus %10.1fus' %
+                  (name, 'split' if split else 'single', p50*1e6, p90*1e6, p99*1e6))
+
+if __name__ == '__main__':
+    main()